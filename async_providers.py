@@ -0,0 +1,302 @@
+# async_providers.py
+"""Asyncio-native provider calls.
+
+Each call_*_api_async function is an async generator that yields streaming
+text chunks as they arrive. They mirror the blocking call_*_api functions in
+shared_utils, but many streams can be in flight on a single event loop
+instead of holding one OS thread each.
+
+AsyncProviderBridge runs that event loop in one background thread so the
+Qt side (ConversationManager) can submit coroutines to it. This traffic is
+not captured by cassettes (cassette.py), so replaying one raises
+CassetteError here instead of calling the provider.
+"""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+from cassette import check_uncaptured
+from providers import get_client
+from rate_limiter import get_rate_limiter
+from retry_policy import (
+    DEFAULT_POLICY,
+    StreamInterrupted,
+    is_transient_error,
+    notify_retry,
+)
+from shared_utils import (
+    ANTHROPIC_BASE_URL,
+    OPENROUTER_BASE_URL,
+    build_claude_payload,
+    build_deepseek_messages,
+    build_openai_messages,
+    build_openrouter_messages,
+    get_gemini_history,
+    get_gemini_model,
+    note_chat_usage,
+    note_gemini_usage,
+    record_claude_usage,
+)
+from sse import aiter_sse_json
+from ttft_stats import note_request_sent
+from turn_metrics import note_connect, note_retry, note_usage
+
+# One pooled httpx.AsyncClient per (provider, host), per event loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client(provider, url):
+    """Return the pooled AsyncClient for this provider's host on the running loop"""
+    import httpx  # Only needed once async providers are in use
+
+    from config import HTTP_KEEP_ALIVE, HTTP_POOL_SIZE
+
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    parts = urlsplit(url)
+    key = (provider, parts.scheme, parts.netloc)
+    client = clients.get(key)
+    if client is None:
+        limits = httpx.Limits(
+            max_connections=HTTP_POOL_SIZE,
+            max_keepalive_connections=HTTP_POOL_SIZE if HTTP_KEEP_ALIVE else 0,
+        )
+        client = httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(180.0, connect=30.0))
+        clients[key] = client
+    return client
+
+
+async def close_async_clients():
+    """Close every AsyncClient created on the running loop"""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+async def wait_for_rate_limit_async(provider, model=None):
+    """Await a slot from the shared rate limiter (see shared_utils.wait_for_rate_limit)"""
+    wait = get_rate_limiter().reserve(provider, model)
+    if wait > 0:
+        if wait >= 1:
+            print(f"Rate limit: waiting {wait:.1f}s before calling {provider}" + (f" ({model})" if model else ""))
+        await asyncio.sleep(wait)
+
+
+async def _stream_sse(provider, url, payload, headers, error_label):
+    """POST a streaming request and yield its SSE JSON events
+
+    Waits for the rate limiter first; a 429 is waited out and resent up to
+    RATE_LIMIT_MAX_RETRIES times. Connection errors and transient statuses
+    are retried under DEFAULT_POLICY until the stream opens; any other
+    non-200 status raises. A stream that breaks after it opened raises too,
+    and ai_turn_async restarts the whole turn.
+    """
+    from config import RATE_LIMIT_MAX_RETRIES
+
+    check_uncaptured("Async provider mode")  # Never goes out live while replaying a cassette
+    model = payload.get("model")
+    client = get_async_client(provider, url)
+    started = time.monotonic()
+    failures = rate_limit_waits = 0
+    yielded = False
+    while True:
+        await wait_for_rate_limit_async(provider, model)
+        try:
+            note_request_sent()
+            sent = time.monotonic()
+            async with client.stream("POST", url, json=payload, headers=headers) as response:
+                note_connect(time.monotonic() - sent)
+                get_rate_limiter().observe(provider, model, response.status_code, response.headers)
+                if response.status_code == 429 and rate_limit_waits < RATE_LIMIT_MAX_RETRIES:
+                    rate_limit_waits += 1
+                    note_retry()
+                    continue
+                if response.status_code != 200:
+                    failures += 1
+                    delay = DEFAULT_POLICY.backoff(failures, started, status=response.status_code)
+                    if delay is None:
+                        body = await response.aread()
+                        raise RuntimeError(f"{error_label} {response.status_code}: {body.decode('utf-8', 'replace')}")
+                    notify_retry(provider, failures, delay, f"HTTP {response.status_code}")
+                else:
+                    async for chunk_data in aiter_sse_json(response.aiter_bytes()):
+                        yielded = True
+                        yield chunk_data
+                    return
+        except Exception as e:
+            # Once events have been handed out, only the caller can start over
+            if yielded or not is_transient_error(e):
+                raise
+            failures += 1
+            delay = DEFAULT_POLICY.backoff(failures, started, error=e)
+            if delay is None:
+                raise
+            notify_retry(provider, failures, delay, type(e).__name__)
+        await asyncio.sleep(delay)
+
+
+async def call_claude_api_async(prompt, messages, model_id, system_prompt=None):
+    """Stream a Claude response, yielding text chunks"""
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise RuntimeError("ANTHROPIC_API_KEY not found in environment variables")
+
+    url = f"{ANTHROPIC_BASE_URL}/v1/messages"
+    payload = build_claude_payload(prompt, messages, model_id, system_prompt, stream=True)
+    headers = {
+        "Content-Type": "application/json",
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01"
+    }
+
+    async for chunk_data in _stream_sse("anthropic", url, payload, headers, "API returned status"):
+        if chunk_data.get('type') == 'message_start':
+            record_claude_usage(chunk_data.get('message', {}).get('usage'))
+        elif chunk_data.get('type') == 'message_delta':
+            note_usage(output_tokens=chunk_data.get('usage', {}).get('output_tokens'))
+        elif chunk_data.get('type') == 'content_block_delta':
+            delta = chunk_data.get('delta', {})
+            if delta.get('type') == 'text_delta' and delta.get('text'):
+                yield delta['text']
+        elif chunk_data.get('type') == 'message_stop':
+            return
+        elif chunk_data.get('type') == 'error':
+            error = chunk_data.get('error', {})
+            raise StreamInterrupted(f"{error.get('type', 'error')}: {error.get('message', '')}")
+    raise StreamInterrupted("Claude stream ended without message_stop")
+
+
+async def _stream_openrouter(payload, headers):
+    """Yield delta content from an OpenRouter chat-completions stream"""
+    url = f"{OPENROUTER_BASE_URL}/chat/completions"
+    finished = False
+    async for chunk_data in _stream_sse("openrouter", url, payload, headers, "OpenRouter API error"):
+        if 'error' in chunk_data:
+            raise StreamInterrupted(str(chunk_data['error'].get('message', chunk_data['error'])))
+        note_chat_usage(chunk_data)
+        if 'choices' in chunk_data and len(chunk_data['choices']) > 0:
+            choice = chunk_data['choices'][0]
+            content = choice.get('delta', {}).get('content', '')
+            if content:
+                yield content
+            if choice.get('finish_reason') == 'error':
+                raise StreamInterrupted("upstream provider error")
+            if choice.get('finish_reason'):
+                finished = True
+    if not finished:
+        raise StreamInterrupted("OpenRouter stream ended without a finish_reason")
+
+
+async def call_openrouter_api_async(prompt, conversation_history, model, system_prompt):
+    """Stream an OpenRouter response, yielding text chunks"""
+    headers = {
+        "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
+        "HTTP-Referer": "http://localhost:3000",
+        "Content-Type": "application/json",
+        "X-Title": "AI Conversation"
+    }
+    payload = {
+        "model": model,
+        "messages": build_openrouter_messages(prompt, conversation_history, system_prompt),
+        "temperature": 1,
+        "max_tokens": 4000,
+        "stream": True
+    }
+    async for chunk in _stream_openrouter(payload, headers):
+        yield chunk
+
+
+async def call_deepseek_api_async(prompt, conversation_history, model, system_prompt):
+    """Stream a DeepSeek (via OpenRouter) response, yielding raw text chunks
+
+    The <think> block is left in the stream; format_deepseek_response splits it
+    out once the full text has been collected.
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
+    }
+    payload = {
+        "model": "deepseek/deepseek-r1",
+        "messages": build_deepseek_messages(prompt, conversation_history, system_prompt),
+        "max_tokens": 8000,
+        "temperature": 1,
+        "stream": True
+    }
+    async for chunk in _stream_openrouter(payload, headers):
+        yield chunk
+
+
+async def call_openai_api_async(prompt, conversation_history, model, system_prompt):
+    """Stream an OpenAI chat completion, yielding text chunks"""
+    check_uncaptured("Async provider mode")
+    await wait_for_rate_limit_async("openai", model)
+    note_request_sent()
+    sent = time.monotonic()
+    raw_response = await get_client("openai_async").chat.completions.with_raw_response.create(
+        model=model,
+        messages=build_openai_messages(prompt, conversation_history, system_prompt),
+        max_completion_tokens=4000,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    note_connect(time.monotonic() - sent)
+    get_rate_limiter().observe("openai", model, raw_response.status_code, raw_response.headers)
+    response = raw_response.parse()
+    async for chunk in response:
+        if chunk.usage:
+            note_usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+        if chunk.choices and chunk.choices[0].delta.content is not None:
+            yield chunk.choices[0].delta.content
+
+
+async def call_gemini_api_async(prompt, conversation_history, model, system_prompt):
+    """Stream a Gemini response, yielding text chunks"""
+    check_uncaptured("Async provider mode")
+    gemini_model = get_gemini_model(model, system_prompt)
+    chat = gemini_model.start_chat(history=get_gemini_history(model, system_prompt, conversation_history))
+    await wait_for_rate_limit_async("google", model)
+    note_request_sent()
+    sent = time.monotonic()
+    response = await chat.send_message_async(prompt, stream=True)
+    note_connect(time.monotonic() - sent)
+    async for chunk in response:
+        note_gemini_usage(chunk)
+        if chunk.text:
+            yield chunk.text
+
+
+class AsyncProviderBridge:
+    """Owns one asyncio event loop running in a background thread
+
+    Coroutines submitted from any thread (e.g. the Qt GUI thread) run on that
+    loop, so any number of concurrent provider streams share a single thread.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="provider-event-loop", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the bridge loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self, timeout=5):
+        """Close pooled clients, stop the loop and join its thread"""
+        if not self.loop.is_running():
+            return
+        try:
+            self.submit(close_async_clients()).result(timeout)
+        except Exception as e:
+            print(f"Error closing async provider clients: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
@@ -0,0 +1,157 @@
+# batch_runner.py
+"""Run many headless sessions concurrently.
+
+A batch matrix is a JSONL file (one session config per line) or a YAML file
+(a list of session configs, needs PyYAML). Each entry uses the same keys as
+a headless session config (models, prompt_pair, iterations, input, turn_mode,
+branches) plus optional 'name' and 'repeat' (run the entry N times).
+
+Sessions run on a thread pool capped at BATCH_MAX_CONCURRENT_SESSIONS, and
+every turn holds a per-provider slot (each adapter's max_concurrency, with
+BATCH_PROVIDER_CONCURRENCY overrides), so a large sweep keeps each provider
+busy without exceeding its limit. Each session's transcript is appended to <output_dir>/<name>.jsonl as replies
+arrive, and summary.json records how every session ended.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from config import BATCH_MAX_CONCURRENT_SESSIONS
+from conversation_engine import create_engine, public_message, run_session
+from provider_adapters import get_concurrency_limits
+
+
+def load_batch_matrix(path):
+    """Load a batch matrix and expand 'repeat' into individual session configs
+
+    Returns:
+        List of session config dicts, each with a unique 'name'
+    """
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError("YAML batch files need PyYAML (pip install pyyaml); use JSONL instead") from None
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = yaml.safe_load(f) or []
+    else:
+        entries = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_number}: invalid JSON ({e})") from e
+
+    sessions = []
+    for index, entry in enumerate(entries):
+        base_name = entry.get('name', f"session_{index:04d}")
+        repeat = entry.get('repeat', 1)
+        for run in range(repeat):
+            config = {k: v for k, v in entry.items() if k not in ('name', 'repeat')}
+            config['name'] = base_name if repeat == 1 else f"{base_name}_r{run:03d}"
+            sessions.append(config)
+    return sessions
+
+
+class TranscriptWriter:
+    """Appends one session's events to an open JSONL file, flushing after each line"""
+
+    def __init__(self, file):
+        self._file = file
+        self._lock = threading.Lock()  # Parallel-round sessions commit from several threads
+
+    def write(self, event):
+        with self._lock:
+            self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+
+def run_batch_session(config, output_dir, provider_semaphores):
+    """Run one session, streaming its transcript to disk
+
+    Returns:
+        Summary dict: name, status, messages, seconds and error (if any)
+    """
+    name = config['name']
+    # The with block closes the transcript even if writing the start/end events fails
+    with open(os.path.join(output_dir, f"{name}.jsonl"), 'w', encoding='utf-8') as f:
+        writer = TranscriptWriter(f)
+        writer.write({"event": "start", "config": config, "time": datetime.now().isoformat()})
+        start = time.time()
+        state = {'engine': None, 'messages': 0}
+
+        def on_message(ai_name, message):
+            state['messages'] += 1
+            writer.write({"event": "message", "branch": state['engine'].active_branch, "message": public_message(message)})
+
+        try:
+            # Batch sessions are paced by the provider caps; the GUI turn delay is opt-in
+            config = dict(config, turn_delay=config.get('turn_delay', False))
+            engine = create_engine(config, message_callback=on_message, provider_semaphores=provider_semaphores)
+            state['engine'] = engine
+            run_session(config, engine=engine)
+            status, error = "ok", None
+        except Exception as e:
+            print(f"Batch session {name} failed: {e}")
+            status, error = "error", str(e)
+
+        summary = {
+            "name": name,
+            "status": status,
+            "messages": state['messages'],
+            "seconds": round(time.time() - start, 2),
+            "error": error,
+        }
+        writer.write(dict(summary, event="end"))
+        return summary
+
+
+def run_batch(sessions, output_dir, max_concurrent=None, provider_limits=None):
+    """Run sessions concurrently under global and per-provider caps
+
+    Args:
+        sessions: Session configs from load_batch_matrix
+        output_dir: Directory for <name>.jsonl transcripts and summary.json
+        max_concurrent: Sessions in flight (default BATCH_MAX_CONCURRENT_SESSIONS)
+        provider_limits: Turns in flight per provider (default get_concurrency_limits())
+
+    Returns:
+        List of per-session summary dicts, in matrix order
+    """
+    max_concurrent = max_concurrent or BATCH_MAX_CONCURRENT_SESSIONS
+    provider_limits = get_concurrency_limits() if provider_limits is None else provider_limits
+    provider_semaphores = {provider: threading.BoundedSemaphore(limit) for provider, limit in provider_limits.items()}
+
+    names = [config['name'] for config in sessions]
+    if len(set(names)) != len(names):
+        raise ValueError("Batch session names must be unique")
+    # Fail fast on bad models/prompt pairs before anything is sent
+    for config in sessions:
+        create_engine(config)
+
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Running {len(sessions)} sessions, {max_concurrent} at a time, provider limits {provider_limits}")
+
+    summaries = {}
+    with ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="batch-session") as executor:
+        futures = {
+            executor.submit(run_batch_session, config, output_dir, provider_semaphores): config['name']
+            for config in sessions
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            summary = future.result()
+            summaries[summary['name']] = summary
+            print(f"[{done}/{len(sessions)}] {summary['name']}: {summary['status']} ({summary['seconds']}s)")
+
+    ordered = [summaries[name] for name in names]
+    with open(os.path.join(output_dir, "summary.json"), 'w', encoding='utf-8') as f:
+        json.dump(ordered, f, indent=2)
+    return ordered
@@ -0,0 +1,77 @@
+# benchmarks/bench_import_time.py
+"""Import-time benchmark with a regression budget.
+
+Imports a module in a fresh interpreter under `python -X importtime`, reports
+the cumulative import time (best of --repeat runs) and the slowest modules,
+and fails (exit code 1) when:
+- the import takes longer than --budget-ms, or
+- any provider SDK is imported at all (they must load lazily via providers.py)
+
+Run from the repo root:
+    python benchmarks/bench_import_time.py [--module conversation_engine] [--budget-ms 500] [--repeat 5]
+
+Checking main.py as well (PyQt6 dominates there, so give it a larger budget):
+    python benchmarks/bench_import_time.py --module main --budget-ms 3000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# SDKs that must not be imported until a provider is actually used
+LAZY_MODULES = ["anthropic", "openai", "google.generativeai", "replicate", "together", "bs4", "httpx"]
+
+
+def measure(module):
+    """Import `module` in a fresh interpreter; returns {module name: cumulative microseconds}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+        # No API keys: importing must not need them either
+        env={k: v for k, v in os.environ.items() if not k.endswith("_API_KEY")},
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default="conversation_engine", help="Module to import")
+    parser.add_argument('--budget-ms', type=float, default=500, help="Fail if the import takes longer than this")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters to run (best time is reported)")
+    parser.add_argument('--top', type=int, default=10, help="Slowest modules to list")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    best = min(runs, key=lambda timings: timings.get(args.module, 0))
+    total_ms = best.get(args.module, 0) / 1000
+
+    print(f"import {args.module}: {total_ms:.1f} ms (best of {args.repeat}, budget {args.budget_ms:.0f} ms)")
+    print("slowest modules (cumulative):")
+    for name, micros in sorted(best.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+    failures = []
+    eager = [name for name in LAZY_MODULES if name in best]
+    if eager:
+        failures.append(f"provider SDKs imported eagerly: {', '.join(eager)}")
+    if total_ms > args.budget_ms:
+        failures.append(f"{total_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_render.py
+"""Cost of re-rendering the conversation display after each turn.
+
+Builds a ConversationPane with the single-QTextEdit display
+(VIRTUAL_TRANSCRIPT off; offscreen unless QT_QPA_PLATFORM is set) and grows
+a synthetic transcript of mixed user/AI/system messages, some with code
+blocks. At each --sizes transcript length it times one turn's worth of
+rendering, as ConversationManager does it (display_conversation after the
+response and again after the result), in two modes:
+- full: the display is cleared and every message rendered again
+- incremental: only the new message is rendered (ConversationPane.render_conversation)
+
+Fails (exit code 1) if an incremental turn at the largest size takes more
+than --budget-ms.
+
+Run from the repo root:
+    python benchmarks/bench_render.py [--sizes 100 500 2000] [--turns 5] [--budget-ms 20]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+import gui  # noqa: E402
+
+
+def make_message(i):
+    """The i-th message of the synthetic transcript"""
+    kind = i % 4
+    if kind == 0:
+        return {"role": "user", "content": f"Message {i}: what is behind the wallpaper? `peel` it back."}
+    if kind == 3:
+        return {"role": "system", "content": f"Turn {i} complete."}
+    body = "The hallway hums. " * 20
+    if kind == 2:
+        body += f"\n```python\nfor door in range({i}):\n    open(door)\n```\n"
+    return {"role": "assistant", "ai_name": f"AI-{kind}", "model": "Benchmark", "content": body}
+
+
+def render_turn(pane, conversation, full):
+    """Render a turn's new message twice, as the response and result handlers do; returns seconds"""
+    started = time.perf_counter()
+    for _ in range(2):
+        if full:
+            pane.clear_conversation()
+        pane.display_conversation(list(conversation))
+    return time.perf_counter() - started
+
+
+def bench(pane, sizes, turns, full):
+    """Mean seconds per turn at each transcript size"""
+    pane.clear_conversation()
+    conversation, results = [], {}
+    for size in sizes:
+        while len(conversation) < size - turns:
+            conversation.append(make_message(len(conversation)))
+        pane.display_conversation(list(conversation))
+        timings = []
+        for _ in range(turns):
+            conversation.append(make_message(len(conversation)))
+            timings.append(render_turn(pane, conversation, full))
+        results[size] = sum(timings) / len(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 2000], help="Transcript lengths (messages)")
+    parser.add_argument('--turns', type=int, default=5, help="Timed turns at each size")
+    parser.add_argument('--budget-ms', type=float, help="Fail if an incremental turn at the largest size exceeds this")
+    args = parser.parse_args()
+    sizes = sorted(args.sizes)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    gui.VIRTUAL_TRANSCRIPT = False  # benchmarks/bench_transcript_view.py covers the virtualized view
+    pane = gui.ConversationPane()
+    pane.resize(900, 1000)
+    pane.show()
+
+    # display_conversation prints a debug dump of the messages it renders
+    with contextlib.redirect_stdout(io.StringIO()):
+        incremental = bench(pane, sizes, args.turns, full=False)
+        full = bench(pane, sizes, args.turns, full=True)
+    app.processEvents()
+
+    print(f"{'messages':>9} {'full':>10} {'incremental':>12}")
+    for size in sizes:
+        print(f"{size:>9} {full[size] * 1000:>8.1f}ms {incremental[size] * 1000:>10.1f}ms")
+
+    largest = incremental[sizes[-1]] * 1000
+    if args.budget_ms is not None and largest > args.budget_ms:
+        print(f"FAIL: incremental turn at {sizes[-1]} messages took {largest:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# benchmarks/bench_sse.py
+"""Microbenchmark: shared SSE parser vs the old per-line iter_lines() loop.
+
+Replays recorded-shape Anthropic and OpenRouter streams through a real
+requests.Response (so both parsers see the same network-sized chunks) and
+reports parse time per stream and tokens parsed per second.
+
+Run from the repo root:
+    python benchmarks/bench_sse.py [--tokens 4000] [--repeat 50] [--chunk-sizes 512 8192]
+
+The old loop always reads through iter_lines() (512-byte reads). The providers
+now feed the parser iter_content(chunk_size=None), i.e. whatever the socket
+delivered, so larger chunk sizes model a fast stream arriving in bursts.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sse import iter_sse_json  # noqa: E402
+
+TOKENS = ["the", " liminal", " hallway", " hums", " ░▒▓█", " 世界", " é", "\n", " ...", " ∞"]
+
+
+def record_anthropic_stream(n_tokens):
+    """An Anthropic Messages stream: message_start, text deltas, pings, message_stop"""
+    parts = [b'event: message_start\ndata: {"type":"message_start","message":{"usage":{"input_tokens":100}}}\n\n']
+    for i in range(n_tokens):
+        if i % 50 == 0:
+            parts.append(b'event: ping\ndata: {"type": "ping"}\n\n')
+        delta = {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": TOKENS[i % len(TOKENS)]}}
+        parts.append(b"event: content_block_delta\ndata: " + json.dumps(delta, ensure_ascii=False).encode() + b"\n\n")
+    parts.append(b'event: message_stop\ndata: {"type":"message_stop"}\n\n')
+    return b"".join(parts)
+
+
+def record_openrouter_stream(n_tokens):
+    """An OpenAI-style chat.completions stream as sent by OpenRouter"""
+    parts = [b": OPENROUTER PROCESSING\n\n"]
+    for i in range(n_tokens):
+        chunk = {"id": "gen-1", "object": "chat.completion.chunk", "model": "m",
+                 "choices": [{"index": 0, "delta": {"content": TOKENS[i % len(TOKENS)]}, "finish_reason": None}]}
+        parts.append(b"data: " + json.dumps(chunk, ensure_ascii=False).encode() + b"\n\n")
+    parts.append(b"data: [DONE]\n\n")
+    return b"".join(parts)
+
+
+def make_response(body):
+    """A requests.Response that yields `body` from its raw stream, as a live stream would"""
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(body)
+    return response
+
+
+def old_anthropic_loop(response):
+    """The per-line loop call_claude_api used before the shared parser"""
+    full_response = ""
+    for line in response.iter_lines():
+        if line:
+            line_text = line.decode('utf-8')
+            if line_text.startswith('data: '):
+                json_str = line_text[6:]
+                if json_str.strip() in ['[DONE]', '']:
+                    continue
+                try:
+                    chunk_data = json.loads(json_str)
+                    if chunk_data.get('type') == 'content_block_delta':
+                        delta = chunk_data.get('delta', {})
+                        if delta.get('type') == 'text_delta':
+                            full_response += delta.get('text', '')
+                except json.JSONDecodeError:
+                    continue
+    return full_response
+
+
+def new_anthropic_loop(response, chunk_size):
+    full_response = ""
+    for chunk_data in iter_sse_json(response.iter_content(chunk_size=chunk_size)):
+        if chunk_data.get('type') == 'content_block_delta':
+            delta = chunk_data.get('delta', {})
+            if delta.get('type') == 'text_delta':
+                full_response += delta.get('text', '')
+    return full_response
+
+
+def old_openrouter_loop(response):
+    """The per-line loop call_openrouter_api / call_deepseek_api used before"""
+    full_response = ""
+    for line in response.iter_lines():
+        if line:
+            line_text = line.decode('utf-8')
+            if line_text.startswith('data: '):
+                json_str = line_text[6:]
+                if json_str.strip() == '[DONE]':
+                    break
+                try:
+                    chunk_data = json.loads(json_str)
+                    if 'choices' in chunk_data and len(chunk_data['choices']) > 0:
+                        full_response += chunk_data['choices'][0].get('delta', {}).get('content', '')
+                except json.JSONDecodeError:
+                    continue
+    return full_response
+
+
+def new_openrouter_loop(response, chunk_size):
+    full_response = ""
+    for chunk_data in iter_sse_json(response.iter_content(chunk_size=chunk_size)):
+        if 'choices' in chunk_data and len(chunk_data['choices']) > 0:
+            full_response += chunk_data['choices'][0].get('delta', {}).get('content', '')
+    return full_response
+
+
+def bench(label, body, parse, repeat, n_tokens):
+    """Best-of-`repeat` parse time for one stream"""
+    best = float('inf')
+    text = None
+    for _ in range(repeat):
+        response = make_response(body)
+        start = time.perf_counter()
+        text = parse(response)
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<10} {best * 1000:8.2f} ms/stream  {n_tokens / best:12,.0f} tokens/s")
+    return best, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=4000, help="Tokens per recorded stream")
+    parser.add_argument('--repeat', type=int, default=50, help="Runs per parser (best time is reported)")
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[512, 8192], help="Bytes per network read for the new parser")
+    args = parser.parse_args()
+
+    streams = [
+        ("anthropic", record_anthropic_stream(args.tokens), old_anthropic_loop, new_anthropic_loop),
+        ("openrouter", record_openrouter_stream(args.tokens), old_openrouter_loop, new_openrouter_loop),
+    ]
+    for name, body, old_loop, new_loop in streams:
+        print(f"{name}: {args.tokens} tokens, {len(body):,} bytes")
+        old_time, old_text = bench("old", body, old_loop, args.repeat, args.tokens)
+        for chunk_size in args.chunk_sizes:
+            new_time, new_text = bench(f"new/{chunk_size}", body, lambda r, cs=chunk_size: new_loop(r, cs), args.repeat, args.tokens)
+            assert old_text == new_text, f"{name}: parsers disagree"
+            print(f"  {'speedup':<10} {old_time / new_time:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
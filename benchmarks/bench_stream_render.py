@@ -0,0 +1,131 @@
+# benchmarks/bench_stream_render.py
+"""GUI-thread cost of streaming tokens into the conversation display.
+
+Builds the real main window (offscreen unless QT_QPA_PLATFORM is set) and its
+ConversationManager, then has --streams threads feed --tokens tokens in total
+through Worker.stream_chunk, as provider streams do. It measures the GUI
+thread's CPU time until every token has been drawn, in two modes:
+- per-token: one queued signal and one text-widget insert per token
+- coalesced: chunks batched per AI by the StreamCoalescer and drawn once per
+  frame (STREAM_FLUSH_INTERVAL_MS)
+
+Fails (exit code 1) if the coalesced mode takes more than --budget-ms of
+GUI-thread CPU per 10k tokens.
+
+Run from the repo root:
+    python benchmarks/bench_stream_render.py [--tokens 10000] [--streams 3] [--rate 500] [--budget-ms 500]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QTimer  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+from cancellation import CancellationToken  # noqa: E402
+from gui import LiminalBackroomsApp  # noqa: E402
+from main import ConversationManager, StreamCoalescer, Worker  # noqa: E402
+
+TOKEN = " abc"
+
+
+def run_mode(app, manager, coalesced, tokens, streams, rate):
+    """Stream `tokens` tokens over `streams` threads; returns the measurements"""
+    manager.app.left_pane.clear_conversation()
+    manager._streaming_buffers.clear()
+    expected_chars = tokens * len(TOKEN)
+    counts = {"chars": 0, "deliveries": 0}
+
+    def deliver(ai_name, text):
+        counts["chars"] += len(text)
+        counts["deliveries"] += 1
+        manager.on_streaming_chunk(ai_name, text)
+
+    coalescer = StreamCoalescer(deliver, manager.on_ai_reconnecting) if coalesced else None
+    workers = []
+    for i in range(streams):
+        worker = Worker(f"AI-{i + 1}", [], "benchmark", "", cancel_token=CancellationToken())
+        if coalescer is not None:
+            worker.stream_coalescer = coalescer
+        else:
+            worker.signals.streaming_chunk.connect(deliver)
+        workers.append(worker)
+
+    def produce(worker, count):
+        interval = 1 / rate if rate else 0
+        started = time.perf_counter()
+        for n in range(count):
+            if interval:
+                delay = started + n * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            worker.stream_chunk(TOKEN)
+
+    per_stream = [tokens // streams + (1 if i < tokens % streams else 0) for i in range(streams)]
+    threads = [threading.Thread(target=produce, args=(worker, count)) for worker, count in zip(workers, per_stream)]
+    result = {}
+
+    def check_done():
+        if counts["chars"] < expected_chars or any(t.is_alive() for t in threads):
+            return
+        poll.stop()
+        result["gui_cpu"] = time.thread_time() - cpu_start
+        result["wall"] = time.perf_counter() - wall_start
+        app.quit()
+
+    poll = QTimer()
+    poll.timeout.connect(check_done)
+    cpu_start = time.thread_time()
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    poll.start(5)
+    app.exec()
+    for thread in threads:
+        thread.join()
+    return {
+        "mode": "coalesced" if coalesced else "per-token",
+        "gui_cpu_ms_per_10k": result["gui_cpu"] * 1000 * 10000 / tokens,
+        "wall_s": result["wall"],
+        "deliveries": counts["deliveries"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=10000, help="Tokens streamed in total")
+    parser.add_argument('--streams', type=int, default=3, help="Concurrent streams (AIs)")
+    parser.add_argument('--rate', type=float, default=500, help="Tokens/sec per stream (0 = as fast as possible)")
+    parser.add_argument('--budget-ms', type=float, help="Fail if coalesced GUI CPU per 10k tokens exceeds this")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    with contextlib.redirect_stdout(io.StringIO()):
+        window = LiminalBackroomsApp()
+        manager = ConversationManager(window)
+    window.show()
+
+    print(f"{args.tokens} tokens over {args.streams} streams at "
+          f"{f'{args.rate:g} tok/s each' if args.rate else 'full speed'}")
+    results = [run_mode(app, manager, coalesced, args.tokens, args.streams, args.rate) for coalesced in (False, True)]
+    for row in results:
+        print(f"{row['mode']:<10} GUI thread {row['gui_cpu_ms_per_10k']:8.1f} ms CPU per 10k tokens, "
+              f"{row['deliveries']:6} widget updates, {row['wall_s']:.2f}s wall")
+
+    coalesced = results[1]["gui_cpu_ms_per_10k"]
+    if args.budget_ms is not None and coalesced > args.budget_ms:
+        print(f"FAIL: coalesced streaming took {coalesced:.0f} ms per 10k tokens (budget {args.budget_ms:.0f} ms)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
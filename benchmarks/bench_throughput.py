@@ -0,0 +1,247 @@
+# benchmarks/bench_throughput.py
+"""End-to-end throughput benchmark against the mock provider server.
+
+Starts benchmarks/mock_provider_server.py in a subprocess (so its CPU time is
+not counted here), points the provider base URLs at it, and measures the app's
+own hot paths:
+- turn latency: --turns ai_turn calls per model, p50/p99, and the overhead
+  over what the mock was told to take (ttft + output_tokens / tokens_per_sec)
+- CPU per token: process CPU time (all threads) over the output tokens
+- round loop: ConversationEngine rounds/min, sequential and parallel
+- memory growth: --memory-turns turns (unthrottled mock) against a fixed-size
+  conversation, traced with tracemalloc after a warm-up; anything that keeps
+  growing here is a leak in per-turn state (the turn_metrics history also
+  grows, by a few hundred bytes a turn, until TURN_METRICS_HISTORY is reached)
+
+Fails (exit code 1) when a budget given on the command line is exceeded:
+--max-overhead-p99-ms, --max-cpu-us-per-token, --max-memory-growth-kb.
+
+Run from the repo root:
+    python benchmarks/bench_throughput.py [--turns 30] [--rounds 10] [--memory-turns 500] [--json results.json]
+
+For CI, with budgets:
+    python benchmarks/bench_throughput.py --max-overhead-p99-ms 50 --max-cpu-us-per-token 200 --max-memory-growth-kb 512
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_SERVER = os.path.join(REPO_ROOT, "benchmarks", "mock_provider_server.py")
+
+# One model per emulated protocol (OpenRouter serves raw model IDs)
+DEFAULT_MODELS = ["Claude Haiku 4.5", "GPT-4o", "meta-llama/llama-3.3-70b-instruct"]
+
+
+def start_mock_server(args):
+    """Start the mock server in a subprocess; returns (process, base url)"""
+    command = [
+        sys.executable, MOCK_SERVER, "--port", "0",
+        "--ttft", str(args.ttft), "--tokens-per-sec", str(args.tokens_per_sec),
+        "--output-tokens", str(args.output_tokens), "--error-rate", str(args.error_rate),
+        "--seed", "1",
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if "listening on" not in line:
+        process.kill()
+        raise SystemExit(f"Mock server failed to start: {line!r}")
+    return process, line.rsplit(" ", 1)[-1].strip()
+
+
+def mock_request(url, path, payload=None):
+    """GET (or POST `payload` as JSON to) a /mock/ endpoint"""
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url + path, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def percentile(values, q):
+    from turn_metrics import _percentile
+    return _percentile(values, q)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the app's per-turn logging (into /dev/null, so nothing accumulates)"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def base_conversation():
+    return [{"role": "user", "content": "Describe the room you are standing in."}]
+
+
+def run_turn(model, loop=None):
+    """One turn on a fresh copy of the base conversation; through ai_turn_async when given an event loop"""
+    from conversation_engine import ai_turn, ai_turn_async
+    args = ("AI-1", base_conversation(), model, "You are a benchmark.")
+    if loop is not None:
+        return loop.run_until_complete(ai_turn_async(*args, streaming_callback=lambda chunk: None))
+    return ai_turn(*args, streaming_callback=lambda chunk: None)
+
+
+def bench_latency(models, turns, expected, use_async):
+    """Per-model turn latency and CPU per token"""
+    results = {}
+    # One loop for every turn, as in the app: the async clients are bound to the loop that created them
+    loop = asyncio.new_event_loop() if use_async else None
+    for model in models:
+        with quiet():
+            run_turn(model, loop)  # Warm-up: client creation, rate-limit headers learned
+        durations, output_tokens, errors = [], 0, 0
+        cpu_start = time.process_time()
+        for _ in range(turns):
+            started = time.perf_counter()
+            with quiet():
+                result = run_turn(model, loop)
+            durations.append(time.perf_counter() - started)
+            metrics = result.get("metrics") or {}
+            if metrics.get("status") != "ok":
+                errors += 1
+            output_tokens += metrics.get("output_tokens") or 0
+        cpu = time.process_time() - cpu_start
+        results[model] = {
+            "turns": turns,
+            "errors": errors,
+            "p50_ms": percentile(durations, 0.5) * 1000,
+            "p99_ms": percentile(durations, 0.99) * 1000,
+            "overhead_p50_ms": (percentile(durations, 0.5) - expected) * 1000,
+            "overhead_p99_ms": (percentile(durations, 0.99) - expected) * 1000,
+            "output_tokens": output_tokens,
+            "cpu_us_per_token": cpu / output_tokens * 1e6 if output_tokens else None,
+        }
+    if loop is not None:
+        loop.close()
+    return results
+
+
+def bench_rounds(models, rounds, turn_mode):
+    """ConversationEngine rounds per minute"""
+    from conversation_engine import ConversationEngine
+    engine = ConversationEngine(models, iterations=rounds, turn_mode=turn_mode, use_turn_delay=False,
+                                streaming_callback=lambda ai_name, chunk: None)
+    with quiet():
+        engine.add_user_message("Begin.")
+        started = time.perf_counter()
+        engine.run()
+        elapsed = time.perf_counter() - started
+    return {
+        "rounds": rounds,
+        "seconds": elapsed,
+        "rounds_per_min": rounds / elapsed * 60,
+        "messages": len(engine.conversation),
+    }
+
+
+def bench_memory(model, turns, warmup):
+    """Traced memory growth across `turns` turns after `warmup` turns"""
+    with quiet():
+        for _ in range(warmup):
+            run_turn(model)
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        with quiet():
+            for _ in range(turns):
+                run_turn(model)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "turns": turns,
+        "growth_kb": (current - baseline) / 1024,
+        "peak_kb": (peak - baseline) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', nargs='+', default=DEFAULT_MODELS, help="Models to drive (display names or raw IDs)")
+    parser.add_argument('--turns', type=int, default=30, help="Timed turns per model")
+    parser.add_argument('--rounds', type=int, default=10, help="Rounds per round-loop run")
+    parser.add_argument('--memory-turns', type=int, default=500, help="Turns in the memory-growth run (0 skips it)")
+    parser.add_argument('--ttft', type=float, default=0.05, help="Mock TTFT in seconds")
+    parser.add_argument('--tokens-per-sec', type=float, default=1000, help="Mock stream rate (0 = unthrottled)")
+    parser.add_argument('--output-tokens', type=int, default=200, help="Tokens per mock reply")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of mock requests that fail (exercises retries)")
+    parser.add_argument('--async', dest='use_async', action='store_true', help="Time ai_turn_async instead of ai_turn")
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--max-overhead-p99-ms', type=float, help="Fail if any model's p99 overhead exceeds this")
+    parser.add_argument('--max-cpu-us-per-token', type=float, help="Fail if any model's CPU per token exceeds this")
+    parser.add_argument('--max-memory-growth-kb', type=float, help="Fail if memory grows more than this")
+    args = parser.parse_args()
+
+    process, url = start_mock_server(args)
+    try:
+        # The base URLs are read when shared_utils is imported, so set them first
+        os.environ.update({
+            "ANTHROPIC_BASE_URL": url,
+            "OPENAI_BASE_URL": f"{url}/v1",
+            "OPENROUTER_BASE_URL": f"{url}/v1",
+            "ANTHROPIC_API_KEY": "mock-key",
+            "OPENAI_API_KEY": "mock-key",
+            "OPENROUTER_API_KEY": "mock-key",
+        })
+        sys.path.insert(0, REPO_ROOT)
+
+        expected = args.ttft + (args.output_tokens / args.tokens_per_sec if args.tokens_per_sec else 0)
+        print(f"Mock provider at {url}: ttft {args.ttft}s, {args.output_tokens} tokens at "
+              f"{args.tokens_per_sec or 'unthrottled'} tok/s (server time per turn {expected * 1000:.0f} ms)")
+
+        results = {"latency": bench_latency(args.models, args.turns, expected, args.use_async)}
+        print(f"\n{'model':<36} {'err':>4} {'p50':>8} {'p99':>8} {'ovh p50':>8} {'ovh p99':>8} {'us/tok':>7}")
+        for model, row in results["latency"].items():
+            cpu = "-" if row["cpu_us_per_token"] is None else f"{row['cpu_us_per_token']:.0f}"
+            print(f"{model[:36]:<36} {row['errors']:>4} {row['p50_ms']:>6.0f}ms {row['p99_ms']:>6.0f}ms "
+                  f"{row['overhead_p50_ms']:>6.0f}ms {row['overhead_p99_ms']:>6.0f}ms {cpu:>7}")
+
+        results["rounds"] = {}
+        for turn_mode in ("sequential", "parallel"):
+            row = bench_rounds(args.models, args.rounds, turn_mode)
+            results["rounds"][turn_mode] = row
+            print(f"\nRound loop ({turn_mode}, {len(args.models)} AIs): {row['rounds_per_min']:.1f} rounds/min "
+                  f"({row['rounds']} rounds in {row['seconds']:.1f}s)")
+
+        if args.memory_turns:
+            mock_request(url, "/mock/settings", {"ttft": 0, "tokens_per_sec": 0})
+            row = bench_memory(args.models[0], args.memory_turns, warmup=min(50, args.memory_turns))
+            results["memory"] = row
+            print(f"\nMemory over {row['turns']} turns ({args.models[0]}): {row['growth_kb']:+.0f} KB retained, "
+                  f"peak {row['peak_kb']:.0f} KB")
+
+        results["mock_stats"] = mock_request(url, "/mock/stats")["stats"]
+    finally:
+        process.terminate()
+        process.wait()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    for model, row in results["latency"].items():
+        if args.max_overhead_p99_ms is not None and row["overhead_p99_ms"] > args.max_overhead_p99_ms:
+            failures.append(f"{model}: p99 overhead {row['overhead_p99_ms']:.0f} ms > {args.max_overhead_p99_ms:.0f} ms")
+        if (args.max_cpu_us_per_token is not None and row["cpu_us_per_token"] is not None
+                and row["cpu_us_per_token"] > args.max_cpu_us_per_token):
+            failures.append(f"{model}: {row['cpu_us_per_token']:.0f} us CPU per token > {args.max_cpu_us_per_token:.0f}")
+    if (args.max_memory_growth_kb is not None and "memory" in results
+            and results["memory"]["growth_kb"] > args.max_memory_growth_kb):
+        failures.append(f"memory grew {results['memory']['growth_kb']:.0f} KB > {args.max_memory_growth_kb:.0f} KB")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# benchmarks/bench_transcript_view.py
+"""Frame times of the conversation display with very long transcripts.
+
+Builds a ConversationPane (offscreen unless QT_QPA_PLATFORM is set), loads a
+synthetic transcript of --messages messages of ASCII-art-sized replies, and
+times what a user would feel, each followed by a synchronous repaint:
+- load: showing the whole transcript at once (e.g. switching branches)
+- append: one new reply, rendered twice as ConversationManager does
+- stream: one frame's worth of streamed text
+- scroll: wheel-sized steps down the transcript, and random jumps
+- select: dragging a selection over a few messages
+
+The virtualized TranscriptView (VIRTUAL_TRANSCRIPT) is measured by default;
+--compare also measures the single-QTextEdit display, which takes a while
+to build at these sizes.
+
+Fails (exit code 1) if the virtualized view's p99 for append, stream or
+scroll exceeds --budget-ms.
+
+Run from the repo root:
+    python benchmarks/bench_transcript_view.py [--messages 10000] [--lines 20] [--compare] [--budget-ms 16]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QPoint, Qt  # noqa: E402
+from PyQt6.QtTest import QTest  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+import gui  # noqa: E402
+
+SAMPLES = 50
+
+
+def make_message(i, lines):
+    """The i-th message of the synthetic transcript (mostly ASCII-art replies)"""
+    if i % 5 == 0:
+        return {"role": "user", "content": f"Message {i}: draw the next room."}
+    row = "".join("#/\\_|"[(i + j) % 5] for j in range(72))
+    art = "\n".join(row[k:] + row[:k] for k in range(lines))
+    return {"role": "assistant", "ai_name": f"AI-{i % 3 + 1}", "model": "Benchmark",
+            "content": f"Room {i}:\n```\n{art}\n```\nThe hallway continues."}
+
+
+def percentile(values, q):
+    from turn_metrics import _percentile
+    return _percentile(values, q)
+
+
+def timed(pane, action):
+    """Seconds for `action` plus a synchronous repaint of the display"""
+    started = time.perf_counter()
+    action()
+    pane.conversation_display.viewport().repaint()
+    return time.perf_counter() - started
+
+
+def bench(app, virtual, messages, lines):
+    """Frame times (ms) for one kind of display"""
+    gui.VIRTUAL_TRANSCRIPT = virtual
+    pane = gui.ConversationPane()
+    pane.resize(900, 1000)
+    pane.show()
+    app.processEvents()
+    display = pane.conversation_display
+    scrollbar = display.verticalScrollBar()
+    conversation = [make_message(i, lines) for i in range(messages)]
+    results = {}
+
+    # display_conversation prints a debug dump of the messages it renders
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["load"] = [timed(pane, lambda: pane.display_conversation(list(conversation)))]
+        app.processEvents()
+
+        def append():
+            conversation.append(make_message(len(conversation), lines))
+            pane.display_conversation(list(conversation))
+            pane.display_conversation(list(conversation))
+        results["append"] = [timed(pane, append) for _ in range(SAMPLES)]
+
+    results["stream"] = [timed(pane, lambda: pane.append_text("token " * 10, "ai")) for _ in range(SAMPLES)]
+
+    scrollbar.setValue(0)
+    app.processEvents()
+    step = scrollbar.singleStep()
+    results["scroll"] = [timed(pane, lambda: scrollbar.setValue(scrollbar.value() + step)) for _ in range(SAMPLES)]
+    rng = random.Random(1)
+    results["jump"] = [timed(pane, lambda: scrollbar.setValue(rng.randrange(scrollbar.maximum() + 1)))
+                       for _ in range(SAMPLES)]
+
+    viewport = display.viewport()
+
+    def select():
+        QTest.mousePress(viewport, Qt.MouseButton.LeftButton, Qt.KeyboardModifier.NoModifier, QPoint(20, 10))
+        QTest.mouseMove(viewport, QPoint(200, viewport.height() - 10))
+        QTest.mouseRelease(viewport, Qt.MouseButton.LeftButton, Qt.KeyboardModifier.NoModifier,
+                           QPoint(200, viewport.height() - 10))
+        pane.selected_text()
+    results["select"] = [timed(pane, select) for _ in range(10)]
+
+    pane.close()
+    pane.deleteLater()
+    app.processEvents()
+    return {name: [t * 1000 for t in times] for name, times in results.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=10000, help="Messages in the transcript")
+    parser.add_argument('--lines', type=int, default=20, help="ASCII-art lines per reply")
+    parser.add_argument('--compare', action='store_true', help="Also measure the single-QTextEdit display")
+    parser.add_argument('--budget-ms', type=float, help="Fail if the virtualized p99 append/stream/scroll frame exceeds this")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    modes = [("virtual", True)] + ([("textedit", False)] if args.compare else [])
+    size_mb = sum(len(make_message(i, args.lines)["content"]) for i in range(args.messages)) / 1e6
+    print(f"{args.messages} messages ({size_mb:.1f} MB of text)")
+
+    all_results = {}
+    for name, virtual in modes:
+        all_results[name] = bench(app, virtual, args.messages, args.lines)
+        print(f"\n{name}")
+        for action, times in all_results[name].items():
+            if len(times) == 1:
+                print(f"  {action:<7} {times[0]:9.1f} ms")
+            else:
+                print(f"  {action:<7} p50 {percentile(times, 0.5):7.1f} ms   p99 {percentile(times, 0.99):7.1f} ms")
+
+    if args.budget_ms is not None:
+        virtual = all_results["virtual"]
+        slow = [action for action in ("append", "stream", "scroll", "jump")
+                if percentile(virtual[action], 0.99) > args.budget_ms]
+        if slow:
+            print(f"FAIL: p99 over {args.budget_ms:.0f} ms for {', '.join(slow)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+# benchmarks/mock_provider_server.py
+"""Local stand-in for the provider APIs, for benchmarks and offline runs.
+
+Speaks enough of each protocol for the app's own clients:
+- Anthropic Messages: POST /v1/messages (SSE when "stream" is true)
+- OpenAI and OpenRouter chat completions: POST /v1/chat/completions (SSE when
+  "stream" is true; the usage chunk is sent when the request asks for it)
+- Sora: POST /v1/videos, GET /v1/videos/{id}, GET /v1/videos/{id}/content
+
+Gemini (google-generativeai SDK) is not emulated.
+
+Knobs (MockSettings; command-line flags of the same names):
+    ttft            seconds before the first token (plus up to ttft_jitter)
+    tokens_per_sec  output rate of a stream; 0 sends as fast as possible
+    output_tokens   tokens per reply, each token_chars characters long
+    error_rate      fraction of requests answered with error_status
+                    (529 for Anthropic, 503 otherwise, unless set)
+    retry_after     Retry-After seconds sent with injected errors (none if unset)
+    drop_rate       fraction of streams cut off halfway (connection closed)
+    video_bytes, video_render_seconds
+                    size of a Sora download and how long a job "renders"
+
+Every response reports generous rate limits, so the app's limiter learns it
+need not throttle. GET /mock/stats returns request counters; POST
+/mock/settings with a JSON object changes knobs while the server runs.
+
+Anthropic prompt caching is emulated: every cache_control breakpoint in a
+request writes its prefix to the cache, and usage reports the longest
+previously written prefix as cache_read_input_tokens. The JSON bodies of
+the last few requests are kept in MockProviderServer.captured, for tests.
+
+Run from the repo root:
+    python benchmarks/mock_provider_server.py [--port 8765] [--ttft 0.2] [--tokens-per-sec 100]
+
+Then point the app at it before starting it (the base URLs are read at import):
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+    OPENROUTER_BASE_URL=http://127.0.0.1:8765/v1
+(plus any non-empty ANTHROPIC_API_KEY / OPENAI_API_KEY / OPENROUTER_API_KEY).
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ["the", "signal", "drifts", "through", "static", "and", "folds", "into", "light", "again"]
+
+
+class MockSettings:
+    """Behaviour of the mock server (see the module docstring)"""
+
+    def __init__(self, ttft=0.2, ttft_jitter=0.0, tokens_per_sec=100.0, output_tokens=200, token_chars=5,
+                 error_rate=0.0, error_status=None, retry_after=None, drop_rate=0.0, video_bytes=1024 * 1024,
+                 video_render_seconds=2.0, seed=None):
+        self.ttft = ttft
+        self.ttft_jitter = ttft_jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.output_tokens = output_tokens
+        self.token_chars = token_chars
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.drop_rate = drop_rate
+        self.video_bytes = video_bytes
+        self.video_render_seconds = video_render_seconds
+        self.seed = seed
+
+    def update(self, values):
+        """Change knobs from a dict; unknown keys raise ValueError"""
+        for key, value in values.items():
+            if not hasattr(self, key):
+                raise ValueError(f"Unknown setting '{key}'")
+            setattr(self, key, value)
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def make_tokens(count, chars):
+    """`count` reply tokens of `chars` characters each (a leading space, then a word)"""
+    tokens = []
+    for i in range(count):
+        word = WORDS[i % len(WORDS)]
+        tokens.append((" " + word * (chars // len(word) + 1))[:max(1, chars)])
+    return tokens
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockProvider/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # --- plumbing -------------------------------------------------------
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.server.count("request_bytes", len(body))
+        try:
+            return json.loads(body) if body else {}, len(body)
+        except ValueError:
+            return None, len(body)
+
+    def _rate_limit_headers(self):
+        reset = (datetime.now(timezone.utc) + timedelta(seconds=60)).isoformat().replace("+00:00", "Z")
+        return {
+            "anthropic-ratelimit-requests-limit": "100000",
+            "anthropic-ratelimit-requests-remaining": "99999",
+            "anthropic-ratelimit-requests-reset": reset,
+            "x-ratelimit-limit-requests": "100000",
+            "x-ratelimit-remaining-requests": "99999",
+            "x-ratelimit-reset-requests": "60s",
+        }
+
+    def _send_json(self, status, payload, rate_headers=True, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if rate_headers:
+            for name, value in self._rate_limit_headers().items():
+                self.send_header(name, value)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in self._rate_limit_headers().items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+        self.server.count("stream_bytes", len(data))
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _inject_error(self, default_status, body):
+        """Answer with an error if error_rate says so; True when it did"""
+        settings = self.server.settings
+        if settings.error_rate and self.server.random() < settings.error_rate:
+            self.server.count("errors_injected")
+            headers = {"Retry-After": str(settings.retry_after)} if settings.retry_after is not None else None
+            self._send_json(settings.error_status or default_status, body, rate_headers=False, headers=headers)
+            return True
+        return False
+
+    def _stream_tokens(self, tokens, write_token):
+        """Pace the tokens (TTFT, then tokens_per_sec); False if the stream was dropped"""
+        settings = self.server.settings
+        ttft = settings.ttft + (self.server.random() * settings.ttft_jitter if settings.ttft_jitter else 0)
+        drop_at = None
+        if settings.drop_rate and self.server.random() < settings.drop_rate:
+            drop_at = len(tokens) // 2
+        time.sleep(max(0.0, ttft))
+        first = time.monotonic()
+        for i, token in enumerate(tokens):
+            if i == drop_at:
+                self.server.count("streams_dropped")
+                self.close_connection = True
+                return False
+            if settings.tokens_per_sec:
+                delay = first + i / settings.tokens_per_sec - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            write_token(token)
+        return True
+
+    # --- routes -----------------------------------------------------------
+
+    def do_GET(self):
+        if self.path == "/mock/stats":
+            self._send_json(200, {"stats": self.server.get_stats(), "settings": self.server.settings.as_dict()})
+        elif self.path.startswith("/v1/videos/"):
+            self._video_get(self.path[len("/v1/videos/"):])
+        else:
+            self._send_json(404, {"error": {"message": f"No route for GET {self.path}"}})
+
+    def do_POST(self):
+        payload, size = self._read_json()
+        if payload is None:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+        if self.path == "/mock/settings":
+            try:
+                self.server.settings.update(payload)
+            except ValueError as e:
+                self._send_json(400, {"error": {"message": str(e)}})
+                return
+            self._send_json(200, self.server.settings.as_dict())
+            return
+        self.server.count("requests")
+        self.server.captured.append((self.path, payload))
+        if self.path == "/v1/messages":
+            self._anthropic(payload)
+        elif self.path == "/v1/chat/completions":
+            self._chat_completions(payload, size)
+        elif self.path == "/v1/videos":
+            self._video_create(payload)
+        else:
+            self._send_json(404, {"error": {"message": f"No route for POST {self.path}"}})
+
+    def _anthropic(self, payload):
+        if self._inject_error(529, {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded (mock)"}}):
+            return
+        settings = self.server.settings
+        tokens = make_tokens(settings.output_tokens, settings.token_chars)
+        message_id = f"msg_mock_{uuid.uuid4().hex[:12]}"
+        model = payload.get("model", "mock")
+        usage = self.server.cache_usage(payload)
+        if not payload.get("stream"):
+            time.sleep(settings.ttft)
+            self._send_json(200, {
+                "id": message_id, "type": "message", "role": "assistant", "model": model,
+                "content": [{"type": "text", "text": "".join(tokens)}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": dict(usage, output_tokens=len(tokens)),
+            })
+            return
+
+        def event(name, data):
+            self._write_chunk(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+
+        self._start_stream()
+        event("message_start", {"type": "message_start", "message": {
+            "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+            "stop_reason": None, "usage": dict(usage, output_tokens=1)}})
+        event("content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}})
+        event("ping", {"type": "ping"})
+        completed = self._stream_tokens(tokens, lambda token: event("content_block_delta", {
+            "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}}))
+        if not completed:
+            return
+        event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        event("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": len(tokens)}})
+        event("message_stop", {"type": "message_stop"})
+        self._end_stream()
+
+    def _chat_completions(self, payload, size):
+        if self._inject_error(503, {"error": {"message": "Service unavailable (mock)", "type": "server_error", "code": 503}}):
+            return
+        settings = self.server.settings
+        tokens = make_tokens(settings.output_tokens, settings.token_chars)
+        completion_id = f"chatcmpl-mock{uuid.uuid4().hex[:12]}"
+        model = payload.get("model", "mock")
+        created = int(time.time())
+        usage = {"prompt_tokens": max(1, size // 4), "completion_tokens": len(tokens),
+                 "total_tokens": max(1, size // 4) + len(tokens)}
+        if not payload.get("stream"):
+            time.sleep(settings.ttft)
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        def chunk(choices, **extra):
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                    "model": model, "choices": choices, **extra}
+            self._write_chunk(f"data: {json.dumps(data)}\n\n".encode())
+
+        self._start_stream()
+        # OpenRouter sends comment lines while the model warms up
+        self._write_chunk(b": MOCK PROCESSING\n\n")
+        chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        completed = self._stream_tokens(tokens, lambda token: chunk(
+            [{"index": 0, "delta": {"content": token}, "finish_reason": None}]))
+        if not completed:
+            return
+        chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (payload.get("stream_options") or {}).get("include_usage") or payload.get("usage"):
+            chunk([], usage=usage)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._end_stream()
+
+    def _video_create(self, payload):
+        if self._inject_error(503, {"error": {"message": "Service unavailable (mock)", "type": "server_error"}}):
+            return
+        video_id = f"video_mock_{uuid.uuid4().hex[:12]}"
+        job = {"id": video_id, "object": "video", "model": payload.get("model", "sora-2"),
+               "seconds": payload.get("seconds", "4"), "size": payload.get("size", "1280x720"),
+               "created_at": int(time.time())}
+        self.server.jobs[video_id] = (time.monotonic(), job)
+        self._send_json(200, dict(job, status="queued", progress=0))
+
+    def _video_get(self, rest):
+        video_id, _, tail = rest.partition("/")
+        entry = self.server.jobs.get(video_id)
+        if entry is None:
+            self._send_json(404, {"error": {"message": f"Video {video_id} not found"}})
+            return
+        started, job = entry
+        render_seconds = self.server.settings.video_render_seconds
+        progress = 100 if render_seconds <= 0 else min(100, int((time.monotonic() - started) / render_seconds * 100))
+        status = "completed" if progress >= 100 else ("queued" if progress == 0 else "in_progress")
+        if tail == "content":
+            if status != "completed":
+                self._send_json(409, {"error": {"message": "Video is not ready"}})
+                return
+            self._video_content()
+        elif not tail:
+            self._send_json(200, dict(job, status=status, progress=progress))
+        else:
+            self._send_json(404, {"error": {"message": f"No route for GET {self.path}"}})
+
+    def _video_content(self):
+        size = self.server.settings.video_bytes
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        block = (b"\x00\x00\x00\x18ftypmp42" + bytes(64 * 1024))[:64 * 1024]
+        sent = 0
+        while sent < size:
+            part = block[:size - sent]
+            self.wfile.write(part)
+            sent += len(part)
+        self.server.count("video_bytes", size)
+
+
+class MockProviderServer(ThreadingHTTPServer):
+    """The mock server; start() serves from a background thread
+
+    Args:
+        settings: MockSettings (default: MockSettings())
+        host, port: Where to listen (port 0 picks a free one)
+        verbose: Log every request to stderr
+    """
+
+    daemon_threads = True
+
+    def __init__(self, settings=None, host="127.0.0.1", port=0, verbose=False):
+        super().__init__((host, port), _Handler)
+        self.settings = settings or MockSettings()
+        self.verbose = verbose
+        self.jobs = {}
+        self.captured = collections.deque(maxlen=50)  # (path, JSON body) of recent API requests
+        self._cached_prefixes = set()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self._random = random.Random(self.settings.seed)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Environment variables that point the app at this server"""
+        return {
+            "ANTHROPIC_BASE_URL": self.url,
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "OPENROUTER_BASE_URL": f"{self.url}/v1",
+            "ANTHROPIC_API_KEY": "mock-key",
+            "OPENAI_API_KEY": "mock-key",
+            "OPENROUTER_API_KEY": "mock-key",
+        }
+
+    def random(self):
+        with self._stats_lock:
+            return self._random.random()
+
+    def count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] = self._stats.get(key, 0) + amount
+
+    def cache_usage(self, payload):
+        """Anthropic input-token usage of a request, emulating the prompt cache
+
+        Tokens are estimated at 4 characters of JSON per token. The prefix up
+        to each cache_control breakpoint is written to the cache.
+        """
+        system = payload.get("system") or []
+        blocks = [{"type": "text", "text": system}] if isinstance(system, str) else list(system)
+        for message in payload.get("messages", []):
+            content = message.get("content")
+            parts = [{"type": "text", "text": content}] if isinstance(content, str) else content or []
+            blocks.extend(dict(part, role=message.get("role")) for part in parts)
+
+        digest = hashlib.sha256()
+        total = read = written = 0
+        breakpoints = []
+        for block in blocks:
+            encoded = json.dumps({k: v for k, v in block.items() if k != "cache_control"}, sort_keys=True)
+            digest.update(encoded.encode())
+            total += len(encoded) // 4 + 1
+            if block.get("cache_control"):
+                breakpoints.append((digest.hexdigest(), total))
+        with self._stats_lock:
+            for prefix, tokens in breakpoints:
+                if prefix in self._cached_prefixes:
+                    read = tokens
+            if breakpoints:
+                written = max(0, breakpoints[-1][1] - read)
+                self._cached_prefixes.update(prefix for prefix, _ in breakpoints)
+        return {"input_tokens": max(1, total - read - written),
+                "cache_creation_input_tokens": written, "cache_read_input_tokens": read}
+
+    def get_stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-provider", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    defaults = MockSettings()
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765, help="0 picks a free port")
+    parser.add_argument('--ttft', type=float, default=defaults.ttft, help="Seconds before the first token")
+    parser.add_argument('--ttft-jitter', type=float, default=defaults.ttft_jitter, help="Random extra TTFT, up to this many seconds")
+    parser.add_argument('--tokens-per-sec', type=float, default=defaults.tokens_per_sec, help="Stream rate (0 = unthrottled)")
+    parser.add_argument('--output-tokens', type=int, default=defaults.output_tokens, help="Tokens per reply")
+    parser.add_argument('--token-chars', type=int, default=defaults.token_chars, help="Characters per token")
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate, help="Fraction of requests that fail")
+    parser.add_argument('--error-status', type=int, default=None, help="Status of injected errors (default 529/503)")
+    parser.add_argument('--retry-after', type=float, default=None, help="Retry-After seconds sent with injected errors")
+    parser.add_argument('--drop-rate', type=float, default=defaults.drop_rate, help="Fraction of streams cut off halfway")
+    parser.add_argument('--video-bytes', type=int, default=defaults.video_bytes, help="Size of Sora downloads")
+    parser.add_argument('--video-render-seconds', type=float, default=defaults.video_render_seconds, help="Sora job duration")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for error and drop injection")
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        ttft=args.ttft, ttft_jitter=args.ttft_jitter, tokens_per_sec=args.tokens_per_sec,
+        output_tokens=args.output_tokens, token_chars=args.token_chars, error_rate=args.error_rate,
+        error_status=args.error_status, retry_after=args.retry_after, drop_rate=args.drop_rate, video_bytes=args.video_bytes,
+        video_render_seconds=args.video_render_seconds, seed=args.seed,
+    )
+    server = MockProviderServer(settings, args.host, args.port, verbose=args.verbose)
+    # First line of output is parsed by bench_throughput.py
+    print(f"Mock provider listening on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
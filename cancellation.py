@@ -0,0 +1,67 @@
+# cancellation.py
+"""Cooperative cancellation for in-flight provider calls.
+
+A CancellationToken is passed down into the streaming code. Cancelling it
+runs the close callbacks registered by whoever is blocked on the network
+(e.g. response.close), so a thread stuck reading a stream wakes up at once,
+and the streaming loops raise Cancelled instead of retrying or returning
+partial text.
+"""
+
+import threading
+
+
+class Cancelled(Exception):
+    """The operation was cancelled through its CancellationToken"""
+
+
+class CancellationToken:
+    """Thread-safe cancel flag plus callbacks that unblock pending I/O"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """Mark as cancelled and run every registered callback (once)"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in cancellation callback: {e}")
+
+    def on_cancel(self, callback):
+        """Run callback() on cancel (right away if already cancelled)
+
+        Returns:
+            A function that unregisters the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise Cancelled("cancelled")
+
+    def wait(self, timeout):
+        """Sleep up to `timeout` seconds; returns True if cancelled meanwhile"""
+        return self._event.wait(timeout)
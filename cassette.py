@@ -0,0 +1,448 @@
+# cassette.py
+"""Record provider HTTP traffic to a cassette and replay it without a network.
+
+Recording captures every request sent through shared_utils.http_request (the
+Claude, OpenRouter, DeepSeek and Sora calls) and the OpenAI SDK client (see
+cassette_httpx.py) at the transport level. It
+stores the request body, the response status and headers, and the raw
+response bytes with the time each chunk arrived. Replaying serves those
+bytes back through the same sessions and client, so SSE parsing, retries,
+context building and rendering all run as they did live.
+
+Cassette format: gzip-compressed JSONL. A header line is followed by one line
+per request:
+
+    {"method", "url", "request": JSON body (or text, or null), "status",
+     "reason", "headers", "connect": seconds to response headers,
+     "t": [ms after the headers at which each chunk arrived],
+     "n": [byte length of each chunk],
+     "text": the body as UTF-8 (or "b64": base64 for binary bodies),
+     "complete": False if the body was not read to the end}
+
+Request headers (API keys) are not stored. Bodies are stored decoded (after
+gzip etc.), so Content-Encoding is dropped from the headers.
+
+Replay matches requests by method and URL, in recorded order, preferring the
+first one with an identical body. A GET with nothing left repeats its last
+response (e.g. extra Sora polls). An unmatched request raises CassetteError.
+Speed 1.0 reproduces the original timing; 10 runs ten times faster; 0 sends
+everything as fast as possible.
+
+Turn it on with CASSETTE_MODE/CASSETTE_PATH/CASSETTE_REPLAY_SPEED in config.py
+or headless.py --record/--replay/--replay-speed. The other provider SDKs
+(Gemini, Claude vision, Replicate) and async provider mode
+(USE_ASYNC_PROVIDERS) cannot be captured: check_uncaptured() makes them
+raise CassetteError while replaying instead of going out live, and warns
+while recording.
+"""
+
+import atexit
+import base64
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.exceptions import ProtocolError
+
+from config import CASSETTE_MODE, CASSETTE_PATH, CASSETTE_REPLAY_SPEED
+
+CASSETTE_VERSION = 1
+
+_lock = threading.RLock()
+_active = None
+_configured = False
+
+
+class CassetteError(Exception):
+    """A replayed request has no recorded response, or a cassette cannot be read"""
+
+
+def decode_body(body):
+    """A request body (bytes or str) as JSON if it parses, else text, else None"""
+    if body is None:
+        return None
+    if isinstance(body, bytes):
+        try:
+            body = body.decode("utf-8")
+        except UnicodeDecodeError:
+            return base64.b64encode(body).decode("ascii")
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body
+
+
+def _body_key(body):
+    return json.dumps(body, sort_keys=True)
+
+
+class RecordingBody:
+    """Stands in for a response's urllib3 body, copying the bytes as they are read"""
+
+    def __init__(self, raw, recorder, entry):
+        self._raw = raw
+        self._recorder = recorder
+        self._entry = entry
+        self._started = time.monotonic()
+        self._times = []
+        self._chunks = []
+        self._finished = False
+
+    def __getattr__(self, name):
+        # Everything else (the socket for _abort_response, headers, ...) is the real body's
+        return getattr(self._raw, name)
+
+    def _capture(self, data):
+        if data:
+            self._times.append(round((time.monotonic() - self._started) * 1000, 1))
+            self._chunks.append(data)
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        try:
+            for data in self._raw.stream(amt, decode_content=True):
+                self._capture(data)
+                yield data
+        except Exception:
+            self._finish(complete=False)
+            raise
+        self._finish(complete=True)
+
+    def read(self, amt=None, decode_content=None, **kwargs):
+        data = self._raw.read(amt, decode_content=True, **kwargs)
+        self._capture(data)
+        if amt is None or not data:
+            self._finish(complete=True)
+        return data
+
+    def release_conn(self):
+        self._finish(complete=False)
+        self._raw.release_conn()
+
+    def close(self):
+        self._finish(complete=False)
+        self._raw.close()
+
+    def _finish(self, complete):
+        if self._finished:
+            return
+        self._finished = True
+        self._recorder.add(self._entry, self._times, self._chunks, complete)
+
+
+class ReplayBody:
+    """A recorded response body, served at the recorded pace (scaled by speed)"""
+
+    def __init__(self, times, chunks, speed):
+        self._times = times
+        self._chunks = chunks
+        self._speed = speed
+        self._started = time.monotonic()
+        self._aborted = threading.Event()
+        self._position = 0
+        self.closed = False
+
+    def abort(self):
+        """Make a blocked read fail at once (see shared_utils._abort_response)"""
+        self._aborted.set()
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        while self._position < len(self._chunks):
+            if self._speed:
+                delay = self._started + self._times[self._position] / 1000 / self._speed - time.monotonic()
+                if delay > 0:
+                    self._aborted.wait(delay)
+            if self._aborted.is_set() or self.closed:
+                raise ProtocolError("Replayed response aborted")
+            data = self._chunks[self._position]
+            self._position += 1
+            yield data
+
+    def read(self, amt=None, decode_content=None, **kwargs):
+        return b"".join(self.stream())
+
+    def release_conn(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class Recorder:
+    """Appends recorded requests to a cassette file"""
+
+    mode = "record"
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._file.write(json.dumps({"cassette": CASSETTE_VERSION, "created": datetime.now().isoformat()}) + "\n")
+        self._write_lock = threading.RLock()
+        self.count = 0
+
+    def add(self, entry, times, chunks, complete):
+        body = b"".join(chunks)
+        entry = dict(entry, t=times, n=[len(c) for c in chunks], complete=complete)
+        try:
+            entry["text"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["b64"] = base64.b64encode(body).decode("ascii")
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._write_lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._file.flush()
+            self.count += 1
+
+    def adapter(self, inner):
+        return _RecordingAdapter(self, inner)
+
+    def httpx_transport(self, inner):
+        from cassette_httpx import RecordingTransport
+        return RecordingTransport(self, inner)
+
+    def close(self):
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        print(f"Recorded {self.count} requests to {self.path}")
+
+
+class Player:
+    """Serves the responses of a cassette file"""
+
+    mode = "replay"
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self._queues = {}
+        self._last = {}
+        self._queue_lock = threading.RLock()
+        for entry in load_cassette(path):
+            self._queues.setdefault((entry["method"], entry["url"]), deque()).append(entry)
+        self.count = sum(len(queue) for queue in self._queues.values())
+
+    def next_response(self, method, url, body):
+        """The recorded entry for a request (see the module docstring for matching)"""
+        key = (method, url)
+        with self._queue_lock:
+            queue = self._queues.get(key)
+            if queue:
+                wanted = _body_key(body)
+                entry = next((e for e in queue if _body_key(e.get("request")) == wanted), queue[0])
+                queue.remove(entry)
+                self._last[key] = entry
+                return entry
+            if method == "GET" and key in self._last:
+                return self._last[key]
+        raise CassetteError(f"No recorded response for {method} {url} in {self.path}")
+
+    def chunks(self, entry):
+        """(times, chunks) of an entry's body, split as it arrived"""
+        if "b64" in entry:
+            body = base64.b64decode(entry["b64"])
+        else:
+            body = entry.get("text", "").encode("utf-8")
+        chunks, offset = [], 0
+        for length in entry.get("n", []):
+            chunks.append(body[offset:offset + length])
+            offset += length
+        return entry.get("t", []), chunks
+
+    def adapter(self, inner):
+        return _ReplayAdapter(self)
+
+    def httpx_transport(self, inner):
+        from cassette_httpx import ReplayTransport
+        return ReplayTransport(self)
+
+    def close(self):
+        pass
+
+
+class _RecordingAdapter(BaseAdapter):
+    def __init__(self, recorder, inner):
+        super().__init__()
+        self.recorder = recorder
+        self.inner = inner
+
+    def __getattr__(self, name):
+        # poolmanager etc. for get_connection_metrics()
+        return getattr(self.inner, name)
+
+    def send(self, request, **kwargs):
+        started = time.monotonic()
+        response = self.inner.send(request, **kwargs)
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-encoding"}
+        if len(headers) != len(response.headers):
+            headers.pop("Content-Length", None)
+            headers.pop("content-length", None)
+        entry = {
+            "method": request.method,
+            "url": request.url,
+            "request": decode_body(request.body),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": headers,
+            "connect": round(time.monotonic() - started, 4),
+        }
+        response.raw = RecordingBody(response.raw, self.recorder, entry)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class _ReplayAdapter(BaseAdapter):
+    def __init__(self, player):
+        super().__init__()
+        self.player = player
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        entry = self.player.next_response(request.method, request.url, decode_body(request.body))
+        if self.player.speed:
+            time.sleep(entry.get("connect", 0) / self.player.speed)
+        times, chunks = self.player.chunks(entry)
+
+        response = Response()
+        response.status_code = entry["status"]
+        response.reason = entry.get("reason")
+        response.headers = CaseInsensitiveDict(entry.get("headers", {}))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = ReplayBody(times, chunks, self.player.speed)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+
+def load_cassette(path):
+    """Read a cassette's recorded requests (list of dicts, in recorded order)"""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+    except (OSError, EOFError) as e:
+        raise CassetteError(f"Cannot read cassette {path}: {e}") from e
+    if not lines:
+        raise CassetteError(f"Cassette {path} is empty")
+    header = json.loads(lines[0])
+    if header.get("cassette") != CASSETTE_VERSION:
+        raise CassetteError(f"{path} is not a version {CASSETTE_VERSION} cassette")
+    return [json.loads(line) for line in lines[1:]]
+
+
+def _activate(cassette):
+    global _active, _configured
+    with _lock:
+        previous, _active, _configured = _active, cassette, True
+    if previous is not None:
+        previous.close()
+
+
+def _reset_sessions():
+    # Pooled sessions and SDK clients built before now would bypass the cassette (or keep using it)
+    from providers import reset_client
+    from shared_utils import close_http_sessions
+    close_http_sessions()
+    reset_client("openai")
+
+
+def _recorder(path):
+    print(f"Recording provider traffic to {path}")
+    return Recorder(path)
+
+
+def _player(path, speed):
+    player = Player(path, speed)
+    print(f"Replaying {player.count} recorded requests from {path} "
+          f"({'as fast as possible' if not speed else f'{speed:g}x speed'})")
+    return player
+
+
+def start_recording(path):
+    """Record provider traffic to the cassette at `path` (overwritten)"""
+    _activate(_recorder(path))
+    _reset_sessions()
+
+
+def start_replay(path, speed=1.0):
+    """Serve provider traffic from the cassette at `path`
+
+    Args:
+        speed: Multiple of the recorded pace (0 = as fast as possible)
+    """
+    _activate(_player(path, speed))
+    _reset_sessions()
+
+
+def stop_cassette():
+    """Stop recording or replaying (closes the cassette file)"""
+    _activate(None)
+    _reset_sessions()
+
+
+def get_cassette():
+    """The active Recorder or Player (None if neither), starting one from config on first use"""
+    with _lock:
+        if not _configured:
+            if CASSETTE_MODE == "record":
+                _activate(_recorder(CASSETTE_PATH))
+            elif CASSETTE_MODE == "replay":
+                _activate(_player(CASSETTE_PATH, CASSETTE_REPLAY_SPEED))
+            else:
+                _activate(None)
+        return _active
+
+
+def wrap_adapter(adapter):
+    """The transport adapter a new pooled session should mount: `adapter`
+    itself, or a recording/replaying one while a cassette is active"""
+    cassette = get_cassette()
+    return cassette.adapter(adapter) if cassette is not None else adapter
+
+
+def wrap_httpx_transport(make_transport):
+    """The httpx transport an SDK client should be built on while a cassette
+    is active (None otherwise); make_transport() builds the real one"""
+    cassette = get_cassette()
+    return cassette.httpx_transport(make_transport()) if cassette is not None else None
+
+
+_warned = set()
+
+
+def check_uncaptured(source):
+    """Guard a provider call whose traffic bypasses the cassette
+
+    Replaying raises CassetteError instead of letting the request go out
+    live; recording warns once per source that the cassette will lack it.
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return
+    if cassette.mode == "replay":
+        raise CassetteError(f"{source} traffic cannot be replayed from a cassette ({cassette.path})")
+    with _lock:
+        if source in _warned:
+            return
+        _warned.add(source)
+    print(f"Warning: {source} traffic is not recorded to the cassette")
+
+
+atexit.register(lambda: _active is not None and _active.close())
@@ -0,0 +1,107 @@
+# cassette_httpx.py
+"""httpx transports that record to and replay from a cassette (see cassette.py).
+
+The OpenAI SDK sends its requests through httpx rather than a requests
+session, so providers.py builds its client on one of these transports while
+a cassette is active. Entries use the same format as the requests side, so
+one cassette holds both. Imported only when that client is built, since
+httpx is one of the SDK dependencies kept out of start-up.
+"""
+
+import time
+
+import httpx
+
+from cassette import RecordingBody, ReplayBody, decode_body
+
+
+class _StreamBody:
+    """An httpx byte stream with the urllib3 body methods RecordingBody reads through"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def stream(self, amt=None, decode_content=None):
+        return iter(self._stream)
+
+    def close(self):
+        self._stream.close()
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(self, body):
+        self._body = body
+
+    def __iter__(self):
+        return self._body.stream()
+
+    def close(self):
+        self._body.close()
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, body):
+        self._body = body
+
+    def abort(self):
+        """Make a blocked read fail at once (see shared_utils._abort_response)"""
+        self._body.abort()
+
+    def __iter__(self):
+        try:
+            yield from self._body.stream()
+        except Exception as e:
+            raise httpx.ReadError(str(e)) from e
+
+    def close(self):
+        self._body.close()
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Sends requests through `inner` and copies each response into the recorder"""
+
+    def __init__(self, recorder, inner):
+        self.recorder = recorder
+        self.inner = inner
+
+    def handle_request(self, request):
+        # Plain bodies, so the cassette stores text like the requests side does
+        request.headers["Accept-Encoding"] = "identity"
+        started = time.monotonic()
+        response = self.inner.handle_request(request)
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-encoding"}
+        entry = {
+            "method": request.method,
+            "url": str(request.url),
+            "request": decode_body(request.read() or None),
+            "status": response.status_code,
+            "reason": response.reason_phrase,
+            "headers": headers,
+            "connect": round(time.monotonic() - started, 4),
+        }
+        response.stream = _RecordingStream(RecordingBody(_StreamBody(response.stream), self.recorder, entry))
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Answers every request from the player's cassette (CassetteError if it has no match)"""
+
+    def __init__(self, player):
+        self.player = player
+
+    def handle_request(self, request):
+        entry = self.player.next_response(request.method, str(request.url), decode_body(request.read() or None))
+        if self.player.speed:
+            time.sleep(entry.get("connect", 0) / self.player.speed)
+        times, chunks = self.player.chunks(entry)
+        reason = entry.get("reason")
+        return httpx.Response(
+            entry["status"],
+            headers=entry.get("headers", {}),
+            stream=_ReplayStream(ReplayBody(times, chunks, self.player.speed)),
+            request=request,
+            extensions={"reason_phrase": reason.encode("ascii")} if reason else {},
+        )
@@ -7,30 +7,103 @@ load_dotenv()
 
 # Runtime configuration
 TURN_DELAY = 2  # Delay between turns (in seconds)
+ADAPTIVE_TURN_DELAY = True  # Skip the delay when consecutive AIs use different providers; honour rate-limit backoff when they share one
+PER_AI_TURN_DELAY = {}  # Optional fixed delay before specific AIs, e.g. {"AI-3": 5} (overrides the adaptive delay)
 SHOW_CHAIN_OF_THOUGHT_IN_CONTEXT = True  # Set to True to include Chain of Thought in conversation history
 SHARE_CHAIN_OF_THOUGHT = False  # Set to True to allow AIs to see each other's Chain of Thought
+LOG_TURN_CONTEXT = False  # Print every message sent on each turn (costs O(history) per turn)
+STREAM_FLUSH_INTERVAL_MS = 16  # GUI batches streamed tokens and draws them once per frame (~60 Hz)
+STREAM_FLUSH_MAX_CHARS = 4096  # ...or as soon as this many characters are waiting
+RENDER_MAX_IN_PLACE_UPDATES = 8  # Changed messages re-rendered in place; more than this re-renders from the first change
+VIRTUAL_TRANSCRIPT = True  # Show the conversation in a virtualized view (lays out only messages near the viewport); False uses one QTextEdit document
+TRANSCRIPT_DOCUMENT_CACHE = 300  # Rendered messages the virtualized view keeps laid out
 SORA_SECONDS=12
 SORA_SIZE="1280x720"
 
+# HTTP connection pooling (one keep-alive pool per provider host)
+HTTP_POOL_SIZE = 10  # Max pooled connections kept open per provider host
+HTTP_KEEP_ALIVE = True  # Reuse connections between turns (False sends "Connection: close")
+USE_ASYNC_PROVIDERS = False  # Stream provider calls on one asyncio event-loop thread instead of one QThreadPool thread per turn
+
+# Rate limiting (see rate_limiter.py): requests wait for a slot instead of failing with 429
+RATE_LIMIT_RPM = {  # Starting requests/minute per provider; raised to the limits providers report in response headers
+    "anthropic": 50,
+    "openai": 500,
+    "google": 150,
+    "openrouter": 200,
+}
+RATE_LIMIT_MAX_RETRIES = 3  # Times a 429 is waited out and resent before the error is returned
+RATE_LIMIT_DEFAULT_BACKOFF = 5  # Seconds to pause a provider after a 429 without Retry-After (doubles on repeats)
+
+# Retries for transient failures (see retry_policy.py): connection resets, timeouts, 5xx, dropped streams
+RETRY_MAX_ATTEMPTS = 4  # Total tries per request, including the first
+RETRY_BASE_DELAY = 1.0  # Upper bound of the first backoff in seconds (doubles per retry, full jitter)
+RETRY_MAX_DELAY = 20.0  # Upper bound of any single backoff
+RETRY_BUDGET_SECONDS = 90  # Stop retrying once this long has passed since the first try
+
+# Hedged requests (see hedging.py): cut tail latency at the cost of occasional duplicate requests
+HEDGE_REQUESTS = False  # Send a duplicate request when a turn's first token is later than the model's usual TTFT
+HEDGE_PERCENTILE = 0.95  # TTFT percentile (learned per model) after which the duplicate is sent
+HEDGE_MIN_SAMPLES = 20  # TTFT samples a model needs before its turns are hedged
+HEDGE_MIN_DELAY = 1.0  # Never hedge sooner than this many seconds
+HEDGE_ALTERNATES = {}  # Provider model ID -> OpenRouter model ID for the duplicate, e.g. {"claude-sonnet-4-5-20250929": "anthropic/claude-sonnet-4.5"}
+TTFT_HISTORY_SIZE = 500  # TTFT samples per model before older ones start fading out
+
+# Per-turn latency/throughput metrics (see turn_metrics.py)
+TURN_METRICS_HISTORY = 1000  # Turn records kept in memory for get_turn_metrics() and the summary
+TURN_METRICS_FILE = None  # Also append each turn's metrics to this JSONL file, e.g. "exports/turn_metrics.jsonl"
+
+# Record/replay of provider HTTP traffic (see cassette.py)
+CASSETTE_MODE = None  # "record" saves every provider request and response to CASSETTE_PATH, "replay" serves them back offline
+CASSETTE_PATH = "cassettes/session.cassette"  # gzip-compressed JSONL
+CASSETTE_REPLAY_SPEED = 1.0  # Multiple of the recorded pace when replaying; 0 = as fast as possible
+
+# Anthropic prompt caching
+CLAUDE_PROMPT_CACHING = True  # Mark the system prompt and history prefix with cache_control breakpoints
+CLAUDE_CACHE_BOUNDARY_STEP = 8  # Messages between the rolling history breakpoints
+
+# Batch runs (headless.py batch)
+BATCH_MAX_CONCURRENT_SESSIONS = 8  # Sessions running at once
+BATCH_PROVIDER_CONCURRENCY = {  # Max in-flight turns per provider across all sessions (overrides adapter max_concurrency)
+    "anthropic": 4,
+    "openai": 4,
+    "google": 4,
+    "openrouter": 4,
+}
+
 # Available AI models (Claude, GPT-5, Gemini only - using direct APIs)
+# "id" is the provider model ID and "provider" the adapter that serves it (see
+# provider_adapters.py); "context_budget" caps the estimated input tokens sent
+# per turn, and an optional "context_strategy" overrides CONTEXT_STRATEGY
 AI_MODELS = {
     # Claude models (Anthropic API)
-    "Claude Opus 4.5": "claude-opus-4-5-20251101",
-    "Claude Sonnet 4.5": "claude-sonnet-4-5-20250929",
-    "Claude Sonnet 4": "claude-sonnet-4-20250514",
-    "Claude Haiku 4.5": "claude-haiku-4-5-20251001",
+    "Claude Opus 4.5": {"id": "claude-opus-4-5-20251101", "provider": "anthropic", "context_budget": 150000},
+    "Claude Sonnet 4.5": {"id": "claude-sonnet-4-5-20250929", "provider": "anthropic", "context_budget": 150000},
+    "Claude Sonnet 4": {"id": "claude-sonnet-4-20250514", "provider": "anthropic", "context_budget": 150000},
+    "Claude Haiku 4.5": {"id": "claude-haiku-4-5-20251001", "provider": "anthropic", "context_budget": 150000},
 
     # GPT models (OpenAI API)
-    "GPT-5": "gpt-5",
-    "GPT-5 Pro": "gpt-5-pro",
-    "GPT-4o": "gpt-4o",
+    "GPT-5": {"id": "gpt-5", "provider": "openai", "context_budget": 200000},
+    "GPT-5 Pro": {"id": "gpt-5-pro", "provider": "openai", "context_budget": 200000},
+    "GPT-4o": {"id": "gpt-4o", "provider": "openai", "context_budget": 100000},
 
     # Gemini models (Google API)
-    "Gemini 3 Pro": "gemini-3-pro-preview",
-    "Gemini 2.5 Pro": "gemini-2.5-pro-preview-05-06",
-    "Gemini 2.5 Flash": "gemini-2.5-flash-preview-05-20",
+    "Gemini 3 Pro": {"id": "gemini-3-pro-preview", "provider": "google", "context_budget": 500000},
+    "Gemini 2.5 Pro": {"id": "gemini-2.5-pro-preview-05-06", "provider": "google", "context_budget": 500000},
+    "Gemini 2.5 Flash": {"id": "gemini-2.5-flash-preview-05-20", "provider": "google", "context_budget": 500000},
 }
 
+# Context window management (see context_budget.py)
+DEFAULT_CONTEXT_BUDGET = 100000  # Input-token budget for models without a "context_budget" (e.g. raw OpenRouter IDs)
+CONTEXT_STRATEGY = "sliding_window"  # "sliding_window", "head_tail" or "drop_images_first"
+CONTEXT_HEAD_MESSAGES = 2  # Opening messages "head_tail" always keeps
+
+# Rolling summary of older turns (see rolling_summary.py)
+ROLLING_SUMMARY = False  # Fold messages older than SUMMARY_KEEP_RECENT into a running summary
+SUMMARY_MODEL = "Claude Haiku 4.5"  # Cheap model that writes the summary (runs alongside the next turn)
+SUMMARY_KEEP_RECENT = 12  # Newest conversation messages always sent verbatim
+SUMMARY_MIN_BATCH = 8  # Aged-out messages needed before the summary is refreshed
+
 # System prompt pairs library
 SYSTEM_PROMPT_PAIRS = {
     # this is a basic system prompt for a conversation between two AIs. Experiment with different prompts to see how they affect the conversation. Add new prompts to the library to use them in the GUI.
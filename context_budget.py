@@ -0,0 +1,175 @@
+# context_budget.py
+"""Fit a turn's messages into a model's input-token budget.
+
+prepare_turn assembles [system, history..., prompt]; fit_to_budget then trims
+the history with one of the STRATEGIES until the estimated size fits. The
+system message and the final prompt are always kept and message dicts are
+never modified (trimmed copies are made instead). Sizes come from
+estimate_message_tokens, an offline heuristic that needs no tokenizer or API
+call, so the same history always trims the same way.
+"""
+
+IMAGE_TOKENS = 1600  # Flat cost per image part (about a 1.2 megapixel image on Claude)
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and framing tokens per message
+IMAGE_PLACEHOLDER = "[image omitted]"
+
+
+def estimate_text_tokens(text):
+    """Estimate tokens in a string: ~4 ASCII characters or 1 non-ASCII character per token
+
+    Non-ASCII characters (box drawing, CJK, emoji) tokenize far worse than
+    English text, which matters for ASCII-art heavy conversations. They are
+    counted from the UTF-8 size, so the whole estimate is two C-level calls.
+    """
+    extra_bytes = len(text.encode('utf-8', 'surrogatepass')) - len(text)
+    non_ascii = (extra_bytes + 1) // 2  # Most non-ASCII characters take 2 extra bytes
+    ascii_chars = max(len(text) - non_ascii, 0)
+    return (ascii_chars + 3) // 4 + non_ascii
+
+
+def estimate_message_tokens(msg):
+    """Estimate the input tokens one provider message costs"""
+    content = msg.get("content", "")
+    tokens = MESSAGE_OVERHEAD_TOKENS
+    if isinstance(content, list):
+        for part in content:
+            if part.get('type') == 'text':
+                tokens += estimate_text_tokens(part.get('text', ''))
+            elif part.get('type') == 'image':
+                tokens += IMAGE_TOKENS
+            else:
+                tokens += estimate_text_tokens(str(part))
+    else:
+        tokens += estimate_text_tokens(str(content))
+    return tokens
+
+
+def _without_images(msg):
+    """Copy of a message with its image parts replaced by IMAGE_PLACEHOLDER"""
+    content = [part if part.get('type') != 'image' else {"type": "text", "text": IMAGE_PLACEHOLDER} for part in msg["content"]]
+    return dict(msg, content=content)
+
+
+def _has_image(msg):
+    content = msg.get("content")
+    return isinstance(content, list) and any(part.get('type') == 'image' for part in content)
+
+
+def strip_images(messages, token_counts):
+    """Replace image parts with a placeholder, for backends that cannot take images
+
+    Returns:
+        (messages, token_counts) - the inputs themselves when no message had an image
+    """
+    stripped, counts = messages, token_counts
+    for i, msg in enumerate(messages):
+        if _has_image(msg):
+            if stripped is messages:
+                stripped, counts = list(messages), list(token_counts)
+            stripped[i] = _without_images(msg)
+            counts[i] = estimate_message_tokens(stripped[i])
+    return stripped, counts
+
+
+def _newest_that_fit(counts, available, first, last):
+    """Indices in [first, last) of the newest messages whose total fits in `available`"""
+    kept = []
+    for i in range(last - 1, first - 1, -1):
+        if counts[i] > available:
+            break
+        available -= counts[i]
+        kept.append(i)
+    kept.reverse()
+    return kept
+
+
+def _sliding_window(messages, counts, available, first, last, head_messages):
+    """Keep the newest messages; drop from the start of the history"""
+    kept = _newest_that_fit(counts, available, first, last)
+    # Don't open the window on a reply whose prompt was dropped
+    while kept and messages[kept[0]].get("role") == "assistant":
+        kept.pop(0)
+    return messages, kept
+
+
+def _head_tail(messages, counts, available, first, last, head_messages):
+    """Keep the opening messages (seed prompt, first replies) plus the newest; drop the middle"""
+    head = []
+    for i in range(first, min(first + head_messages, last)):
+        if counts[i] > available:
+            break
+        available -= counts[i]
+        head.append(i)
+    tail_first = head[-1] + 1 if head else first
+    return messages, head + _newest_that_fit(counts, available, tail_first, last)
+
+
+def _drop_images_first(messages, counts, available, first, last, head_messages):
+    """Replace images with a placeholder, oldest first, before dropping any message"""
+    messages = list(messages)
+    total = sum(counts[first:last])
+    for i in range(first, last):
+        if total <= available:
+            break
+        if not _has_image(messages[i]):
+            continue
+        messages[i] = _without_images(messages[i])
+        new_count = estimate_message_tokens(messages[i])
+        total -= counts[i] - new_count
+        counts[i] = new_count
+    return _sliding_window(messages, counts, available, first, last, head_messages)
+
+
+# Truncation strategies by name: (messages, counts, available, first, last, head_messages)
+# -> (messages, indices of history messages to keep)
+STRATEGIES = {
+    "sliding_window": _sliding_window,
+    "head_tail": _head_tail,
+    "drop_images_first": _drop_images_first,
+}
+
+
+def fit_to_budget(messages, budget, strategy="sliding_window", token_counts=None, head_messages=2):
+    """Trim a turn's history so its estimated size fits the token budget
+
+    Args:
+        messages: [system message (optional), history..., final prompt]
+        budget: Maximum estimated input tokens
+        strategy: Name of a truncation strategy in STRATEGIES
+        token_counts: Precomputed estimate per message (same order as messages)
+        head_messages: Opening history messages kept by "head_tail"
+
+    Returns:
+        (messages, stats) - stats has strategy, budget, tokens_before,
+        tokens_after, dropped (messages removed) and images_dropped
+        (kept messages whose images were replaced by a placeholder)
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown context strategy '{strategy}' (choose from {', '.join(STRATEGIES)})")
+    counts = list(token_counts) if token_counts is not None else [estimate_message_tokens(msg) for msg in messages]
+    total = sum(counts)
+    stats = {
+        "strategy": strategy,
+        "budget": budget,
+        "tokens_before": total,
+        "tokens_after": total,
+        "dropped": 0,
+        "images_dropped": 0,
+    }
+    if total <= budget or len(messages) < 2:
+        return messages, stats
+
+    # History is everything between the system message and the final prompt
+    first = 1 if messages[0].get("role") == "system" else 0
+    last = len(messages) - 1
+    available = budget - sum(counts[:first]) - counts[last]
+    if available <= 0:
+        print(f"Warning: system prompt and final message alone exceed the {budget} token budget")
+
+    trimmed, kept = STRATEGIES[strategy](messages, counts, max(available, 0), first, last, head_messages)
+    result = trimmed[:first] + [trimmed[i] for i in kept] + [trimmed[last]]
+    stats["tokens_after"] = sum(counts[:first]) + sum(counts[i] for i in kept) + counts[last]
+    stats["dropped"] = (last - first) - len(kept)
+    # Only kept messages count: an image on a message that was dropped anyway was not "dropped first"
+    stats["images_dropped"] = sum(1 for i in kept if trimmed[i] is not messages[i])
+    return result, stats
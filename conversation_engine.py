@@ -0,0 +1,1068 @@
+# conversation_engine.py
+"""GUI-free conversation engine.
+
+Everything needed to run an AI-to-AI conversation lives here: building each
+AI's context (prepare_turn), routing the call to a provider (ai_turn /
+ai_turn_async), creating rabbithole and fork branches, and the round loop
+(ConversationEngine). Nothing in this module imports PyQt6, so sessions can
+run on headless servers via headless.py; the GUI in main.py drives the same
+functions from its worker threads.
+"""
+
+import asyncio
+import bisect
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cancellation import CancellationToken, Cancelled
+from config import (
+    ADAPTIVE_TURN_DELAY,
+    AI_MODELS,
+    CONTEXT_HEAD_MESSAGES,
+    CONTEXT_STRATEGY,
+    DEFAULT_CONTEXT_BUDGET,
+    LOG_TURN_CONTEXT,
+    PER_AI_TURN_DELAY,
+    ROLLING_SUMMARY,
+    SUMMARY_MODEL,
+    SYSTEM_PROMPT_PAIRS,
+    TURN_DELAY,
+)
+from context_budget import estimate_message_tokens, fit_to_budget, strip_images
+from hedging import hedged_call, should_hedge
+from provider_adapters import get_adapter
+from retry_policy import DEFAULT_POLICY, notify_retry, retry_listener
+from rolling_summary import SUMMARY_PROMPT, RollingSummary, format_transcript
+from shared_utils import get_provider_backoff
+from ttft_stats import record_ttft, request_sent_listener, timed_stream
+from turn_metrics import turn_recorder
+
+# Message key holding the cached (content, fingerprint) pair; never sent or saved
+FINGERPRINT_KEY = "_fingerprint"
+
+def message_fingerprint(msg):
+    """Content fingerprint used to drop duplicate messages
+    
+    Hashes the text parts and image data of the message content, so a plain
+    string and a single text part with the same text match. The result is
+    cached on the message together with the content object it was computed
+    from; the conversation shares message dicts between turns, so each turn
+    only hashes new messages, and replacing msg['content'] invalidates it.
+    """
+    content = msg.get("content", "")
+    cached = msg.get(FINGERPRINT_KEY)
+    if cached is not None and cached[0] is content:
+        return cached[1]
+    
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(content, list):
+        for part in content:
+            part_type = part.get('type')
+            if part_type == 'text':
+                digest.update(b"\x00t" + part.get('text', '').encode('utf-8', 'surrogatepass'))
+            elif part_type == 'image':
+                digest.update(b"\x00i" + str(part.get('source', {}).get('data', '')).encode('utf-8'))
+            else:
+                digest.update(b"\x00o" + json.dumps(part, sort_keys=True, default=str).encode('utf-8'))
+    else:
+        digest.update(b"\x00t" + str(content).encode('utf-8', 'surrogatepass'))
+    
+    fingerprint = digest.digest()
+    msg[FINGERPRINT_KEY] = (content, fingerprint)
+    return fingerprint
+
+def public_message(msg):
+    """Copy of a message without engine-internal cache keys, for saving"""
+    return {key: value for key, value in msg.items() if key != FINGERPRINT_KEY}
+
+def _is_empty_content(content):
+    """True for messages with nothing to send (images count as content)"""
+    if isinstance(content, str):
+        return not content.strip()
+    if isinstance(content, list):
+        return not any(part.get('text', '').strip() if part.get('type') == 'text' else True for part in content)
+    return not content
+
+def _prefix_speaker(content, speaker_name):
+    """Prefix a message from another participant with '[speaker]: '"""
+    if isinstance(content, str):
+        # Simple string content - prefix with speaker name
+        return f"[{speaker_name}]: {content}"
+    if isinstance(content, list):
+        # Structured content (e.g., with images) - prefix text parts
+        modified_content = []
+        for part in content:
+            if part.get('type') == 'text':
+                # Prefix the first text part with speaker name
+                text = part.get('text', '')
+                modified_part = part.copy()
+                modified_part['text'] = f"[{speaker_name}]: {text}"
+                modified_content.append(modified_part)
+                # Only prefix the first text part
+                break
+            else:
+                modified_content.append(part)
+        
+        # Add remaining parts unchanged
+        first_text_found = False
+        for part in content:
+            if part.get('type') == 'text' and not first_text_found:
+                first_text_found = True
+                continue  # Skip, already added above
+            modified_content.append(part)
+        
+        return modified_content if modified_content else content
+    return content
+
+def _preview(content_raw):
+    """Short one-line preview of message content for logs"""
+    if isinstance(content_raw, list):
+        text_parts = [part.get('text', '') for part in content_raw if part.get('type') == 'text']
+        has_image = any(part.get('type') == 'image' for part in content_raw)
+        content_str = ' '.join(text_parts)
+        if has_image:
+            content_str = f"[Image] {content_str}" if content_str else "[Image]"
+    else:
+        content_str = str(content_raw)
+    return content_str[:50] + "..." if len(content_str) > 50 else content_str
+
+class TurnContext:
+    """One AI's provider-ready view of one conversation, built incrementally
+    
+    Holds the filtered, deduplicated and speaker-prefixed messages for every
+    conversation message consumed so far, plus the branch state found while
+    consuming them. update() only processes messages appended since the last
+    turn, so edits to already-consumed history are not seen: code that edits
+    a conversation (or creates a branch) calls ContextCache.invalidate() for
+    it. A conversation shorter than the consumed history is rebuilt from
+    scratch.
+    """
+    
+    def __init__(self, ai_name):
+        self.ai_name = ai_name
+        self.reset()
+    
+    def reset(self):
+        self.messages = []  # Transformed messages, without the system prompt
+        self.token_counts = []  # Estimated tokens of each entry in messages
+        self.sources = []  # Conversation index each entry in messages came from
+        self.processed = 0  # Conversation messages consumed
+        self.seen_fingerprints = set()
+        self.last_other_content = None  # Content of the latest kept message not from this AI
+        self.branch_type = None  # "rabbithole" or "fork" after a branch marker
+        self.branch_text = ""
+        self.responses_since_branch = 0
+    
+    def matches(self, conversation):
+        """False if `conversation` is shorter than the consumed history (O(1); see invalidate())"""
+        return self.processed <= len(conversation)
+    
+    def update(self, conversation):
+        """Consume messages added since the last turn; returns how many were new"""
+        if not self.matches(conversation):
+            print(f"Context for {self.ai_name} no longer matches the conversation - rebuilding")
+            self.reset()
+        
+        start = self.processed
+        for index in range(start, len(conversation)):
+            self._add(conversation[index], index)
+        
+        self.processed = len(conversation)
+        return len(conversation) - start
+    
+    def _add(self, msg, index):
+        # Track the most recent branch marker and the AI responses after it
+        if isinstance(msg, dict) and msg.get("_type") == "branch_indicator":
+            msg_content = msg.get("content", "")
+            self.branch_type = None
+            self.branch_text = ""
+            self.responses_since_branch = 0
+            # Branch indicators are always plain strings
+            if isinstance(msg_content, str):
+                if "Rabbitholing down:" in msg_content:
+                    self.branch_type = "rabbithole"
+                elif "Forking off:" in msg_content:
+                    self.branch_type = "fork"
+                if self.branch_type:
+                    self.branch_text = msg_content.split('"')[1] if '"' in msg_content else ""
+            return
+        if not isinstance(msg, dict):
+            # Convert plain text to dictionary
+            msg = {"role": "user", "content": str(msg)}
+        if self.branch_type and msg.get("role") == "assistant":
+            self.responses_since_branch += 1
+        
+        content = msg.get("content", "")
+        # Skip any hidden "connecting..." messages
+        if msg.get("hidden") and isinstance(content, str) and "connect" in content.lower():
+            return
+        # Skip empty messages and system messages (we add our own system prompt)
+        if _is_empty_content(content) or msg.get("role") == "system":
+            return
+        
+        # Skip duplicate messages - the only dedup stage before any provider call
+        fingerprint = message_fingerprint(msg)
+        if fingerprint in self.seen_fingerprints:
+            if LOG_TURN_CONTEXT:
+                print(f"Skipping duplicate message: {_preview(content)}")
+            return
+        self.seen_fingerprints.add(fingerprint)
+        
+        is_from_this_ai = msg.get("ai_name") == self.ai_name
+        if not is_from_this_ai:
+            self.last_other_content = content
+            if content:
+                # Use the model name (e.g., "Claude 4.5 Sonnet") if available, otherwise fall back to ai_name or "User"
+                content = _prefix_speaker(content, msg.get("model") or msg.get("ai_name", "User"))
+        
+        role = "assistant" if is_from_this_ai else "user"
+        self.messages.append({"role": role, "content": content})
+        self.token_counts.append(estimate_message_tokens(self.messages[-1]))
+        self.sources.append(index)
+
+class ContextCache:
+    """TurnContexts keyed by (conversation key, AI name)
+    
+    The conversation key names the conversation being extended ("main" or a
+    branch ID), since callers hand each turn a fresh copy of the list. With a
+    summarizer, each conversation also gets one RollingSummary shared by all
+    of its AIs.
+    """
+    
+    def __init__(self, summarizer=None):
+        self.summarizer = summarizer
+        self._contexts = {}
+        self._summaries = {}
+        self._lock = threading.Lock()
+    
+    def get(self, conversation_key, ai_name):
+        with self._lock:
+            key = (conversation_key, ai_name)
+            if key not in self._contexts:
+                self._contexts[key] = TurnContext(ai_name)
+            return self._contexts[key]
+    
+    def summary(self, conversation_key):
+        """The conversation's RollingSummary, or None when summaries are off"""
+        if self.summarizer is None:
+            return None
+        with self._lock:
+            if conversation_key not in self._summaries:
+                self._summaries[conversation_key] = RollingSummary(self.summarizer)
+            return self._summaries[conversation_key]
+    
+    def invalidate(self, conversation_key=None):
+        """Forget cached contexts for one conversation (or all of them)
+        
+        Call this whenever a conversation's existing messages are edited,
+        replaced or removed, or a branch is created under its key; contexts
+        only ever consume the messages appended since their last turn.
+        """
+        with self._lock:
+            if conversation_key is None:
+                self._contexts.clear()
+                self._summaries.clear()
+            else:
+                for key in [k for k in self._contexts if k[0] == conversation_key]:
+                    del self._contexts[key]
+                self._summaries.pop(conversation_key, None)
+
+def make_model_summarizer(model=SUMMARY_MODEL):
+    """Summarizer for RollingSummary that asks `model` (non-streaming)"""
+    def summarize(previous_summary, messages):
+        prompt = SUMMARY_PROMPT.format(
+            previous_summary=previous_summary or "(none yet)",
+            transcript=format_transcript(messages)
+        )
+        system_prompt = "You write concise, faithful conversation summaries."
+        response = get_adapter(model).call(prompt, [], get_model_id(model), system_prompt)
+        return response.get("content", "") if isinstance(response, dict) else response
+    return summarize
+
+def create_context_cache(rolling_summary=None):
+    """ContextCache for a session, with a model summarizer if rolling summaries are on
+    
+    Args:
+        rolling_summary: Override for config.ROLLING_SUMMARY
+    """
+    enabled = ROLLING_SUMMARY if rolling_summary is None else rolling_summary
+    return ContextCache(make_model_summarizer() if enabled else None)
+
+def get_model_config(model):
+    """AI_MODELS entry for a display name, or {} for a raw model ID"""
+    return AI_MODELS.get(model, {})
+
+def get_model_id(model):
+    """Provider model ID for a display name (raw model IDs pass through)"""
+    return get_model_config(model).get("id", model)
+
+def prepare_turn(ai_name, conversation, model, system_prompt, context_cache=None, context_key="main"):
+    """Build the provider message list for an AI turn
+    
+    Args:
+        context_cache: Optional ContextCache; when given, only messages added
+            since this AI's previous turn in `context_key` are processed
+        context_key: Which conversation this is ("main" or a branch ID)
+    
+    With rolling summaries on, conversation messages already covered by the
+    summary are replaced by one summary message, and the next summary refresh
+    is started in the background. The assembled messages are then trimmed to
+    the model's context_budget, capped by its adapter's max_context (see
+    context_budget.py), and images are replaced by a placeholder for
+    adapters that cannot take them.
+    
+    Returns:
+        (model_id, system_prompt, messages) - messages starts with the system message
+    """
+    print("==================================================")
+    print(f"Starting {model} turn ({ai_name}), conversation length {len(conversation)}")
+    
+    # Get the actual model ID from the display name
+    model_id = get_model_id(model)
+    
+    # Prepend model identity to system prompt so AI knows who it is
+    system_prompt = f"You are {ai_name} ({model}).\n\n{system_prompt}"
+    
+    context = context_cache.get(context_key, ai_name) if context_cache else TurnContext(ai_name)
+    new_count = context.update(conversation)
+    
+    # Branch prompts themselves are chosen by the caller (get_branch_system_prompt)
+    if context.branch_type and LOG_TURN_CONTEXT:
+        print(f"Detected {context.branch_type} branch for: '{context.branch_text}' ({context.responses_since_branch} AI responses since)")
+    
+    history, history_counts = context.messages, context.token_counts
+    summary = context_cache.summary(context_key) if context_cache else None
+    if summary:
+        summary_text, covered = summary.current(conversation)
+        if covered:
+            # Older turns are represented by the shared summary; send the recent tail verbatim
+            tail_start = bisect.bisect_left(context.sources, covered)
+            summary_message = {"role": "user", "content": f"[Summary of the earlier conversation]\n{summary_text}"}
+            history = [summary_message] + context.messages[tail_start:]
+            history_counts = [estimate_message_tokens(summary_message)] + context.token_counts[tail_start:]
+            print(f"Using rolling summary for the first {covered} messages, {len(history) - 1} recent messages verbatim")
+        # Fold newly aged-out messages into the summary while this AI is speaking
+        summary.refresh(conversation)
+    
+    # CRITICAL: Always ensure we have the system prompt
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(history)
+    
+    # Ensure the last message is a user message so the AI responds
+    if len(messages) > 1 and messages[-1].get("role") == "assistant":
+        if context.branch_type == "rabbithole" and context.branch_text:
+            # Add a special rabbitholing instruction as the last message
+            messages.append({
+                "role": "user",
+                "content": f"Please explore the concept of '{context.branch_text}' in depth. What are the most interesting aspects or connections related to this concept?"
+            })
+        elif context.branch_type == "fork" and context.branch_text:
+            # Add a special forking instruction as the last message
+            messages.append({
+                "role": "user", 
+                "content": f"Continue on naturally from the point about '{context.branch_text}' without including this text."
+            })
+        elif context.last_other_content:
+            # Use the most recent message from another AI as the prompt
+            messages.append({
+                "role": "user",
+                "content": context.last_other_content
+            })
+        else:
+            # Fallback - only if no other AI message found
+            messages.append({
+                "role": "user",
+                "content": "Let's continue our conversation."
+            })
+    
+    # Fit the history into the model's token budget; only the system prompt
+    # and the final prompt need estimating, the history was sized as it arrived
+    model_config = get_model_config(model)
+    adapter = get_adapter(model)
+    token_counts = [estimate_message_tokens(messages[0])] + history_counts
+    token_counts.extend(estimate_message_tokens(msg) for msg in messages[len(token_counts):])
+    if not adapter.images:
+        messages, token_counts = strip_images(messages, token_counts)
+    messages, budget_stats = fit_to_budget(
+        messages,
+        min(model_config.get("context_budget", DEFAULT_CONTEXT_BUDGET), adapter.max_context),
+        model_config.get("context_strategy", CONTEXT_STRATEGY),
+        token_counts,
+        CONTEXT_HEAD_MESSAGES
+    )
+    if budget_stats["tokens_after"] < budget_stats["tokens_before"]:
+        print(f"Context budget ({budget_stats['strategy']}): ~{budget_stats['tokens_before']} -> ~{budget_stats['tokens_after']} tokens, "
+              f"dropped {budget_stats['dropped']} messages, stripped images from {budget_stats['images_dropped']}")
+    
+    print(f"Sending {len(messages)} messages to {model} ({ai_name}), {new_count} new since its last turn")
+    if LOG_TURN_CONTEXT:
+        for i, msg in enumerate(messages):
+            print(f"[{i}] {msg.get('role', 'unknown')}: {_preview(msg.get('content', ''))}")
+        print(f"Messages: {json.dumps(messages, indent=2)}")
+    
+    # Load any available memories for this AI
+    memories = []
+    try:
+        if os.path.exists(f'memories/{ai_name.lower()}_memories.json'):
+            with open(f'memories/{ai_name.lower()}_memories.json', 'r') as f:
+                memories = json.load(f)
+                print(f"Loaded {len(memories)} memories for {ai_name}")
+        else:
+            print(f"Loaded 0 memories for {ai_name}")
+    except Exception as e:
+        print(f"Error loading memories: {e}")
+        print(f"Loaded 0 memories for {ai_name}")
+    
+    # Display the prompt
+    print(f"--- Prompt to {model} ({ai_name}) ---")
+    
+    return model_id, system_prompt, messages
+
+def get_model_provider(model):
+    """Return the upstream provider name for a model display name or ID"""
+    return get_adapter(model).upstream
+
+def turn_status(result):
+    """"ok" or "error" for an ai_turn result (most provider failures come back as text, not exceptions)"""
+    if not isinstance(result, dict):
+        result = {"content": result}
+    if result.get("role") == "system":
+        return "error"
+    content = result.get("content")
+    if content is None:
+        return "ok" if result.get("image_url") else "error"
+    if isinstance(content, str) and (not content or content.startswith("Error")):
+        return "error"
+    return "ok"
+
+def _finish_turn(recorder, result, messages):
+    """Mark a turn's result with its turn_status and hand it to the metrics recorder"""
+    result["turn_status"] = turn_status(result)
+    input_estimate = sum(estimate_message_tokens(msg) for msg in messages)
+    recorder.set_result(result.get("content"), result["turn_status"], input_estimate)
+
+def _discard_chunk(chunk):
+    """Streaming callback for turns nobody watches (streaming keeps them cancellable)"""
+
+def ai_turn(ai_name, conversation, model, system_prompt, gui=None, is_branch=False, branch_output=None, streaming_callback=None,
+            context_cache=None, context_key="main", cancel_token=None, queue_wait=None):
+    """Execute an AI turn with the given parameters
+    
+    Args:
+        streaming_callback: Optional function(chunk: str) to call with each streaming token
+        context_cache: Optional ContextCache reused across turns (see prepare_turn)
+        context_key: Which conversation this is ("main" or a branch ID)
+        cancel_token: Optional CancellationToken; cancelling it closes the request
+            in flight and raises Cancelled (no error result is returned)
+        queue_wait: Seconds the turn waited before it could run, for its metrics
+    
+    Returns:
+        The result dict; result["metrics"] is the turn's turn_metrics record and
+        result["turn_status"] is "error" when the turn failed (see result_to_message)
+    """
+    model_id, system_prompt, messages = prepare_turn(ai_name, conversation, model, system_prompt, context_cache, context_key)
+    adapter = get_adapter(model)
+    
+    with turn_recorder(ai_name, model, adapter.upstream, queue_wait) as recorder:
+        try:
+            print(f"Using {adapter.label} for model: {model_id}")
+            if cancel_token is not None and streaming_callback is None:
+                # Only a stream can be aborted mid-response, so stream even when nobody is watching
+                streaming_callback = _discard_chunk
+            if streaming_callback:
+                streaming_callback = recorder.wrap(streaming_callback)
+            if should_hedge(adapter):
+                winner, response = hedged_call(adapter, messages, model_id, system_prompt, stream_callback=streaming_callback,
+                                               cancel_token=cancel_token)
+                result = winner.build_result(response, model, ai_name)
+            else:
+                # Feeds the per-model TTFT histogram that hedging learns its deadlines from
+                with timed_stream(model_id, streaming_callback if adapter.streaming else None) as timed_callback:
+                    result = adapter.run_turn(messages, model, model_id, ai_name, system_prompt,
+                                              stream_callback=timed_callback or streaming_callback, cancel_token=cancel_token)
+        except Cancelled:
+            print(f"{ai_name}'s turn was cancelled")
+            raise
+        except Exception as e:
+            error_message = f"Error making API request: {str(e)}"
+            print(f"Error: {error_message}")
+            
+            # Create an error response
+            result = {
+                "role": "system",
+                "content": f"Error: {error_message}",
+                "model": model,
+                "ai_name": ai_name
+            }
+        _finish_turn(recorder, result, messages)
+    
+    result["metrics"] = recorder.record
+    return result
+
+async def ai_turn_async(ai_name, conversation, model, system_prompt, streaming_callback=None,
+                        context_cache=None, context_key="main", cancel_token=None, queue_wait=None):
+    """Execute an AI turn on the running event loop, streaming via async providers
+    
+    Cancel an async turn by cancelling its task; cancel_token is only needed
+    for adapters without astream, which run the blocking ai_turn on a thread.
+    
+    Args:
+        streaming_callback: Optional function(chunk: str) to call with each streaming token
+        context_cache: Optional ContextCache reused across turns (see prepare_turn)
+        context_key: Which conversation this is ("main" or a branch ID)
+        cancel_token: Optional CancellationToken passed to the blocking fallback
+        queue_wait: Seconds the turn waited before it could run, for its metrics
+    
+    Returns:
+        The result dict, with "metrics" and "turn_status" as for ai_turn
+    """
+    adapter = get_adapter(model)
+    if adapter.astream is None:
+        # Fall back to the blocking implementation without stalling the loop
+        return await asyncio.to_thread(ai_turn, ai_name, conversation, model, system_prompt, streaming_callback=streaming_callback,
+                                       context_cache=context_cache, context_key=context_key, cancel_token=cancel_token,
+                                       queue_wait=queue_wait)
+    
+    model_id, system_prompt, messages = prepare_turn(ai_name, conversation, model, system_prompt, context_cache, context_key)
+    prompt_content, context_messages = adapter.prepare(messages)
+    
+    print(f"Using async {adapter.label} for model: {model_id}")
+    with turn_recorder(ai_name, model, adapter.upstream, queue_wait) as recorder:
+        on_chunk = recorder.wrap(streaming_callback if adapter.streaming else None)
+        started = time.monotonic()
+        failures = 0
+        try:
+            while True:
+                chunks = []
+                sent = [time.monotonic()]  # Updated when the request actually goes out
+                try:
+                    with request_sent_listener(sent.append):
+                        async for chunk in adapter.astream(prompt_content, context_messages, model_id, system_prompt):
+                            if not chunks:
+                                record_ttft(model_id, time.monotonic() - sent[-1])
+                            chunks.append(chunk)
+                            on_chunk(chunk)
+                    break
+                except Exception as e:
+                    # A stream that broke partway is started again from scratch
+                    failures += 1
+                    delay = DEFAULT_POLICY.backoff(failures, started, error=e)
+                    if delay is None:
+                        raise
+                    notify_retry(adapter.upstream, failures, delay, f"stream interrupted ({e})")
+                    await asyncio.sleep(delay)
+            result = adapter.build_result(adapter.from_stream(''.join(chunks)), model, ai_name)
+        except Exception as e:
+            error_message = f"Error making API request: {str(e)}"
+            print(f"Error: {error_message}")
+            result = {
+                "role": "system",
+                "content": f"Error: {error_message}",
+                "model": model,
+                "ai_name": ai_name
+            }
+        _finish_turn(recorder, result, messages)
+    
+    result["metrics"] = recorder.record
+    return result
+
+def get_turn_delay(ai_name, previous_model, next_model):
+    """Seconds to wait before `ai_name` speaks
+    
+    A PER_AI_TURN_DELAY entry wins. Otherwise, with ADAPTIVE_TURN_DELAY,
+    there is no wait when the provider changes between consecutive AIs, and
+    back-to-back calls to the same provider wait TURN_DELAY (or longer if
+    that provider asked us to back off). Without it, always TURN_DELAY.
+    """
+    if ai_name in PER_AI_TURN_DELAY:
+        return PER_AI_TURN_DELAY[ai_name]
+    if not ADAPTIVE_TURN_DELAY or previous_model is None:
+        return TURN_DELAY
+    
+    next_provider = get_model_provider(next_model)
+    backoff = get_provider_backoff(next_provider)
+    if get_model_provider(previous_model) != next_provider:
+        return backoff
+    return max(TURN_DELAY, backoff)
+
+def build_user_message(user_input, hidden=False):
+    """Turn user input into a conversation message
+    
+    Args:
+        user_input: Plain string, or a dict with 'text' and optional 'image'
+            ({'media_type': ..., 'base64': ...}) as sent by the input field
+        hidden: Mark the message as hidden (sent to the AIs, not displayed)
+    """
+    if isinstance(user_input, dict):
+        text = user_input.get('text', '')
+        image_data = user_input.get('image')
+        
+        if image_data:
+            # Create message with image
+            user_message = {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": image_data['media_type'],
+                            "data": image_data['base64']
+                        }
+                    }
+                ]
+            }
+            # Add text if provided
+            if text:
+                user_message["content"].insert(0, {
+                    "type": "text",
+                    "text": text
+                })
+        else:
+            user_message = {
+                "role": "user",
+                "content": text
+            }
+    else:
+        user_message = {
+            "role": "user",
+            "content": user_input
+        }
+    
+    if hidden:
+        user_message["hidden"] = True
+    return user_message
+
+def create_rabbithole_branch(parent_conversation, selected_text, parent_id=None, context_cache=None):
+    """Create a rabbithole branch exploring `selected_text`
+    
+    The branch keeps ALL of the parent's context (minus older branch
+    indicators) and ends with a new branch indicator.
+    
+    Args:
+        context_cache: Optional ContextCache; anything cached under the new
+            branch ID is invalidated
+    
+    Returns:
+        (branch_id, branch_data) - branch_data has type, selected_text,
+        conversation and parent keys
+    """
+    branch_id = f"rabbithole_{time.time()}"
+    if context_cache is not None:
+        context_cache.invalidate(branch_id)
+    
+    # Copy ALL previous context except branch indicators
+    branch_conversation = [msg.copy() for msg in parent_conversation if not msg.get('_type') == 'branch_indicator']
+    
+    # Add the branch indicator at the END (not beginning)
+    branch_conversation.append({
+        "role": "system",
+        "content": f"🐇 Rabbitholing down: \"{selected_text}\"",
+        "_type": "branch_indicator"  # Special flag for branch indicators
+    })
+    
+    return branch_id, {
+        'type': 'rabbithole',
+        'selected_text': selected_text,
+        'conversation': branch_conversation,
+        'parent': parent_id
+    }
+
+def create_fork_branch(parent_conversation, selected_text, parent_id=None, context_cache=None):
+    """Create a fork branch continuing from `selected_text`
+    
+    Context is cut off right after the first user/assistant message that
+    contains the selected text (that message is truncated at the selection).
+    If no single message contains it, e.g. a selection spanning messages,
+    all context is kept.
+    
+    Args:
+        context_cache: As for create_rabbithole_branch
+    
+    Returns:
+        (branch_id, branch_data) - same shape as create_rabbithole_branch
+    """
+    branch_id = f"fork_{time.time()}"
+    if context_cache is not None:
+        context_cache.invalidate(branch_id)
+    branch_conversation = []
+    
+    # First pass: find the message containing the selected text
+    truncate_idx = None
+    for i, msg in enumerate(parent_conversation):
+        if msg.get('role') in ['user', 'assistant'] and selected_text in msg.get('content', ''):
+            truncate_idx = i
+            break
+    
+    if truncate_idx is None:
+        print("Warning: Selected text not found in any single message, including all context")
+        # Copy all messages except branch indicators
+        for msg in parent_conversation:
+            if not msg.get('_type') == 'branch_indicator':
+                branch_conversation.append(msg.copy())
+    else:
+        # Second pass: add all messages up to the truncate point
+        for i, msg in enumerate(parent_conversation):
+            # Always include system messages that aren't branch indicators
+            if msg.get('role') == 'system' and not msg.get('_type') == 'branch_indicator':
+                branch_conversation.append(msg.copy())
+                continue
+            
+            if i < truncate_idx:
+                branch_conversation.append(msg.copy())
+            elif i == truncate_idx:
+                # Include everything up to and including the selected text
+                content = msg.get('content', '')
+                modified_msg = msg.copy()
+                modified_msg['content'] = content[:content.find(selected_text) + len(selected_text)]
+                branch_conversation.append(modified_msg)
+    
+    # Add the branch indicator as the last message
+    branch_conversation.append({
+        "role": "system",
+        "content": f"🍴 Forking off: \"{selected_text}\"",
+        "_type": "branch_indicator"  # Special flag for branch indicators
+    })
+    
+    return branch_id, {
+        'type': 'fork',
+        'selected_text': selected_text,
+        'conversation': branch_conversation,
+        'parent': parent_id
+    }
+
+def get_branch_system_prompt(branch_data, default_prompt):
+    """System prompt for the next AI in a branch
+    
+    Rabbitholes use a focused exploration prompt until two AIs have responded
+    in the branch; everything else uses the prompt pair's prompt.
+    """
+    ai_response_count = sum(1 for msg in branch_data['conversation'] if msg.get('role') == 'assistant')
+    if branch_data.get('type', 'branch').lower() == 'rabbithole' and ai_response_count < 2:
+        selected_text = branch_data.get('selected_text', '')
+        return f"You are interacting with other AIs. IMPORTANT: Focus this response specifically on exploring and expanding upon the concept of '{selected_text}' in depth. Discuss the most interesting aspects or connections related to this concept while maintaining the tone of the conversation. No numbered lists or headings."
+    return default_prompt
+
+def result_to_message(ai_name, model, result):
+    """Convert an ai_turn result (or its text) into the message stored in the conversation
+    
+    A failed turn becomes a system message: it is shown, but never sent to
+    the AIs as this AI's reply.
+    """
+    content = result.get('content', '') if isinstance(result, dict) else result
+    status = result.get("turn_status") if isinstance(result, dict) else None
+    if (status or turn_status(result)) == "error":
+        error = content if isinstance(content, str) and content.startswith("Error") else f"Error: {model} returned no reply"
+        return {"role": "system", "content": error, "ai_name": ai_name, "model": model}
+    return {
+        "role": "assistant",
+        "content": content if content else "",
+        "ai_name": ai_name,
+        "model": model
+    }
+
+class ConversationEngine:
+    """Runs AI-to-AI conversations without a GUI
+    
+    Holds the same state the GUI keeps on its main window (main conversation,
+    branch conversations and the active branch), but takes its settings as
+    explicit arguments instead of reading them from widgets.
+    
+    Args:
+        models: Model display names (or raw IDs), one per AI, in speaking order
+        prompt_pair: Key into SYSTEM_PROMPT_PAIRS
+        iterations: Rounds to run per run() call (each AI speaks once per round)
+        turn_mode: "sequential" (each AI sees the previous reply) or "parallel"
+            (every AI answers the same snapshot; replies committed in AI order)
+        use_turn_delay: Pause between sequential turns as the GUI does
+        streaming_callback: Optional function(ai_name, chunk), sequential mode only
+        message_callback: Optional function(ai_name, message) called as each
+            reply is added to the conversation
+        retry_callback: Optional function(ai_name, attempt, reason) called when
+            a turn's request is retried; text streamed so far will be resent
+        provider_semaphores: Optional dict of provider name -> semaphore; each
+            turn holds its provider's semaphore, so engines sharing the dict
+            share a concurrency cap (see batch_runner)
+        rolling_summary: Fold older turns into a shared running summary
+            (default config.ROLLING_SUMMARY, see rolling_summary.py)
+    
+    abort() (safe from any thread) closes the requests in flight and stops
+    the session; replies that were cut off are not added.
+    """
+    
+    def __init__(self, models, prompt_pair="Backrooms", iterations=1, turn_mode="sequential",
+                 use_turn_delay=True, streaming_callback=None, message_callback=None,
+                 provider_semaphores=None, rolling_summary=None, retry_callback=None):
+        if not 1 <= len(models) <= 5:
+            raise ValueError(f"Between 1 and 5 models are supported, got {len(models)}")
+        if prompt_pair not in SYSTEM_PROMPT_PAIRS:
+            raise ValueError(f"Unknown prompt pair '{prompt_pair}'. Available: {', '.join(SYSTEM_PROMPT_PAIRS)}")
+        if turn_mode not in ("sequential", "parallel"):
+            raise ValueError(f"Unknown turn mode '{turn_mode}' (expected 'sequential' or 'parallel')")
+        
+        self.ai_models = {f"AI-{i}": model for i, model in enumerate(models, start=1)}
+        self.prompt_pair = prompt_pair
+        self.iterations = iterations
+        self.turn_mode = turn_mode
+        self.use_turn_delay = use_turn_delay
+        self.streaming_callback = streaming_callback
+        self.message_callback = message_callback
+        self.retry_callback = retry_callback
+        self.provider_semaphores = provider_semaphores or {}
+        self.context_cache = create_context_cache(rolling_summary)  # Per-(conversation, AI) incremental turn context
+        self.cancel_token = CancellationToken()  # Shared by every turn; see abort()
+        
+        self.main_conversation = []
+        self.branch_conversations = {}
+        self.active_branch = None
+    
+    @property
+    def conversation(self):
+        """The conversation currently being extended (main or active branch)"""
+        if self.active_branch:
+            return self.branch_conversations[self.active_branch]['conversation']
+        return self.main_conversation
+    
+    def add_user_message(self, user_input, hidden=False):
+        """Append a user message to the active conversation"""
+        self.conversation.append(build_user_message(user_input, hidden=hidden))
+    
+    def get_system_prompt(self, ai_name):
+        """System prompt for an AI's next turn, honouring branch prompts"""
+        default_prompt = SYSTEM_PROMPT_PAIRS[self.prompt_pair][ai_name]
+        if self.active_branch:
+            return get_branch_system_prompt(self.branch_conversations[self.active_branch], default_prompt)
+        return default_prompt
+    
+    @property
+    def aborted(self):
+        return self.cancel_token.cancelled
+    
+    def abort(self):
+        """Stop the session: close in-flight requests and run no further turns"""
+        if not self.aborted:
+            print("Aborting session")
+        self.cancel_token.cancel()
+    
+    def run(self, user_input=None, iterations=None):
+        """Optionally add user input, then run the configured number of rounds
+        
+        Returns right away (after adding the input) once the engine is aborted.
+        
+        Returns:
+            The active conversation
+        """
+        if user_input:
+            self.add_user_message(user_input)
+        
+        iterations = self.iterations if iterations is None else iterations
+        try:
+            for turn in range(iterations):
+                self.cancel_token.raise_if_cancelled()
+                label = f"BRANCH {self.active_branch}" if self.active_branch else "MAIN"
+                print(f"{label}: Starting turn {turn + 1} of {iterations}")
+                self.run_round()
+        except Cancelled:
+            print("Session aborted")
+        return self.conversation
+    
+    def run_round(self):
+        """Let every AI speak once; returns the messages added this round"""
+        if self.turn_mode == "parallel":
+            return self._run_parallel_round()
+        
+        added = []
+        previous_model = None
+        for ai_name, model in self.ai_models.items():
+            if self.use_turn_delay and previous_model is not None:
+                delay = get_turn_delay(ai_name, previous_model, model)
+                if delay:
+                    print(f"Waiting {delay:.1f}s before {ai_name}'s turn")
+                    if self.cancel_token.wait(delay):
+                        raise Cancelled("cancelled")
+            
+            callback = None
+            if self.streaming_callback:
+                callback = functools.partial(self.streaming_callback, ai_name)
+            message = self._take_turn(ai_name, model, self.conversation.copy(), callback)
+            self._commit(ai_name, message)
+            added.append(message)
+            previous_model = model
+        return added
+    
+    def _run_parallel_round(self):
+        """Run every AI on the same snapshot at once, committing in AI order"""
+        snapshot = self.conversation.copy()
+        with ThreadPoolExecutor(max_workers=len(self.ai_models)) as executor:
+            futures = {
+                ai_name: executor.submit(self._take_turn, ai_name, model, snapshot, None)
+                for ai_name, model in self.ai_models.items()
+            }
+            try:
+                # Wait for the whole round first, so an abort commits none of it
+                messages = [future.result() for future in futures.values()]
+            except KeyboardInterrupt:
+                # Otherwise leaving the executor would wait for every stream to end
+                self.abort()
+                raise
+        added = []
+        for ai_name, message in zip(futures, messages, strict=True):
+            self._commit(ai_name, message)
+            added.append(message)
+        return added
+    
+    def _take_turn(self, ai_name, model, conversation, streaming_callback):
+        """Run one AI turn and return the message to store"""
+        provider = get_model_provider(model)
+        semaphore = self.provider_semaphores.get(provider)
+        queued_at = time.monotonic()
+        if semaphore:
+            semaphore.acquire()
+        try:
+            # Wait out any Retry-After the provider sent to a concurrent session
+            backoff = get_provider_backoff(provider)
+            if backoff:
+                print(f"{provider} asked us to back off, waiting {backoff:.1f}s before {ai_name}'s turn")
+                if self.cancel_token.wait(backoff):
+                    raise Cancelled("cancelled")
+            listener = None
+            if self.retry_callback:
+                listener = functools.partial(self.retry_callback, ai_name)
+            with retry_listener(listener):
+                result = ai_turn(ai_name, conversation, model, self.get_system_prompt(ai_name),
+                                 streaming_callback=streaming_callback,
+                                 context_cache=self.context_cache, context_key=self.active_branch or "main",
+                                 cancel_token=self.cancel_token, queue_wait=time.monotonic() - queued_at)
+            # A reply that finished just as the session was aborted is dropped too
+            self.cancel_token.raise_if_cancelled()
+            return result_to_message(ai_name, model, result)
+        except Cancelled:
+            raise
+        except Exception as e:
+            print(f"Error: {e}")
+            return {"role": "system", "content": f"Error: {e}"}
+        finally:
+            if semaphore:
+                semaphore.release()
+    
+    def _commit(self, ai_name, message):
+        self.conversation.append(message)
+        if self.message_callback:
+            self.message_callback(ai_name, message)
+    
+    def rabbithole(self, selected_text, iterations=None):
+        """Branch off the active conversation to explore `selected_text`, then run it"""
+        print(f"Creating rabbithole branch for: '{selected_text}'")
+        branch_id, branch_data = create_rabbithole_branch(self.conversation, selected_text, self.active_branch,
+                                                        self.context_cache)
+        self.branch_conversations[branch_id] = branch_data
+        self.active_branch = branch_id
+        self.run(selected_text, iterations)
+        return branch_id
+    
+    def fork(self, selected_text, iterations=None):
+        """Fork the active conversation at `selected_text`, then run the fork"""
+        print(f"Creating fork branch for: '{selected_text}'")
+        branch_id, branch_data = create_fork_branch(self.conversation, selected_text, self.active_branch, self.context_cache)
+        self.branch_conversations[branch_id] = branch_data
+        self.active_branch = branch_id
+        # Forks continue from a hidden "..." nudge, as in the GUI
+        self.add_user_message("...", hidden=True)
+        self.run(None, iterations)
+        return branch_id
+    
+    def switch_to_main(self):
+        """Make the main conversation active again"""
+        self.active_branch = None
+    
+    def to_dict(self):
+        """Serializable snapshot of the session: settings, main and branch conversations"""
+        return {
+            "models": self.ai_models,
+            "prompt_pair": self.prompt_pair,
+            "turn_mode": self.turn_mode,
+            "main": [public_message(msg) for msg in self.main_conversation],
+            "branches": {
+                branch_id: dict(branch_data, conversation=[public_message(msg) for msg in branch_data['conversation']])
+                for branch_id, branch_data in self.branch_conversations.items()
+            },
+        }
+    
+    def save_transcript(self, path):
+        """Write the session to a JSON file"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        print(f"Transcript saved to {path}")
+
+def load_session_config(path):
+    """Load a session config from a JSON file
+    
+    Example:
+        {
+          "models": ["Claude Sonnet 4.5", "GPT-4o"],
+          "prompt_pair": "Backrooms",
+          "iterations": 3,
+          "turn_mode": "sequential",
+          "input": "what is behind the wallpaper?",
+          "branches": [{"type": "rabbithole", "text": "wallpaper", "iterations": 2}]
+        }
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def create_engine(config, **kwargs):
+    """Build a ConversationEngine from a session config dict
+    
+    Args:
+        config: Session config (see load_session_config)
+        **kwargs: Passed through to ConversationEngine (callbacks, semaphores)
+    """
+    if not config.get('models'):
+        raise ValueError("Session config needs a non-empty 'models' list")
+    return ConversationEngine(
+        config['models'],
+        prompt_pair=config.get('prompt_pair', 'Backrooms'),
+        iterations=config.get('iterations', 1),
+        turn_mode=config.get('turn_mode', 'sequential'),
+        use_turn_delay=config.get('turn_delay', True),
+        rolling_summary=config.get('rolling_summary'),
+        **kwargs
+    )
+
+def run_session(config, engine=None, **kwargs):
+    """Run a whole session described by a config dict (see load_session_config)
+    
+    The main conversation runs first, then each branch op in order; like the
+    GUI, every branch is taken from whichever conversation is active.
+    
+    Args:
+        engine: Optional engine from create_engine(config); built here if omitted
+        **kwargs: Passed to create_engine when building the engine
+    
+    Returns:
+        The ConversationEngine, for saving or inspecting the transcript
+    """
+    if engine is None:
+        engine = create_engine(config, **kwargs)
+    engine.run(config.get('input'))
+    
+    for op in config.get('branches', []):
+        if engine.aborted:
+            break
+        op_type = op.get('type')
+        if op_type == 'rabbithole':
+            engine.rabbithole(op['text'], op.get('iterations'))
+        elif op_type == 'fork':
+            engine.fork(op['text'], op.get('iterations'))
+        else:
+            raise ValueError(f"Unknown branch op '{op_type}' (expected 'rabbithole' or 'fork')")
+    
+    return engine
@@ -19,17 +19,20 @@ import sys
 import webbrowser
 import base64
 from PyQt6.QtCore import Qt, QRect, QTimer, QRectF, QPointF, QSize, pyqtSignal, QEvent, QPropertyAnimation, QEasingCurve
-from PyQt6.QtGui import QFont, QColor, QPainter, QPen, QBrush, QFontDatabase, QTextCursor, QAction, QKeySequence, QTextCharFormat, QLinearGradient, QRadialGradient, QPainterPath, QImage, QPixmap
+from PyQt6.QtGui import QFont, QColor, QPainter, QPen, QBrush, QFontDatabase, QTextCursor, QAction, QKeySequence, QTextCharFormat, QLinearGradient, QRadialGradient, QPainterPath, QImage, QPixmap, QTextDocument, QTextDocumentFragment
 from PyQt6.QtWidgets import QWidget, QApplication, QMainWindow, QSplitter, QVBoxLayout, QHBoxLayout, QTextEdit, QFrame, QLineEdit, QPushButton, QLabel, QComboBox, QMenu, QFileDialog, QMessageBox, QScrollArea, QToolTip, QSizePolicy, QCheckBox, QGraphicsDropShadowEffect
 
 from config import (
     AI_MODELS,
     SYSTEM_PROMPT_PAIRS,
-    SHOW_CHAIN_OF_THOUGHT_IN_CONTEXT
+    SHOW_CHAIN_OF_THOUGHT_IN_CONTEXT,
+    RENDER_MAX_IN_PLACE_UPDATES,
+    VIRTUAL_TRANSCRIPT
 )
 
 # Add import for the HTML viewing functionality 
 from shared_utils import open_html_in_browser, generate_image_from_text
+from transcript_view import TranscriptView
 
 # Define global color palette for consistent styling - Cyberpunk theme
 COLORS = {
@@ -1297,6 +1300,23 @@ class ControlPanel(QWidget):
         num_ais_layout.addWidget(self.num_ais_selector)
         controls_layout.addWidget(num_ais_container)
         
+        # Turn mode selection (sequential chain vs. all AIs answering concurrently)
+        turn_mode_container = QWidget()
+        turn_mode_layout = QVBoxLayout(turn_mode_container)
+        turn_mode_layout.setContentsMargins(0, 0, 0, 0)
+        turn_mode_layout.setSpacing(5)
+        
+        turn_mode_label = QLabel("▸ TURN MODE")
+        turn_mode_label.setStyleSheet(f"color: {COLORS['text_glow']}; font-size: 10px; font-weight: bold; letter-spacing: 1px;")
+        turn_mode_layout.addWidget(turn_mode_label)
+        
+        self.turn_mode_selector = QComboBox()
+        self.turn_mode_selector.addItems(["Sequential", "Parallel Round"])
+        self.turn_mode_selector.setStyleSheet(self.get_combobox_style())
+        self.turn_mode_selector.setToolTip("Parallel Round: every AI answers the same snapshot at once; replies are committed in AI order")
+        turn_mode_layout.addWidget(self.turn_mode_selector)
+        controls_layout.addWidget(turn_mode_container)
+        
         # AI-1 Model selection
         self.ai1_container = QWidget()
         ai1_layout = QVBoxLayout(self.ai1_container)
@@ -1453,6 +1473,7 @@ class ControlPanel(QWidget):
         controls_layout.addWidget(mode_container)
         controls_layout.addWidget(iterations_container)
         controls_layout.addWidget(num_ais_container)
+        controls_layout.addWidget(turn_mode_container)
         
         # Divider
         divider1 = QLabel("─" * 20)
@@ -1647,16 +1668,14 @@ class ConversationContextMenu(QMenu):
     def on_rabbithole_selected(self):
         """Signal that rabbithole action was selected"""
         if self.parent() and hasattr(self.parent(), 'rabbithole_from_selection'):
-            cursor = self.parent().conversation_display.textCursor()
-            selected_text = cursor.selectedText()
+            selected_text = self.parent().selected_text()
             if selected_text and hasattr(self.parent(), 'rabbithole_callback'):
                 self.parent().rabbithole_callback(selected_text)
     
     def on_fork_selected(self):
         """Signal that fork action was selected"""
         if self.parent() and hasattr(self.parent(), 'fork_from_selection'):
-            cursor = self.parent().conversation_display.textCursor()
-            selected_text = cursor.selectedText()
+            selected_text = self.parent().selected_text()
             if selected_text and hasattr(self.parent(), 'fork_callback'):
                 self.parent().fork_callback(selected_text)
 
@@ -1673,7 +1692,10 @@ class ConversationPane(QWidget):
         
         # Initialize state
         self.conversation = []
+        self._rendered_messages = []  # {"message", "content", "start"} per message on screen
+        self._rendered_end = 0  # Where the last rendered message ends (streamed text follows)
         self.input_callback = None
+        self.stop_callback = None
         self.rabbithole_callback = None
         self.fork_callback = None
         self.loading = False
@@ -1749,9 +1771,13 @@ class ConversationPane(QWidget):
         
         layout.addLayout(title_layout)
         
-        # Conversation display (read-only text edit in a scroll area)
-        self.conversation_display = QTextEdit()
-        self.conversation_display.setReadOnly(True)
+        # Conversation display: a virtualized view for long transcripts, or a read-only text edit
+        self.virtual_transcript = VIRTUAL_TRANSCRIPT
+        if self.virtual_transcript:
+            self.conversation_display = TranscriptView(self.message_html, self._conversation_stylesheet())
+        else:
+            self.conversation_display = QTextEdit()
+            self.conversation_display.setReadOnly(True)
         self.conversation_display.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.conversation_display.customContextMenuRequested.connect(self.show_context_menu)
         
@@ -1763,7 +1789,7 @@ class ConversationPane(QWidget):
         
         # Apply cyberpunk styling
         self.conversation_display.setStyleSheet(f"""
-            QTextEdit {{
+            QTextEdit, TranscriptView {{
                 background-color: {COLORS['bg_dark']};
                 color: {COLORS['text_normal']};
                 border: 1px solid {COLORS['border_glow']};
@@ -1877,6 +1903,33 @@ class ConversationPane(QWidget):
             }}
         """)
         
+        # Stop button: aborts the AI turns in flight
+        self.stop_button = GlowButton("■ STOP", COLORS['text_error'])
+        self.stop_button.shadow.setBlurRadius(5)  # Subtler glow
+        self.stop_button.base_blur = 5
+        self.stop_button.hover_blur = 12
+        self.stop_button.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {COLORS['bg_medium']};
+                color: {COLORS['text_normal']};
+                border: 1px solid {COLORS['border_glow']};
+                border-radius: 3px;
+                padding: 8px 12px;
+                font-weight: bold;
+                font-size: 10px;
+                letter-spacing: 1px;
+            }}
+            QPushButton:hover {{
+                background-color: {COLORS['bg_light']};
+                border: 2px solid {COLORS['text_error']};
+                color: {COLORS['text_error']};
+            }}
+            QPushButton:pressed {{
+                background-color: {COLORS['border_glow']};
+            }}
+        """)
+        self.stop_button.setToolTip("Stop the running conversation (in-flight replies are discarded)")
+        
         # Submit button with cyberpunk styling and glow effect
         self.submit_button = GlowButton("⚡ PROPAGATE", COLORS['accent_cyan'])
         self.submit_button.setStyleSheet(f"""
@@ -1910,6 +1963,7 @@ class ConversationPane(QWidget):
         button_layout.addWidget(self.upload_image_button)
         button_layout.addWidget(self.clear_button)
         button_layout.addStretch()
+        button_layout.addWidget(self.stop_button)
         button_layout.addWidget(self.submit_button)
         
         # Add input container to main layout
@@ -1930,6 +1984,9 @@ class ConversationPane(QWidget):
         # Clear button
         self.clear_button.clicked.connect(self.clear_input)
         
+        # Stop button
+        self.stop_button.clicked.connect(self.handle_stop_click)
+        
         # Enter key in input field
         self.input_field.installEventFilter(self)
     
@@ -2036,6 +2093,15 @@ class ConversationPane(QWidget):
         """Set callback function for input submission"""
         self.input_callback = callback
     
+    def handle_stop_click(self):
+        """Handle click on the stop button"""
+        if self.stop_callback:
+            self.stop_callback()
+    
+    def set_stop_callback(self, callback):
+        """Set callback function that stops the running conversation"""
+        self.stop_callback = callback
+    
     def set_rabbithole_callback(self, callback):
         """Set callback function for rabbithole creation"""
         self.rabbithole_callback = callback
@@ -2050,110 +2116,97 @@ class ConversationPane(QWidget):
         self.render_conversation()
     
     def render_conversation(self):
-        """Render conversation in the display"""
+        """Bring the display up to date with self.conversation
+
+        Only new or changed messages are turned into HTML. Each rendered
+        message keeps the document position where its block starts, so a
+        changed message is replaced in place, a shortened conversation is cut
+        at its first changed message and new messages are appended; the rest
+        of the document is left alone. Streamed text after the last message
+        (append_text, display_image) is removed first, since the finished
+        reply takes its place.
+        """
         # Check if user is at the bottom before re-rendering
         scrollbar = self.conversation_display.verticalScrollBar()
         was_at_bottom = scrollbar.value() >= scrollbar.maximum() - 20
         
-        # Clear display
-        self.conversation_display.clear()
-        
-        # Create HTML for conversation with modern styling
-        html = "<style>"
-        html += f"body {{ font-family: 'Iosevka Term', 'Consolas', 'Monaco', monospace; font-size: 10pt; line-height: 1.4; }}"
-        html += f".message {{ margin-bottom: 10px; padding: 8px; border-radius: 4px; }}"
-        html += f".user {{ background-color: {COLORS['bg_medium']}; }}"
-        html += f".assistant {{ background-color: {COLORS['bg_medium']}; }}"
-        html += f".system {{ background-color: {COLORS['bg_medium']}; font-style: italic; }}"
-        html += f".header {{ font-weight: bold; margin: 10px 0; color: {COLORS['accent_blue']}; }}"
-        html += f".content {{ white-space: pre-wrap; color: {COLORS['text_normal']}; }}"
-        html += f".branch-indicator {{ color: {COLORS['text_dim']}; font-style: italic; text-align: center; margin: 8px 0; }}"
-        html += f".rabbithole {{ color: {COLORS['accent_green']}; }}"
-        html += f".fork {{ color: {COLORS['accent_yellow']}; }}"
-        # Removed HTML contribution styling
-        html += f"pre {{ background-color: {COLORS['bg_dark']}; border: 1px solid {COLORS['border']}; border-radius: 3px; padding: 8px; overflow-x: auto; margin: 8px 0; }}"
-        html += f"code {{ font-family: 'Iosevka Term', 'Consolas', 'Monaco', monospace; color: {COLORS['text_bright']}; }}"
-        html += "</style>"
-        
-        for i, message in enumerate(self.conversation):
-            role = message.get("role", "")
-            content = message.get("content", "")
-            ai_name = message.get("ai_name", "")
-            model = message.get("model", "")
-            
-            # Handle structured content (with images)
-            has_image = False
-            image_base64 = None
-            text_content = ""
-            
-            if isinstance(content, list):
-                # Structured content with potential images
-                for part in content:
-                    if part.get('type') == 'text':
-                        text_content += part.get('text', '')
-                    elif part.get('type') == 'image':
-                        has_image = True
-                        source = part.get('source', {})
-                        if source.get('type') == 'base64':
-                            image_base64 = source.get('data', '')
-            else:
-                # Plain text content
-                text_content = content
-            
-            # Skip empty messages (no text and no image)
-            if not text_content and not has_image:
-                continue
-                
-            # Handle branch indicators with special styling
-            if role == 'system' and message.get('_type') == 'branch_indicator':
-                if "Rabbitholing down:" in content:
-                    html += f'<div class="branch-indicator rabbithole">{content}</div>'
-                elif "Forking off:" in content:
-                    html += f'<div class="branch-indicator fork">{content}</div>'
-                continue
-            
-            # Removed HTML contribution indicator logic
-            
-            # Process content to handle code blocks
-            processed_content = self.process_content_with_code_blocks(text_content) if text_content else ""
-            
-            # Add image display if present
-            image_html = ""
-            if has_image and image_base64:
-                image_html = f'<div style="margin: 10px 0;"><img src="data:image/jpeg;base64,{image_base64}" style="max-width: 100%; border-radius: 8px;" /></div>'
-            
-            # Format based on role
-            if role == 'user':
-                # User message
-                html += f'<div class="message user">'
-                if image_html:
-                    html += image_html
-                if processed_content:
-                    html += f'<div class="content">{processed_content}</div>'
-                html += f'</div>'
-            elif role == 'assistant':
-                # AI message
-                display_name = ai_name
-                if model:
-                    display_name += f" ({model})"
-                html += f'<div class="message assistant">'
-                html += f'<div class="header">\n{display_name}\n</div>'
-                if image_html:
-                    html += image_html
-                if processed_content:
-                    html += f'<div class="content">{processed_content}</div>'
-                
-                # Removed HTML contribution indicator
-                
-                html += f'</div>'
-            elif role == 'system':
-                # System message
-                html += f'<div class="message system">'
-                html += f'<div class="content">{processed_content}</div>'
-                html += f'</div>'
+        if self.virtual_transcript:
+            # The view's model does the same comparison and lays out only what is on screen
+            self.conversation_display.set_conversation(self.conversation)
+            if was_at_bottom:
+                scrollbar.setValue(scrollbar.maximum())
+            return
         
-        # Set HTML in display
-        self.conversation_display.setHtml(html)
+        document = self.conversation_display.document()
+        rendered = self._rendered_messages
+        if self._rendered_end > document.characterCount() - 1:
+            # The display was cleared behind our back
+            rendered = []
+        conversation = self.conversation
+        
+        def end_of(index):
+            return rendered[index + 1]["start"] if index + 1 < len(rendered) else self._rendered_end
+        
+        # Messages no longer on screen as they were rendered (other dict or new content)
+        changed = [
+            i for i in range(min(len(rendered), len(conversation)))
+            if rendered[i]["message"] is not conversation[i]
+            or rendered[i]["content"] is not conversation[i].get("content", "")
+        ]
+        keep = len(rendered)
+        if len(conversation) < len(rendered):
+            keep = changed[0] if changed else len(conversation)
+            changed = []
+        replacements = {}
+        if len(changed) <= RENDER_MAX_IN_PLACE_UPDATES:
+            for i in changed:
+                html = self.message_html(conversation[i])
+                if not html or end_of(i) == rendered[i]["start"] or rendered[i]["start"] == 0:
+                    # Shown <-> hidden changes the block separators, and the first
+                    # block keeps its old format: re-render from here
+                    break
+                replacements[i] = html
+        if changed and len(replacements) < len(changed):
+            keep = changed[0]
+            replacements = {}
+        
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        if keep == 0:
+            document.clear()
+            document.setDefaultStyleSheet(self._conversation_stylesheet())
+            rendered = []
+        else:
+            # Drop streamed text (and any messages from the first one that changed)
+            cursor.setPosition(rendered[keep]["start"] if keep < len(rendered) else self._rendered_end)
+            cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+            cursor.removeSelectedText()
+            del rendered[keep:]
+            self._rendered_end = cursor.position()
+        
+        # Replace changed messages in place, shifting the blocks after them
+        for i, html in replacements.items():
+            start, end = rendered[i]["start"], end_of(i)
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+            cursor.removeSelectedText()
+            self._insert_message_html(cursor, html)
+            shift = cursor.position() - end
+            for later in rendered[i + 1:]:
+                later["start"] += shift
+            self._rendered_end += shift
+            rendered[i] = {"message": conversation[i], "content": conversation[i].get("content", ""), "start": start}
+        
+        # Append new messages
+        cursor.setPosition(self._rendered_end if rendered else 0)
+        for message in conversation[len(rendered):]:
+            start = cursor.position()
+            self._insert_message_html(cursor, self.message_html(message))
+            rendered.append({"message": message, "content": message.get("content", ""), "start": start})
+        cursor.endEditBlock()
+        
+        self._rendered_messages = rendered
+        self._rendered_end = cursor.position()
         
         # Only auto-scroll if user was already at the bottom
         if was_at_bottom:
@@ -2161,6 +2214,123 @@ class ConversationPane(QWidget):
                 self.conversation_display.verticalScrollBar().maximum()
             )
     
+    def _insert_message_html(self, cursor, html):
+        """Insert one message's HTML at the cursor, in a block of its own"""
+        if not html:
+            return
+        # Laid out on its own first: insertHtml would merge the first block into the
+        # current one and lose its format (margins, alignment)
+        message_document = QTextDocument()
+        message_document.setDefaultStyleSheet(self.conversation_display.document().defaultStyleSheet())
+        message_document.setHtml(html)
+        first_block = message_document.firstBlock()
+        if cursor.position() > 0:
+            cursor.insertBlock(first_block.blockFormat(), first_block.charFormat())
+        else:
+            cursor.setBlockFormat(first_block.blockFormat())
+        cursor.insertFragment(QTextDocumentFragment(message_document))
+    
+    def _conversation_stylesheet(self):
+        """CSS for the conversation display (set as the document's default style sheet)"""
+        css = f"body {{ font-family: 'Iosevka Term', 'Consolas', 'Monaco', monospace; font-size: 10pt; line-height: 1.4; }}"
+        css += f".message {{ margin-bottom: 10px; padding: 8px; border-radius: 4px; }}"
+        css += f".user {{ background-color: {COLORS['bg_medium']}; }}"
+        css += f".assistant {{ background-color: {COLORS['bg_medium']}; }}"
+        css += f".system {{ background-color: {COLORS['bg_medium']}; font-style: italic; }}"
+        css += f".header {{ font-weight: bold; margin: 10px 0; color: {COLORS['accent_blue']}; }}"
+        css += f".content {{ white-space: pre-wrap; color: {COLORS['text_normal']}; }}"
+        css += f".branch-indicator {{ color: {COLORS['text_dim']}; font-style: italic; text-align: center; margin: 8px 0; }}"
+        css += f".rabbithole {{ color: {COLORS['accent_green']}; }}"
+        css += f".fork {{ color: {COLORS['accent_yellow']}; }}"
+        # Removed HTML contribution styling
+        css += f"pre {{ background-color: {COLORS['bg_dark']}; border: 1px solid {COLORS['border']}; border-radius: 3px; padding: 8px; overflow-x: auto; margin: 8px 0; }}"
+        css += f"code {{ font-family: 'Iosevka Term', 'Consolas', 'Monaco', monospace; color: {COLORS['text_bright']}; }}"
+        return css
+    
+    def message_html(self, message):
+        """HTML for one conversation message ("" for messages that are not shown)
+        
+        Args:
+            message: Conversation message dict (role, content, ai_name, model)
+        """
+        role = message.get("role", "")
+        content = message.get("content", "")
+        ai_name = message.get("ai_name", "")
+        model = message.get("model", "")
+        
+        # Handle structured content (with images)
+        has_image = False
+        image_base64 = None
+        text_content = ""
+        
+        if isinstance(content, list):
+            # Structured content with potential images
+            for part in content:
+                if part.get('type') == 'text':
+                    text_content += part.get('text', '')
+                elif part.get('type') == 'image':
+                    has_image = True
+                    source = part.get('source', {})
+                    if source.get('type') == 'base64':
+                        image_base64 = source.get('data', '')
+        else:
+            # Plain text content
+            text_content = content
+        
+        # Skip empty messages (no text and no image)
+        if not text_content and not has_image:
+            return ""
+            
+        # Handle branch indicators with special styling
+        if role == 'system' and message.get('_type') == 'branch_indicator':
+            if "Rabbitholing down:" in content:
+                return f'<div class="branch-indicator rabbithole">{content}</div>'
+            elif "Forking off:" in content:
+                return f'<div class="branch-indicator fork">{content}</div>'
+            return ""
+        
+        # Removed HTML contribution indicator logic
+        
+        # Process content to handle code blocks
+        processed_content = self.process_content_with_code_blocks(text_content) if text_content else ""
+        
+        # Add image display if present
+        image_html = ""
+        if has_image and image_base64:
+            image_html = f'<div style="margin: 10px 0;"><img src="data:image/jpeg;base64,{image_base64}" style="max-width: 100%; border-radius: 8px;" /></div>'
+        
+        html = ""
+        # Format based on role
+        if role == 'user':
+            # User message
+            html += f'<div class="message user">'
+            if image_html:
+                html += image_html
+            if processed_content:
+                html += f'<div class="content">{processed_content}</div>'
+            html += f'</div>'
+        elif role == 'assistant':
+            # AI message
+            display_name = ai_name
+            if model:
+                display_name += f" ({model})"
+            html += f'<div class="message assistant">'
+            html += f'<div class="header">\n{display_name}\n</div>'
+            if image_html:
+                html += image_html
+            if processed_content:
+                html += f'<div class="content">{processed_content}</div>'
+            
+            # Removed HTML contribution indicator
+            
+            html += f'</div>'
+        elif role == 'system':
+            # System message
+            html += f'<div class="message system">'
+            html += f'<div class="content">{processed_content}</div>'
+            html += f'</div>'
+        return html
+    
     def process_content_with_code_blocks(self, content):
         """Process content to properly format code blocks"""
         import re
@@ -2295,11 +2465,16 @@ class ConversationPane(QWidget):
         dots = "." * self.loading_dots
         self.submit_button.setText(f"Processing{dots}")
     
+    def selected_text(self):
+        """The text selected in the conversation display"""
+        if self.virtual_transcript:
+            return self.conversation_display.selectedText()
+        return self.conversation_display.textCursor().selectedText()
+    
     def show_context_menu(self, position):
         """Show context menu at the given position"""
         # Get selected text
-        cursor = self.conversation_display.textCursor()
-        selected_text = cursor.selectedText()
+        selected_text = self.selected_text()
         
         # Only show context menu if text is selected
         if selected_text:
@@ -2308,16 +2483,14 @@ class ConversationPane(QWidget):
     
     def rabbithole_from_selection(self):
         """Create a rabbithole branch from selected text"""
-        cursor = self.conversation_display.textCursor()
-        selected_text = cursor.selectedText()
+        selected_text = self.selected_text()
         
         if selected_text and hasattr(self, 'rabbithole_callback'):
             self.rabbithole_callback(selected_text)
     
     def fork_from_selection(self):
         """Create a fork branch from selected text"""
-        cursor = self.conversation_display.textCursor()
-        selected_text = cursor.selectedText()
+        selected_text = self.selected_text()
         
         if selected_text and hasattr(self, 'fork_callback'):
             self.fork_callback(selected_text)
@@ -2328,6 +2501,12 @@ class ConversationPane(QWidget):
         scrollbar = self.conversation_display.verticalScrollBar()
         was_at_bottom = scrollbar.value() >= scrollbar.maximum() - 20
         
+        if self.virtual_transcript:
+            self.conversation_display.append_text(text, self.text_formats.get(format_type, self.text_formats["normal"]))
+            if was_at_bottom:
+                scrollbar.setValue(scrollbar.maximum())
+            return
+        
         cursor = self.conversation_display.textCursor()
         cursor.movePosition(QTextCursor.MoveOperation.End)
         
@@ -2350,12 +2529,22 @@ class ConversationPane(QWidget):
     def clear_conversation(self):
         """Clear the conversation display"""
         self.conversation_display.clear()
+        self._rendered_messages = []
+        self._rendered_end = 0
         self.images = []
         
     def display_conversation(self, conversation, branch_data=None):
-        """Display the conversation in the text edit widget"""
-        # Clear the current text
-        self.conversation_display.clear()
+        """Display the conversation in the text edit widget (only new or changed messages are rendered)"""
+        # Messages already rendered are skipped by the debug dump below
+        if self.virtual_transcript:
+            shown = self.conversation_display.model().messages
+        else:
+            shown = [entry["message"] for entry in self._rendered_messages]
+        already_shown = 0
+        for shown_msg, msg in zip(shown, conversation):
+            if shown_msg is not msg:
+                break
+            already_shown += 1
         
         # Store conversation data
         self.conversation = conversation
@@ -2376,7 +2565,7 @@ class ConversationPane(QWidget):
         
         # Debug: Print conversation to console
         print("\n--- DEBUG: Conversation Content ---")
-        for msg in conversation:
+        for msg in conversation[already_shown:]:
             role = msg.get("role", "")
             content = msg.get("content", "")
             if "```" in content:
@@ -2410,10 +2599,13 @@ class ConversationPane(QWidget):
                 pixmap = pixmap.scaledToWidth(max_width, Qt.TransformationMode.SmoothTransformation)
             
             # Insert the image into the conversation display
-            cursor = self.conversation_display.textCursor()
-            cursor.movePosition(QTextCursor.MoveOperation.End)
-            cursor.insertImage(pixmap.toImage())
-            cursor.insertText("\n\n")
+            if self.virtual_transcript:
+                self.conversation_display.append_image(pixmap.toImage())
+            else:
+                cursor = self.conversation_display.textCursor()
+                cursor.movePosition(QTextCursor.MoveOperation.End)
+                cursor.insertImage(pixmap.toImage())
+                cursor.insertText("\n\n")
             
             # Store the image to prevent garbage collection
             self.images.append(pixmap)
@@ -2652,6 +2844,7 @@ class LiminalBackroomsApp(QMainWindow):
         self.image_paths = []
         self.branch_conversations = {}  # Store branch conversations by ID
         self.active_branch = None      # Currently displayed branch
+        self.branch_switch_callback = None  # Called before another conversation is shown
         
         # Set up the UI
         self.setup_ui()
@@ -2873,8 +3066,20 @@ class LiminalBackroomsApp(QMainWindow):
         self.left_pane.text_formats["branch_header"] = branch_header_format
         self.left_pane.text_formats["branch_inline"] = branch_inline_format
     
+    def set_branch_switch_callback(self, callback):
+        """Set callback function run before switching to another conversation (stops the running turns)"""
+        self.branch_switch_callback = callback
+    
+    def _before_branch_switch(self, branch_id):
+        if branch_id != 'main' and branch_id not in self.branch_conversations:
+            return
+        target = None if branch_id == 'main' else branch_id
+        if target != self.active_branch and self.branch_switch_callback:
+            self.branch_switch_callback()
+    
     def on_branch_select(self, branch_id):
         """Handle branch selection in the network view"""
+        self._before_branch_switch(branch_id)
         try:
             # Check if branch exists
             if branch_id == 'main':
@@ -3083,6 +3288,7 @@ class LiminalBackroomsApp(QMainWindow):
     def node_clicked(self, node_id):
         """Handle node click in the network view"""
         print(f"Node clicked: {node_id}")
+        self._before_branch_switch(node_id)
         
         # Check if this is the main conversation or a branch
         if node_id == 'main':
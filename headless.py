@@ -0,0 +1,202 @@
+# headless.py
+"""Run liminal backrooms sessions without the GUI (no PyQt6 import).
+
+Examples:
+    python headless.py run --models "Claude Sonnet 4.5" "GPT-4o" --iterations 3 \
+        --input "what is behind the wallpaper?" --output exports/session.json
+    python headless.py run --config session.json --output exports/session.json
+    python headless.py batch sweep.jsonl --max-concurrent 16 --provider-limit anthropic=8
+    python headless.py metrics exports/turn_metrics.jsonl
+    python headless.py run --config session.json --record cassettes/session.cassette
+    python headless.py run --config session.json --replay cassettes/session.cassette --replay-speed 0
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+from batch_runner import load_batch_matrix, run_batch
+from cassette import start_recording, start_replay
+from config import SYSTEM_PROMPT_PAIRS
+from conversation_engine import create_engine, load_session_config, run_session
+from provider_adapters import get_concurrency_limits
+from turn_metrics import (
+    format_turn_metrics_summary,
+    load_turn_metrics,
+    set_metrics_file,
+    summarize_turn_metrics,
+)
+
+
+def print_message(ai_name, message):
+    """Print a completed reply (used when not streaming)"""
+    print(f"\n{ai_name} ({message.get('model', '')}):\n\n{message.get('content', '')}\n")
+
+
+def build_run_config(args):
+    """Merge a --config file with command-line overrides"""
+    config = load_session_config(args.config) if args.config else {}
+    if args.models:
+        config['models'] = args.models
+    if args.prompt_pair:
+        config['prompt_pair'] = args.prompt_pair
+    if args.iterations is not None:
+        config['iterations'] = args.iterations
+    if args.turn_mode:
+        config['turn_mode'] = args.turn_mode
+    if args.input:
+        config['input'] = args.input
+    if args.no_turn_delay:
+        config['turn_delay'] = False
+    if args.rolling_summary:
+        config['rolling_summary'] = True
+    branches = list(config.get('branches', []))
+    branches += [{'type': 'rabbithole', 'text': text} for text in args.rabbithole or []]
+    branches += [{'type': 'fork', 'text': text} for text in args.fork or []]
+    config['branches'] = branches
+    if not config.get('models'):
+        raise SystemExit("No models given: pass --models or a --config with a 'models' list")
+    return config
+
+
+def apply_cassette_args(args):
+    """Start recording or replaying provider traffic if --record/--replay was given"""
+    if args.record and args.replay:
+        raise SystemExit("--record and --replay cannot be used together")
+    if args.record:
+        start_recording(args.record)
+    elif args.replay:
+        start_replay(args.replay, args.replay_speed)
+
+
+def add_cassette_arguments(parser):
+    parser.add_argument('--record', metavar='CASSETTE', help="Record provider traffic to this cassette (see cassette.py)")
+    parser.add_argument('--replay', metavar='CASSETTE', help="Serve provider traffic from this cassette instead of the network")
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help="Multiple of the recorded pace when replaying (0 = as fast as possible)")
+
+
+def cmd_run(args):
+    config = build_run_config(args)
+    if args.metrics_file:
+        set_metrics_file(args.metrics_file)
+    apply_cassette_args(args)
+
+    # Stream tokens for sequential sessions; parallel rounds print whole replies
+    streaming = args.stream and config.get('turn_mode', 'sequential') == 'sequential'
+    if streaming:
+        current = {'ai': None}
+
+        def on_chunk(ai_name, chunk):
+            if current['ai'] != ai_name:
+                current['ai'] = ai_name
+                print(f"\n{ai_name}:\n")
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+
+        def on_message(ai_name, message):
+            current['ai'] = None
+            print()
+            if message.get('role') == 'system':
+                # A failed turn; whatever it streamed is not part of the conversation
+                print(f"[{ai_name}: {message['content']}]")
+
+        def on_retry(ai_name, attempt, reason):
+            # The reply is streamed again from the start
+            current['ai'] = None
+            print(f"\n[{ai_name} reconnecting: {reason}]")
+
+        engine = create_engine(config, streaming_callback=on_chunk, message_callback=on_message,
+                               retry_callback=on_retry)
+    else:
+        engine = create_engine(config, message_callback=print_message)
+
+    try:
+        run_session(config, engine=engine)
+    except KeyboardInterrupt:
+        # Ctrl+C: close the streams still open and keep the turns completed so far
+        engine.abort()
+        print("\nInterrupted; saving the conversation so far")
+
+    output = args.output or f"exports/session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    engine.save_transcript(output)
+    print("\n" + format_turn_metrics_summary())
+
+
+def parse_provider_limits(values):
+    """Parse ['anthropic=8', ...] into {'anthropic': 8, ...}"""
+    limits = {}
+    for value in values or []:
+        provider, _, limit = value.partition('=')
+        if not provider or not limit.isdigit():
+            raise SystemExit(f"Bad --provider-limit '{value}' (expected provider=N)")
+        limits[provider] = int(limit)
+    return limits
+
+
+def cmd_batch(args):
+    sessions = load_batch_matrix(args.matrix)
+    if args.metrics_file:
+        set_metrics_file(args.metrics_file)
+    apply_cassette_args(args)
+    provider_limits = None
+    if args.provider_limit:
+        provider_limits = dict(get_concurrency_limits(), **parse_provider_limits(args.provider_limit))
+    output_dir = args.output_dir or f"exports/batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    summaries = run_batch(sessions, output_dir, args.max_concurrent, provider_limits)
+    failed = [s['name'] for s in summaries if s['status'] != 'ok']
+    print(f"Batch finished: {len(summaries) - len(failed)} ok, {len(failed)} failed. Transcripts in {output_dir}")
+    print(format_turn_metrics_summary())
+    if failed:
+        sys.exit(1)
+
+
+def cmd_metrics(args):
+    records = load_turn_metrics(args.file)
+    if args.model:
+        records = [r for r in records if r.get('model') in args.model]
+    print(f"{len(records)} turns from {args.file}\n")
+    print(format_turn_metrics_summary(summarize_turn_metrics(records)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run AI-to-AI conversations without the GUI")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Run a single conversation session")
+    run_parser.add_argument('--config', help="Session config JSON (see conversation_engine.load_session_config)")
+    run_parser.add_argument('--models', nargs='+', help="Model display name per AI, in speaking order")
+    run_parser.add_argument('--prompt-pair', choices=list(SYSTEM_PROMPT_PAIRS), help="System prompt pair")
+    run_parser.add_argument('--iterations', type=int, help="Rounds to run on the main conversation")
+    run_parser.add_argument('--turn-mode', choices=['sequential', 'parallel'], help="How AIs take turns within a round")
+    run_parser.add_argument('--input', help="Opening user message")
+    run_parser.add_argument('--rabbithole', action='append', help="Rabbithole into this text after the main rounds (repeatable)")
+    run_parser.add_argument('--fork', action='append', help="Fork at this text after the main rounds (repeatable)")
+    run_parser.add_argument('--no-turn-delay', action='store_true', help="Do not pause between turns")
+    run_parser.add_argument('--rolling-summary', action='store_true', help="Fold older turns into a running summary (see ROLLING_SUMMARY)")
+    run_parser.add_argument('--no-stream', dest='stream', action='store_false', help="Print whole replies instead of streaming tokens")
+    run_parser.add_argument('--output', help="Transcript path (default: exports/session_<timestamp>.json)")
+    run_parser.add_argument('--metrics-file', help="Append per-turn metrics to this JSONL file (see TURN_METRICS_FILE)")
+    add_cassette_arguments(run_parser)
+    run_parser.set_defaults(func=cmd_run)
+
+    batch_parser = subparsers.add_parser('batch', help="Run a matrix of sessions concurrently")
+    batch_parser.add_argument('matrix', help="JSONL (one session config per line) or YAML list of session configs")
+    batch_parser.add_argument('--max-concurrent', type=int, help="Sessions in flight (default BATCH_MAX_CONCURRENT_SESSIONS)")
+    batch_parser.add_argument('--provider-limit', action='append', help="Per-provider turn cap, e.g. anthropic=8 (repeatable)")
+    batch_parser.add_argument('--output-dir', help="Directory for transcripts (default: exports/batch_<timestamp>)")
+    batch_parser.add_argument('--metrics-file', help="Append per-turn metrics to this JSONL file (see TURN_METRICS_FILE)")
+    add_cassette_arguments(batch_parser)
+    batch_parser.set_defaults(func=cmd_batch)
+
+    metrics_parser = subparsers.add_parser('metrics', help="Summarize a per-turn metrics JSONL file by model")
+    metrics_parser.add_argument('file', help="JSONL written via TURN_METRICS_FILE or --metrics-file")
+    metrics_parser.add_argument('--model', action='append', help="Only include this model (repeatable)")
+    metrics_parser.set_defaults(func=cmd_metrics)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# hedging.py
+"""Hedged requests: race a duplicate when a model's first token is late.
+
+Opt-in with HEDGE_REQUESTS. A hedged turn sends its request as usual and
+waits up to the model's learned TTFT percentile (HEDGE_PERCENTILE of its
+ttft_stats histogram, at least HEDGE_MIN_DELAY), counted from when the
+request actually goes out: time spent waiting for a rate-limit slot or
+after a 429 does not count, and no duplicate is sent while the provider is
+backing off (it would only queue behind the same limit). If no token has
+arrived by then, a duplicate is sent, either to the same provider or through OpenRouter
+when HEDGE_ALTERNATES names a route. Whichever stream produces a token first
+wins and is streamed to the caller. The other request is cancelled, which
+closes its connection.
+
+Models are only hedged once they have HEDGE_MIN_SAMPLES TTFT samples, and
+only through streaming adapters (the first token is the signal). Turns in
+async provider mode (USE_ASYNC_PROVIDERS) are not hedged, but they still
+record TTFT samples.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cancellation import CancellationToken, Cancelled
+from config import (
+    HEDGE_ALTERNATES,
+    HEDGE_MIN_DELAY,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_PERCENTILE,
+    HEDGE_REQUESTS,
+)
+from provider_adapters import get_named_adapter
+from shared_utils import get_provider_backoff
+from ttft_stats import record_ttft, request_sent_listener, ttft_percentile
+
+_executor = None
+_executor_lock = threading.Lock()
+_stats = {"turns": 0, "hedged": 0, "won_by_hedge": 0}
+_stats_lock = threading.Lock()
+
+
+def _get_executor():
+    """Threads that run the racing requests (created on first use)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+        return _executor
+
+
+def should_hedge(adapter):
+    """True if turns through this adapter are hedged"""
+    return HEDGE_REQUESTS and adapter.streaming
+
+
+def get_hedge_deadline(model_id):
+    """Seconds to wait for a first token before hedging, or None while there is too little data"""
+    percentile = ttft_percentile(model_id, HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+    if percentile is None:
+        return None
+    return max(HEDGE_MIN_DELAY, percentile)
+
+
+def get_hedge_stats():
+    """Return counters: hedgeable turns, turns that fired a duplicate, and duplicates that won"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+class _Attempt:
+    """One of the racing requests"""
+
+    def __init__(self, race, adapter, model_id):
+        self.race = race
+        self.adapter = adapter
+        self.model_id = model_id
+        self.token = CancellationToken()
+        self.started = time.monotonic()  # Moved to each send of the request (see on_sent)
+        self.sent = False
+        self.first_token_at = None
+        self.done = False
+        self.response = None
+        self.error = None
+
+    def on_sent(self, sent_at):
+        """The request went out (again, after a 429 or dropped stream): restart the TTFT clock"""
+        with self.race.cond:
+            if self.first_token_at is None:
+                self.started = sent_at
+                self.sent = True
+                self.race.cond.notify_all()
+
+    def on_chunk(self, chunk):
+        race = self.race
+        with race.cond:
+            if self.first_token_at is None:
+                self.first_token_at = time.monotonic()
+                if race.winner is None:
+                    race.winner = self
+                    race.cond.notify_all()
+            is_winner = race.winner is self
+        # Only the winner's thread ever gets here, so chunks stay in order
+        if is_winner and race.stream_callback:
+            race.stream_callback(chunk)
+
+    def run(self, messages, system_prompt):
+        try:
+            prompt_content, context_messages = self.adapter.prepare(messages)
+            with request_sent_listener(self.on_sent):
+                self.response = self.adapter.call(prompt_content, context_messages, self.model_id, system_prompt,
+                                                  stream_callback=self.on_chunk, cancel_token=self.token)
+        except Exception as e:
+            self.error = e
+        finally:
+            with self.race.cond:
+                self.done = True
+                self.race.cond.notify_all()
+
+
+class _Race:
+    def __init__(self, stream_callback):
+        self.stream_callback = stream_callback
+        self.cond = threading.Condition()
+        self.winner = None
+        self.attempts = []
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancel every attempt (they finish with Cancelled errors)"""
+        with self.cond:
+            self.cancelled = True
+            attempts = list(self.attempts)
+            self.cond.notify_all()
+        for attempt in attempts:
+            attempt.token.cancel()
+
+    def start(self, adapter, model_id, messages, system_prompt):
+        attempt = _Attempt(self, adapter, model_id)
+        with self.cond:
+            self.attempts.append(attempt)
+            if self.cancelled:
+                attempt.token.cancel()
+        # Each thread gets a copy of the caller's context (retry listeners etc.)
+        context = contextvars.copy_context()
+        _get_executor().submit(context.run, attempt.run, messages, system_prompt)
+        return attempt
+
+
+def alternate_route(adapter, model_id):
+    """(adapter, model_id) the duplicate request is sent through"""
+    alternate_id = HEDGE_ALTERNATES.get(model_id)
+    if alternate_id:
+        return get_named_adapter("openrouter"), alternate_id
+    return adapter, model_id
+
+
+def hedged_call(adapter, messages, model_id, system_prompt, stream_callback=None, cancel_token=None):
+    """Send a turn, hedging it if the first token is late
+
+    Args:
+        messages: Prepared turn messages (each route runs its own adapter.prepare)
+        stream_callback: Optional function(chunk: str) receiving the winning stream
+        cancel_token: Optional CancellationToken; cancelling it cancels every racing
+            request, and Cancelled is raised here
+
+    Returns:
+        (adapter, response) of the request that won, for adapter.build_result()
+    """
+    _count("turns")
+    deadline = get_hedge_deadline(model_id)
+    race = _Race(stream_callback)
+    unregister = cancel_token.on_cancel(race.cancel) if cancel_token is not None else None
+    try:
+        return _run_race(race, adapter, model_id, messages, system_prompt, deadline, cancel_token)
+    finally:
+        if unregister is not None:
+            unregister()
+
+
+def _run_race(race, adapter, model_id, messages, system_prompt, deadline, cancel_token):
+    primary = race.start(adapter, model_id, messages, system_prompt)
+    hedge_adapter, hedge_model_id = alternate_route(adapter, model_id)
+
+    late = False
+    not_before = 0  # When the providers' last backoff ends; the deadline restarts from there
+    with race.cond:
+        while race.winner is None and not primary.done and not race.cancelled:
+            if deadline is None or not primary.sent:
+                # Not hedging, or still waiting for a rate-limit slot (the TTFT clock starts at the send)
+                race.cond.wait()
+                continue
+            remaining = max(primary.started, not_before) + deadline - time.monotonic()
+            if remaining > 0:
+                race.cond.wait(remaining)
+                continue
+            backoff = max(get_provider_backoff(adapter.upstream), get_provider_backoff(hedge_adapter.upstream))
+            if backoff <= 0:
+                late = True
+                break
+            # Backing off (e.g. waiting out a 429): a duplicate would only queue behind the same limit
+            not_before = time.monotonic() + backoff
+    if late:
+        print(f"Hedging {model_id}: no first token {deadline:.1f}s after sending, "
+              f"sending a duplicate via {hedge_adapter.label} ({hedge_model_id})")
+        _count("hedged")
+        race.start(hedge_adapter, hedge_model_id, messages, system_prompt)
+        with race.cond:
+            race.cond.wait_for(lambda: race.winner is not None or all(a.done for a in race.attempts))
+
+    if race.cancelled:
+        # Stopped by the caller: the attempts are being torn down, and their times say nothing about TTFT
+        raise Cancelled("cancelled")
+
+    # Without any token (e.g. both failed), report what the original request got
+    winner = race.winner or primary
+    for attempt in race.attempts:
+        if attempt is not winner:
+            attempt.token.cancel()
+            if attempt.first_token_at is None and attempt.sent:
+                # Censored sample: its true TTFT was at least this long
+                record_ttft(attempt.model_id, time.monotonic() - attempt.started)
+    if winner.first_token_at is not None:
+        record_ttft(winner.model_id, winner.first_token_at - winner.started)
+    if winner is not primary:
+        _count("won_by_hedge")
+        print(f"Hedged request via {winner.adapter.label} won for {model_id}")
+
+    with race.cond:
+        race.cond.wait_for(lambda: winner.done)
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    if winner.error is not None:
+        raise winner.error
+    return winner.adapter, winner.response
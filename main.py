@@ -2,36 +2,47 @@
 
 import os
 import time
+import asyncio
 import threading
 import json
 import sys
 import re
 from dotenv import load_dotenv
 from PyQt6.QtWidgets import QApplication, QMessageBox
-from PyQt6.QtCore import QThread, pyqtSignal, QObject, QRunnable, pyqtSlot, QThreadPool
+from PyQt6.QtCore import QThread, pyqtSignal, QObject, QRunnable, pyqtSlot, QThreadPool, QTimer
 import requests
 
 # Load environment variables from .env file
 load_dotenv()
 
 from config import (
-    TURN_DELAY,
-    AI_MODELS,
+    USE_ASYNC_PROVIDERS,
+    STREAM_FLUSH_INTERVAL_MS,
+    STREAM_FLUSH_MAX_CHARS,
     SYSTEM_PROMPT_PAIRS,
     SHOW_CHAIN_OF_THOUGHT_IN_CONTEXT,
     SHARE_CHAIN_OF_THOUGHT
 )
 from shared_utils import (
-    call_claude_api,
-    call_openrouter_api,
-    call_openai_api,
-    call_gemini_api,
-    call_replicate_api,
-    call_deepseek_api,
     open_html_in_browser,
     generate_image_from_text,
     generate_video_with_sora
 )
+from async_providers import AsyncProviderBridge
+from retry_policy import retry_listener
+from cancellation import CancellationToken, Cancelled
+from conversation_engine import (
+    create_context_cache,
+    ai_turn,
+    ai_turn_async,
+    get_turn_delay,
+    build_user_message,
+    create_rabbithole_branch,
+    create_fork_branch,
+    get_branch_system_prompt,
+    result_to_message,
+    turn_status
+)
 from gui import LiminalBackroomsApp, load_fonts
 
 def is_image_message(message: dict) -> bool:
@@ -53,11 +64,14 @@ class WorkerSignals(QObject):
     result = pyqtSignal(str, object)  # Signal for complete result object
     progress = pyqtSignal(str)
     streaming_chunk = pyqtSignal(str, str)  # Signal for streaming tokens: (ai_name, chunk)
+    reconnecting = pyqtSignal(str, int, str)  # A dropped request is being retried: (ai_name, attempt, reason)
+    cancelled = pyqtSignal(str)  # The turn was stopped; emitted instead of result and finished: (ai_name)
 
 class Worker(QRunnable):
     """Worker thread for processing AI turns using QThreadPool"""
     
-    def __init__(self, ai_name, conversation, model, system_prompt, is_branch=False, branch_id=None, gui=None):
+    def __init__(self, ai_name, conversation, model, system_prompt, is_branch=False, branch_id=None, gui=None,
+                 cancel_token=None):
         super().__init__()
         self.ai_name = ai_name
         self.conversation = conversation.copy()  # Make a copy to prevent race conditions
@@ -67,9 +81,58 @@ class Worker(QRunnable):
         self.branch_id = branch_id
         self.gui = gui
         
+        self.context_cache = None  # Set by ConversationManager when the worker starts
+        self.stream_coalescer = None  # Likewise; without one, every token is its own signal
+        self.queued_at = None  # time.monotonic() when handed to the pool, for the turn's queue_wait metric
+        # Cancelling closes the request in flight; ConversationManager shares one token per run
+        self.cancel_token = cancel_token or CancellationToken()
+        
         # Create signals object
         self.signals = WorkerSignals()
     
+    @property
+    def context_key(self):
+        """Conversation this worker extends, for the per-AI context cache"""
+        return self.branch_id if self.is_branch and self.branch_id else "main"
+    
+    def stream_chunk(self, chunk: str):
+        """Forward a streaming token to the GUI (none once the turn is stopped)"""
+        if self.cancel_token.cancelled:
+            return
+        if self.stream_coalescer is not None:
+            self.stream_coalescer.push(self.ai_name, chunk)
+        else:
+            self.signals.streaming_chunk.emit(self.ai_name, chunk)
+    
+    def on_retry(self, attempt, reason):
+        """Tell the GUI the request is being retried (its streamed text will be resent)"""
+        if self.stream_coalescer is not None:
+            # Through the chunk buffer, so it lands between the old and the new stream's text
+            self.stream_coalescer.push_reconnect(self.ai_name, attempt, reason)
+        else:
+            self.signals.reconnecting.emit(self.ai_name, attempt, reason)
+    
+    def cancel(self):
+        """Stop the turn: close its connection and skip its result"""
+        self.cancel_token.cancel()
+    
+    def queue_wait(self):
+        """Seconds between being started and actually running"""
+        return time.monotonic() - self.queued_at if self.queued_at is not None else None
+    
+    def emit_result(self, result):
+        """Emit both the text response and the full result object"""
+        if isinstance(result, dict):
+            response_content = result.get('content', '')
+            # Emit the simple text response for backward compatibility
+            self.signals.response.emit(self.ai_name, response_content)
+            # Also emit the full result object for HTML contribution processing
+            self.signals.result.emit(self.ai_name, result)
+        else:
+            # Handle simple string responses
+            self.signals.response.emit(self.ai_name, result if result else "")
+            self.signals.result.emit(self.ai_name, {"content": result, "model": self.model})
+    
     @pyqtSlot()
     def run(self):
         """Process the AI turn when the thread is started"""
@@ -77,590 +140,268 @@ class Worker(QRunnable):
             # Emit progress update
             self.signals.progress.emit(f"Processing {self.ai_name} turn with {self.model}...")
             
-            # Define streaming callback
-            def stream_chunk(chunk: str):
-                self.signals.streaming_chunk.emit(self.ai_name, chunk)
-            
             # Process the turn with streaming
-            result = ai_turn(
-                self.ai_name,
-                self.conversation,
-                self.model,
-                self.system_prompt,
-                gui=self.gui,
-                streaming_callback=stream_chunk
-            )
-            
-            # Emit both the text response and the full result object
-            if isinstance(result, dict):
-                response_content = result.get('content', '')
-                # Emit the simple text response for backward compatibility
-                self.signals.response.emit(self.ai_name, response_content)
-                # Also emit the full result object for HTML contribution processing
-                self.signals.result.emit(self.ai_name, result)
-            else:
-                # Handle simple string responses
-                self.signals.response.emit(self.ai_name, result if result else "")
-                self.signals.result.emit(self.ai_name, {"content": result, "model": self.model})
+            with retry_listener(self.on_retry):
+                result = ai_turn(
+                    self.ai_name,
+                    self.conversation,
+                    self.model,
+                    self.system_prompt,
+                    gui=self.gui,
+                    streaming_callback=self.stream_chunk,
+                    context_cache=self.context_cache,
+                    context_key=self.context_key,
+                    cancel_token=self.cancel_token,
+                    queue_wait=self.queue_wait()
+                )
+            # A reply that completed just as the turn was stopped is dropped too
+            self.cancel_token.raise_if_cancelled()
+            self.emit_result(result)
             
             # Emit finished signal
             self.signals.finished.emit()
             
+        except Cancelled:
+            self.signals.cancelled.emit(self.ai_name)
         except Exception as e:
             # Emit error signal
             self.signals.error.emit(str(e))
             # Still emit finished signal even if there's an error
             self.signals.finished.emit()
+    
+    async def run_async(self):
+        """Process the AI turn as a coroutine on the AsyncProviderBridge loop"""
+        try:
+            self.signals.progress.emit(f"Processing {self.ai_name} turn with {self.model}...")
+            
+            with retry_listener(self.on_retry):
+                result = await ai_turn_async(
+                    self.ai_name,
+                    self.conversation,
+                    self.model,
+                    self.system_prompt,
+                    streaming_callback=self.stream_chunk,
+                    context_cache=self.context_cache,
+                    context_key=self.context_key,
+                    cancel_token=self.cancel_token,
+                    queue_wait=self.queue_wait()
+                )
+            self.cancel_token.raise_if_cancelled()
+            self.emit_result(result)
+            self.signals.finished.emit()
+            
+        except (Cancelled, asyncio.CancelledError):
+            # The task is cancelled by ConversationManager._start_worker's cancel hook
+            self.signals.cancelled.emit(self.ai_name)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+            self.signals.finished.emit()
 
-def ai_turn(ai_name, conversation, model, system_prompt, gui=None, is_branch=False, branch_output=None, streaming_callback=None):
-    """Execute an AI turn with the given parameters
+class TurnScheduler:
+    """Timer-driven, cancellable delay before the next AI turn
     
-    Args:
-        streaming_callback: Optional function(chunk: str) to call with each streaming token
+    Runs on the Qt event loop, so the GUI keeps painting and streaming while
+    it waits (unlike time.sleep on the main thread).
     """
-    print(f"==================================================")
-    print(f"Starting {model} turn ({ai_name})...")
-    print(f"Current conversation length: {len(conversation)}")
+    def __init__(self):
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._fire)
+        self._callback = None
     
-    # HTML contributions and living document disabled
-    enhanced_system_prompt = system_prompt
+    def schedule(self, delay_seconds, callback):
+        """Run callback after delay_seconds, replacing any pending turn"""
+        self._callback = callback
+        self._timer.start(max(0, int(delay_seconds * 1000)))
     
-    # Get the actual model ID from the display name
-    model_id = AI_MODELS.get(model, model)
+    def cancel(self):
+        """Drop the pending turn, if any. Returns True if one was cancelled"""
+        was_pending = self._timer.isActive()
+        self._timer.stop()
+        self._callback = None
+        return was_pending
     
-    # Prepend model identity to system prompt so AI knows who it is
-    enhanced_system_prompt = f"You are {ai_name} ({model}).\n\n{enhanced_system_prompt}"
+    def is_pending(self):
+        return self._timer.isActive()
     
-    # Check for branch type and count AI responses
-    is_rabbithole = False
-    is_fork = False
-    branch_text = ""
-    ai_response_count = 0
-    found_branch_marker = False
-    latest_branch_marker_index = -1
-
-    # First find the most recent branch marker
-    for i, msg in enumerate(conversation):
-        if isinstance(msg, dict) and msg.get("_type") == "branch_indicator":
-            latest_branch_marker_index = i
-            found_branch_marker = True
-            
-            # Determine branch type from the latest marker
-            msg_content = msg.get("content", "")
-            # Branch indicators are always plain strings
-            if isinstance(msg_content, str):
-                if "Rabbitholing down:" in msg_content:
-                    is_rabbithole = True
-                    branch_text = msg_content.split('"')[1] if '"' in msg_content else ""
-                    print(f"Detected rabbithole branch for: '{branch_text}'")
-                elif "Forking off:" in msg_content:
-                    is_fork = True
-                    branch_text = msg_content.split('"')[1] if '"' in msg_content else ""
-                    print(f"Detected fork branch for: '{branch_text}'")
+    def _fire(self):
+        callback, self._callback = self._callback, None
+        if callback:
+            callback()
 
-    # Now count AI responses that occur AFTER the latest branch marker
-    ai_response_count = 0
-    if found_branch_marker:
-        for i, msg in enumerate(conversation):
-            if i > latest_branch_marker_index and msg.get("role") == "assistant":
-                ai_response_count += 1
-        print(f"Counting AI responses after latest branch marker: found {ai_response_count} responses")
-    
-    # Handle branch-specific system prompts
+class StreamCoalescer(QObject):
+    """Batches streamed chunks per AI and hands them to the GUI once per frame
     
-    # For rabbitholing: override system prompt for first TWO responses
-    if is_rabbithole and ai_response_count < 2:
-        print(f"USING RABBITHOLE PROMPT: '{branch_text}' - response #{ai_response_count+1} after branch")
-        system_prompt = f"'{branch_text}'!!!"
-    
-    # For forking: override system prompt ONLY for first response
-    elif is_fork and ai_response_count == 0:
-        print(f"USING FORK PROMPT: '{branch_text}' - response #{ai_response_count+1}")
-        system_prompt = f"The conversation forks from'{branch_text}'. Continue naturally from this point."
+    Workers call push() from their own threads, which only appends to a list;
+    the first chunk after a flush sends one queued signal to wake the GUI
+    thread. A timer there flushes every STREAM_FLUSH_INTERVAL_MS (at once when
+    STREAM_FLUSH_MAX_CHARS are waiting), passing each AI's text to
+    deliver(ai_name, text) in one piece, so the text widget is updated once
+    per frame instead of once per token.
+    """
+    _wake = pyqtSignal(bool)  # (flush now); emitted from worker threads
     
-    # For all other cases, use the standard system prompt
-    else:
-        if is_rabbithole:
-            print(f"USING STANDARD PROMPT: Past initial rabbithole exploration (responses after branch: {ai_response_count})")
-        elif is_fork:
-            print(f"USING STANDARD PROMPT: Past initial fork response (responses after branch: {ai_response_count})")
+    def __init__(self, deliver, on_reconnect, interval_ms=STREAM_FLUSH_INTERVAL_MS, max_chars=STREAM_FLUSH_MAX_CHARS):
+        super().__init__()
+        self._deliver = deliver
+        self._on_reconnect = on_reconnect
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._pending = {}  # ai_name -> [chunk str or (attempt, reason) reconnect marker]
+        self._pending_chars = 0
+        self._woken = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+        self._wake.connect(self._on_wake)
     
-    # Apply the enhanced system prompt (with HTML contribution instructions)
-    system_prompt = enhanced_system_prompt
+    def push(self, ai_name, chunk):
+        """Queue a chunk (any thread)"""
+        with self._lock:
+            self._pending.setdefault(ai_name, []).append(chunk)
+            before = self._pending_chars
+            self._pending_chars += len(chunk)
+            urgent = before < self.max_chars <= self._pending_chars
+            wake = urgent or not self._woken
+            self._woken = True
+        if wake:
+            self._wake.emit(urgent)
     
-    # CRITICAL: Always ensure we have the system prompt
-    # No matter what happens with the conversation, we need this
-    messages = []
-    messages.append({
-        "role": "system",
-        "content": system_prompt
-    })
+    def push_reconnect(self, ai_name, attempt, reason):
+        """Queue a retry notice after the chunks already queued (any thread)"""
+        with self._lock:
+            self._pending.setdefault(ai_name, []).append((attempt, reason))
+            wake = not self._woken
+            self._woken = True
+        if wake:
+            self._wake.emit(False)
     
-    # Filter out any existing system messages that might interfere
-    filtered_conversation = []
-    for msg in conversation:
-        if not isinstance(msg, dict):
-            # Convert plain text to dictionary
-            msg = {"role": "user", "content": str(msg)}
-            
-        # Skip any hidden "connecting..." messages
-        msg_content = msg.get("content", "")
-        if msg.get("hidden") and isinstance(msg_content, str) and "connect" in msg_content.lower():
-            continue
-            
-        # Skip empty messages
-        content = msg.get("content", "")
-        if isinstance(content, str):
-            if not content.strip():
-                continue
-        elif isinstance(content, list):
-            # For structured content, skip if all parts are empty
-            if not any(part.get('text', '').strip() if part.get('type') == 'text' else True for part in content):
-                continue
-        else:
-            if not content:
-                continue
-            
-        # Skip system messages (we already added our own above)
-        if msg.get("role") == "system":
-            continue
-            
-        # Skip special system messages (branch indicators, etc.)
-        if msg.get("role") == "system" and msg.get("_type"):
-            continue
-            
-        # Skip duplicate messages - check if this exact content exists already
-        is_duplicate = False
-        for existing in filtered_conversation:
-            if existing.get("content") == msg.get("content"):
-                is_duplicate = True
-                print(f"Skipping duplicate message: {msg.get('content')[:30]}...")
-                break
-                
-        if not is_duplicate:
-            filtered_conversation.append(msg)
-    
-    # Process filtered conversation
-    for i, msg in enumerate(filtered_conversation):
-        # Check if this message is from the current AI
-        is_from_this_ai = False
-        if msg.get("ai_name") == ai_name:
-            is_from_this_ai = True
-        
-        # Determine role
-        if is_from_this_ai:
-            role = "assistant"
-        else:
-            role = "user"
-            
-        # Get content - preserve structure for images
-        content = msg.get("content", "")
-        
-        # Inject speaker name for messages from other participants (not from current AI)
-        if not is_from_this_ai and content:
-            # Use the model name (e.g., "Claude 4.5 Sonnet") if available, otherwise fall back to ai_name or "User"
-            speaker_name = msg.get("model") or msg.get("ai_name", "User")
-            
-            # Handle different content types
-            if isinstance(content, str):
-                # Simple string content - prefix with speaker name
-                content = f"[{speaker_name}]: {content}"
-            elif isinstance(content, list):
-                # Structured content (e.g., with images) - prefix text parts
-                modified_content = []
-                for part in content:
-                    if part.get('type') == 'text':
-                        # Prefix the first text part with speaker name
-                        text = part.get('text', '')
-                        modified_part = part.copy()
-                        modified_part['text'] = f"[{speaker_name}]: {text}"
-                        modified_content.append(modified_part)
-                        # Only prefix the first text part
-                        break
-                    else:
-                        modified_content.append(part)
-                
-                # Add remaining parts unchanged
-                first_text_found = False
-                for part in content:
-                    if part.get('type') == 'text' and not first_text_found:
-                        first_text_found = True
-                        continue  # Skip, already added above
-                    modified_content.append(part)
-                
-                content = modified_content if modified_content else content
-        
-        # Add to messages
-        messages.append({
-            "role": role,
-            "content": content  # Now includes speaker names for non-current-AI messages
-        })
-        
-        # For logging, handle both string and structured content
-        if isinstance(content, list):
-            print(f"Message {i} - AI: {msg.get('ai_name', 'User')} - Assigned role: {role} - Content: [structured message with {len(content)} parts]")
-        else:
-            content_preview = content[:50] + "..." if len(str(content)) > 50 else content
-            print(f"Message {i} - AI: {msg.get('ai_name', 'User')} - Assigned role: {role} - Preview: {content_preview}")
+    def _on_wake(self, now):
+        if now:
+            self.flush()
+        elif not self._timer.isActive():
+            self._timer.start()
     
-    # Ensure the last message is a user message so the AI responds
-    if len(messages) > 1 and messages[-1].get("role") == "assistant":
-        # Find an appropriate message to use
-        if is_rabbithole and branch_text:
-            # Add a special rabbitholing instruction as the last message
-            messages.append({
-                "role": "user",
-                "content": f"Please explore the concept of '{branch_text}' in depth. What are the most interesting aspects or connections related to this concept?"
-            })
-        elif is_fork and branch_text:
-            # Add a special forking instruction as the last message
-            messages.append({
-                "role": "user", 
-                "content": f"Continue on naturally from the point about '{branch_text}' without including this text."
-            })
-        else:
-            # Standard handling for other conversations
-            # Find the most recent message from the other AI to use as prompt
-            other_ai_message = None
-            for msg in reversed(filtered_conversation):
-                if msg.get("ai_name") != ai_name:
-                    other_ai_message = msg.get("content", "")
-                    break
-                
-            if other_ai_message:
-                messages.append({
-                    "role": "user",
-                    "content": other_ai_message
-                })
+    def _take(self, ai_name):
+        with self._lock:
+            if ai_name is None:
+                pending, self._pending = self._pending, {}
             else:
-                # Fallback - only if no other AI message found
-                messages.append({
-                    "role": "user",
-                    "content": "Let's continue our conversation."
-                })
-            
-    # Print the processed messages for debugging
-    print(f"Sending to {model} ({ai_name}):")
-    for i, msg in enumerate(messages):
-        role = msg.get("role", "unknown")
-        content_raw = msg.get("content", "")
-        
-        # Handle both string and list content for logging
-        if isinstance(content_raw, list):
-            text_parts = [part.get('text', '') for part in content_raw if part.get('type') == 'text']
-            has_image = any(part.get('type') == 'image' for part in content_raw)
-            content_str = ' '.join(text_parts)
-            if has_image:
-                content_str = f"[Image] {content_str}" if content_str else "[Image]"
-        else:
-            content_str = str(content_raw)
-        
-        # Truncate for display
-        content = content_str[:50] + "..." if len(content_str) > 50 else content_str
-        print(f"[{i}] {role}: {content}")
-    
-    # Load any available memories for this AI
-    memories = []
-    try:
-        if os.path.exists(f'memories/{ai_name.lower()}_memories.json'):
-            with open(f'memories/{ai_name.lower()}_memories.json', 'r') as f:
-                memories = json.load(f)
-                print(f"Loaded {len(memories)} memories for {ai_name}")
-        else:
-            print(f"Loaded 0 memories for {ai_name}")
-    except Exception as e:
-        print(f"Error loading memories: {e}")
-        print(f"Loaded 0 memories for {ai_name}")
-    
-    # Display the final processed messages for debugging
-    print(f"Sending to {model}:")
-    print(f"Messages: {json.dumps(messages, indent=2)}")
-    
-    # Display the prompt
-    print(f"--- Prompt to {model} ({ai_name}) ---")
-    
-    try:
-        # Route Sora video models
-        if model_id in ("sora-2", "sora-2-pro"):
-            print(f"Using Sora Video API for model: {model_id}")
-            # Use last user message as the video prompt
-            prompt_content = ""
-            if len(messages) > 0:
-                last_content = messages[-1].get("content", "")
-                # Extract text from structured content if needed
-                if isinstance(last_content, list):
-                    text_parts = [part.get('text', '') for part in last_content if part.get('type') == 'text']
-                    prompt_content = ' '.join(text_parts)
-                elif isinstance(last_content, str):
-                    prompt_content = last_content
-            
-            if not prompt_content or not prompt_content.strip():
-                prompt_content = "A short abstract motion graphic in warm colors"
-
-            # Optional duration/size via env
-            sora_seconds_env = os.getenv("SORA_SECONDS", "")
-            sora_size = os.getenv("SORA_SIZE", "") or None
-            try:
-                sora_seconds = int(sora_seconds_env) if sora_seconds_env else None
-            except ValueError:
-                sora_seconds = None
-
-            print(f"[Sora] Starting job with seconds={sora_seconds} size={sora_size}")
-            video_result = generate_video_with_sora(
-                prompt=prompt_content,
-                model=model_id,
-                seconds=sora_seconds,
-                size=sora_size,
-            )
-
-            if video_result.get("success"):
-                print(f"[Sora] Completed: id={video_result.get('video_id')} path={video_result.get('video_path')}")
-                # Return a lightweight textual confirmation; video is saved to disk
-                return {
-                    "role": "assistant",
-                    "content": f"[Sora] Video created: {video_result.get('video_path')}",
-                    "model": model,
-                    "ai_name": ai_name
-                }
+                items = self._pending.pop(ai_name, None)
+                pending = {ai_name: items} if items else {}
+            if not self._pending:
+                self._pending_chars = 0
+                self._woken = False
             else:
-                err = video_result.get("error", "unknown error")
-                print(f"[Sora] Failed: {err}")
-                return {
-                    "role": "system",
-                    "content": f"[Sora] Video generation failed: {err}",
-                    "model": model,
-                    "ai_name": ai_name
-                }
-
-        # Try Claude models first via Anthropic API
-        if "claude" in model_id.lower() or model_id in ["anthropic/claude-3-opus-20240229", "anthropic/claude-3-sonnet-20240229", "anthropic/claude-3-haiku-20240307"]:
-            print(f"Using Claude API for model: {model_id}")
-            
-            # CRITICAL: Make sure there are no duplicates in the messages and system prompt is included
-            final_messages = []
-            seen_contents = set()
-            
-            for msg in messages:
-                # Skip empty messages - handle both string and list content
-                content = msg.get("content", "")
-                is_empty = False
-                if isinstance(content, list):
-                    # For structured content, check if all parts are empty
-                    text_parts = [part.get('text', '').strip() for part in content if part.get('type') == 'text']
-                    has_image = any(part.get('type') == 'image' for part in content)
-                    is_empty = not text_parts and not has_image
-                elif isinstance(content, str):
-                    is_empty = not content
-                else:
-                    is_empty = not content
-                    
-                if is_empty:
-                    continue
-                    
-                # Handle system message separately
-                if msg.get("role") == "system":
-                    continue
-                    
-                # Check for duplicates by content - create hashable representation
-                content = msg.get("content", "")
-                
-                # Create a hashable content_hash for duplicate detection
-                if isinstance(content, list):
-                    # For structured messages, use text parts for hash
-                    text_parts = [part.get('text', '') for part in content if part.get('type') == 'text']
-                    content_hash = ''.join(text_parts)
-                elif isinstance(content, str):
-                    content_hash = content
-                else:
-                    content_hash = str(content) if content else ""
-                
-                if content_hash and content_hash in seen_contents:
-                    print(f"Skipping duplicate message in AI turn: {content_hash[:30]}...")
+                self._pending_chars -= sum(len(item) for items in pending.values() for item in items if isinstance(item, str))
+        return pending
+    
+    def flush(self, ai_name=None):
+        """Deliver what is queued, for one AI or all (GUI thread)"""
+        for name, items in self._take(ai_name).items():
+            parts = []
+            for item in items:
+                if isinstance(item, str):
+                    parts.append(item)
                     continue
-                
-                if content_hash:
-                    seen_contents.add(content_hash)
-                final_messages.append(msg)
-            
-            # Ensure we have at least one message
-            if not final_messages:
-                print("Warning: No messages left after filtering. Adding a default message.")
-                final_messages.append({"role": "user", "content": "Connecting..."})
-            
-            # Get the prompt content safely
-            prompt_content = ""
-            if len(final_messages) > 0:
-                prompt_content = final_messages[-1].get("content", "")
-                # Use all messages except the last one as context
-                context_messages = final_messages[:-1]
-            else:
-                context_messages = []
-                prompt_content = "Connecting..."  # Default fallback
-            
-            # Call Claude API with filtered messages (with streaming if callback provided)
-            response = call_claude_api(prompt_content, context_messages, model_id, system_prompt, stream_callback=streaming_callback)
-            
-            return {
-                "role": "assistant",
-                "content": response,
-                "model": model,
-                "ai_name": ai_name
-            }
-        
-        # Check for GPT models to use direct OpenAI API
-        if model_id.startswith("gpt-") or model_id.startswith("o1") or model_id.startswith("o3"):
-            print(f"Using OpenAI API for model: {model_id}")
-
-            # Ensure we have valid messages
-            if len(messages) > 0:
-                prompt_content = messages[-1].get("content", "")
-                context_messages = messages[:-1]
-            else:
-                prompt_content = "Connecting..."
-                context_messages = []
-
-            response = call_openai_api(prompt_content, context_messages, model_id, system_prompt, stream_callback=streaming_callback)
-
-            return {
-                "role": "assistant",
-                "content": response if response else "No response from OpenAI",
-                "model": model,
-                "ai_name": ai_name
-            }
-
-        # Check for Gemini models to use direct Google API
-        if "gemini" in model_id.lower():
-            print(f"Using Google Gemini API for model: {model_id}")
-
-            # Ensure we have valid messages
-            if len(messages) > 0:
-                prompt_content = messages[-1].get("content", "")
-                context_messages = messages[:-1]
-            else:
-                prompt_content = "Connecting..."
-                context_messages = []
-
-            response = call_gemini_api(prompt_content, context_messages, model_id, system_prompt, stream_callback=streaming_callback)
-
-            return {
-                "role": "assistant",
-                "content": response if response else "No response from Gemini",
-                "model": model,
-                "ai_name": ai_name
-            }
-
-        # Check for DeepSeek models to use Replicate via DeepSeek API function
-        if "deepseek" in model.lower():
-            print(f"Using Replicate API for DeepSeek model: {model_id}")
-            
-            # Ensure we have at least one message for the prompt
-            if len(messages) > 0:
-                prompt_content = messages[-1].get("content", "")
-                context_messages = messages[:-1]
-            else:
-                prompt_content = "Connecting..."
-                context_messages = []
-                
-            response = call_deepseek_api(prompt_content, context_messages, model_id, system_prompt)
-            
-            # Ensure response has the required format for the Worker class
-            if isinstance(response, dict) and 'content' in response:
-                # Add model info to the response
-                response['model'] = model
-                response['role'] = 'assistant'
-                response['ai_name'] = ai_name
-                
-                # Check for HTML contribution
-                if "html_contribution" in response:
-                    html_contribution = response["html_contribution"]
-                    
-                    # Don't update HTML document here - we'll do it in on_ai_result_received
-                    # Just add indicator to the conversation part
-                    response["content"] += "\n\n..."
-                    if "display" in response:
-                        response["display"] += "\n\n..."
-                
-                return response
-            else:
-                # Create a formatted response if not already in the right format
-                return {
-                    "role": "assistant",
-                    "content": str(response) if response else "No response from model",
-                    "model": model,
-                    "ai_name": ai_name,
-                    "display": str(response) if response else "No response from model"
-                }
-            
-        # Use OpenRouter for all other models
-        else:
-            print(f"Using OpenRouter API for model: {model_id}")
-            
-            try:
-                # Ensure we have valid messages
-                if len(messages) > 0:
-                    prompt_content = messages[-1].get("content", "")
-                    context_messages = messages[:-1]
-                else:
-                    prompt_content = "Connecting..."
-                    context_messages = []
-                
-                # Call OpenRouter API with streaming support
-                response = call_openrouter_api(prompt_content, context_messages, model_id, system_prompt, stream_callback=streaming_callback)
-                
-                print(f"Raw {model} Response:")
-                print("-" * 50)
-                print(response)
-                print("-" * 50)
-                
-                result = {
-                    "role": "assistant",
-                    "content": response,
-                    "model": model,
-                    "ai_name": ai_name
-                }
-                
-                return result
-            except Exception as e:
-                error_message = f"Error making API request: {str(e)}"
-                print(f"Error: {error_message}")
-                print(f"Error type: {type(e)}")
-                
-                # Create an error response
-                result = {
-                    "role": "system",
-                    "content": f"Error: {error_message}",
-                    "model": model,
-                    "ai_name": ai_name
-                }
-                
-                # Return the error result
-                return result
-            
-    except Exception as e:
-        error_message = f"Error making API request: {str(e)}"
-        print(f"Error: {error_message}")
-        
-        # Create an error response
-        result = {
-            "role": "system",
-            "content": f"Error: {error_message}",
-            "model": model,
-            "ai_name": ai_name
-        }
-        
-        # Return the error result
-        return result
+                if parts:
+                    self._deliver(name, "".join(parts))
+                    parts = []
+                self._on_reconnect(name, *item)
+            if parts:
+                self._deliver(name, "".join(parts))
+    
+    def discard(self, ai_name=None):
+        """Drop what is queued, for one AI or all"""
+        self._take(ai_name)
 
 class ConversationManager:
     """Manages conversation processing and state"""
     def __init__(self, app):
         self.app = app
         self.workers = []  # Keep track of worker threads
+        self._parallel_round = None  # State of the in-flight parallel round, if any
+        self.turn_scheduler = TurnScheduler()  # Non-blocking delay between AI turns
+        self.context_cache = create_context_cache()  # Per-(conversation, AI) incremental turn context
+        self.run_token = CancellationToken()  # Shared by every worker of the current run; see abort()
+        self._active_workers = set()  # Workers started and not yet finished or cancelled
+        self._streaming_buffers = {}  # ai_name -> chunks streamed so far in its current turn
+        self.stream_coalescer = StreamCoalescer(self.on_streaming_chunk, self.on_ai_reconnecting)
         
         # Initialize the worker thread pool
         self.thread_pool = QThreadPool()
         print(f"Conversation Manager initialized with {self.thread_pool.maxThreadCount()} threads")
         
+        # Optionally drive provider streams from a single event-loop thread
+        self.async_bridge = AsyncProviderBridge() if USE_ASYNC_PROVIDERS else None
+        if self.async_bridge:
+            print("Async provider mode enabled - provider streams share one event-loop thread")
+        
+    def _start_worker(self, worker):
+        """Start a worker on the async provider loop or the thread pool"""
+        if worker.cancel_token.cancelled:
+            return  # Its run was stopped while the turn was waiting
+        worker.context_cache = self.context_cache
+        worker.stream_coalescer = self.stream_coalescer
+        worker.queued_at = time.monotonic()
+        self._active_workers.add(worker)
+        worker.signals.finished.connect(lambda w=worker: self._active_workers.discard(w))
+        worker.signals.cancelled.connect(lambda ai_name, w=worker: self.on_ai_cancelled(w))
+        if self.async_bridge:
+            future = self.async_bridge.submit(worker.run_async())
+            # Cancelling the task aborts the stream at its next await
+            unregister = worker.cancel_token.on_cancel(future.cancel)
+            future.add_done_callback(lambda f: unregister())
+        else:
+            self.thread_pool.start(worker)
+    
+    def _begin_run(self):
+        """Give runs started after an abort() a fresh cancellation token"""
+        if self.run_token.cancelled:
+            self.run_token = CancellationToken()
+    
+    def abort(self):
+        """Stop the current run: close in-flight requests and drop any pending turn
+        
+        Used by the stop button, before switching branches and on shutdown.
+        Worker threads are freed at once; replies that were cut off are not
+        added to the conversation.
+        
+        Returns:
+            True if anything was running
+        """
+        was_running = bool(self._active_workers) or self.turn_scheduler.is_pending()
+        self.turn_scheduler.cancel()
+        self.run_token.cancel()
+        self.stream_coalescer.discard()
+        self._parallel_round = None
+        if not was_running:
+            return False
+        
+        print(f"Stopped the run ({len(self._active_workers)} turn(s) in flight)")
+        self.app.left_pane.stop_loading()
+        self.app.statusBar().showMessage("Stopped")
+        if hasattr(self.app, 'set_signal_active'):
+            self.app.set_signal_active(False)
+        return True
+    
+    def on_ai_cancelled(self, worker):
+        """Drop a stopped turn's partial output from the display"""
+        self._active_workers.discard(worker)
+        self._streaming_buffers.pop(worker.ai_name, None)
+        if self._active_workers:
+            return  # Still streaming (e.g. a new run was started); it re-renders when done
+        
+        # Re-render without the partially streamed text
+        if self.app.active_branch:
+            branch_data = self.app.branch_conversations[self.app.active_branch]
+            visible_conversation = [msg for msg in branch_data['conversation'] if not msg.get('hidden', False)]
+            self.app.left_pane.display_conversation(visible_conversation, branch_data)
+        else:
+            visible_conversation = [msg for msg in self.app.main_conversation if not msg.get('hidden', False)]
+            self.app.left_pane.display_conversation(visible_conversation)
+        
     def initialize(self):
         """Initialize the conversation manager"""
         # Initialize the app and thread pool
@@ -673,6 +414,10 @@ class ConversationManager:
         # Set up input callback
         self.app.left_pane.set_input_callback(self.process_input)
         
+        # Stop button, and stopping the run before another branch is shown
+        self.app.left_pane.set_stop_callback(self.abort)
+        self.app.set_branch_switch_callback(self.abort)
+        
         # Set up branch processing callbacks
         self.app.left_pane.set_rabbithole_callback(self.rabbithole_callback)
         self.app.left_pane.set_fork_callback(self.fork_callback)
@@ -688,6 +433,9 @@ class ConversationManager:
     
     def process_input(self, user_input=None):
         """Process the user input and generate AI responses"""
+        if user_input is not None:
+            self._begin_run()
+        
         # Get the conversation (either main or branch)
         if self.app.active_branch:
             # For branch conversations, delegate to branch processor
@@ -700,46 +448,7 @@ class ConversationManager:
         
         # Add user input if provided
         if user_input:
-            # Handle both string and dict input (dict for image support)
-            if isinstance(user_input, dict):
-                # Extract text and image data
-                text = user_input.get('text', '')
-                image_data = user_input.get('image')
-                
-                if image_data:
-                    # Create message with image
-                    user_message = {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": image_data['media_type'],
-                                    "data": image_data['base64']
-                                }
-                            }
-                        ]
-                    }
-                    # Add text if provided
-                    if text:
-                        user_message["content"].insert(0, {
-                            "type": "text",
-                            "text": text
-                        })
-                else:
-                    # Text-only message
-                    user_message = {
-                        "role": "user",
-                        "content": text
-                    }
-            else:
-                # Legacy string input
-                user_message = {
-                    "role": "user",
-                    "content": user_input
-                }
-                
+            user_message = build_user_message(user_input)
             self.app.main_conversation.append(user_message)
             
             # Update the conversation display with the new user message
@@ -762,9 +471,6 @@ class ConversationManager:
         if hasattr(self.app, 'set_signal_active'):
             self.app.set_signal_active(True)
         
-        # Track request start time for latency
-        self._request_start_time = time.time()
-        
         # Reset turn count ONLY if this is a new conversation or explicit user input
         max_iterations = int(self.app.right_sidebar.control_panel.iterations_selector.currentText())
         if user_input is not None or not self.app.main_conversation:
@@ -780,13 +486,20 @@ class ConversationManager:
             model = self.get_model_for_ai(i)
             prompt = SYSTEM_PROMPT_PAIRS[selected_prompt_pair][ai_name]
             
-            worker = Worker(ai_name, self.app.main_conversation, model, prompt, gui=self.app)
+            worker = Worker(ai_name, self.app.main_conversation, model, prompt, gui=self.app, cancel_token=self.run_token)
+            workers.append(worker)
+        
+        # Parallel round: every AI answers the same snapshot concurrently
+        if self.is_parallel_round_mode():
+            self.start_parallel_round(workers, max_iterations)
+            return
+        
+        for worker in workers:
             worker.signals.response.connect(self.on_ai_response_received)
             worker.signals.result.connect(self.on_ai_result_received)
             worker.signals.streaming_chunk.connect(self.on_streaming_chunk)
+            worker.signals.reconnecting.connect(self.on_ai_reconnecting)
             worker.signals.error.connect(self.on_ai_error)
-            
-            workers.append(worker)
         
         # Chain workers together AFTER all are created (avoids closure issues)
         for i, worker in enumerate(workers):
@@ -804,7 +517,104 @@ class ConversationManager:
                 worker.signals.finished.connect(lambda mi=max_iter: self.handle_turn_completion(mi))
         
         # Start first AI's turn
-        self.thread_pool.start(workers[0])
+        self._start_worker(workers[0])
+    
+    def is_parallel_round_mode(self):
+        """True when the control panel asks for all AIs in a round to run concurrently"""
+        selector = getattr(self.app.right_sidebar.control_panel, 'turn_mode_selector', None)
+        return selector is not None and selector.currentText() == "Parallel Round"
+    
+    def start_parallel_round(self, workers, max_iterations):
+        """Start every worker at once against the same conversation snapshot.
+        
+        Replies are held until the whole round has finished and are then
+        committed in AI order, so a round costs roughly its slowest model.
+        Streaming output is shown one AI at a time in the same order; later
+        AIs are buffered until the AIs ahead of them finish.
+        """
+        self._parallel_round = {
+            'order': [worker.ai_name for worker in workers],
+            'results': {},
+            'errors': {},
+            'chunks': {worker.ai_name: [] for worker in workers},
+            'finished': set(),
+            'live_index': 0,
+            'max_iterations': max_iterations,
+        }
+        
+        for worker in workers:
+            worker.signals.streaming_chunk.connect(self.on_streaming_chunk)
+            worker.signals.reconnecting.connect(self.on_ai_reconnecting)
+            worker.signals.result.connect(self.on_parallel_result)
+            worker.signals.error.connect(self._make_parallel_error_callback(worker.ai_name))
+            worker.signals.finished.connect(self._make_parallel_finished_callback(worker.ai_name))
+        
+        print(f"Starting parallel round with {len(workers)} AIs")
+        for worker in workers:
+            self._start_worker(worker)
+    
+    def _make_parallel_error_callback(self, ai_name):
+        """Factory for a per-AI error slot (the error signal carries no AI name)"""
+        def callback(error_message):
+            if self._parallel_round is not None:
+                self._parallel_round['errors'][ai_name] = error_message
+        return callback
+    
+    def _make_parallel_finished_callback(self, ai_name):
+        """Factory for a per-AI finished slot"""
+        def callback():
+            # Its last chunks may still be waiting for the next frame
+            self.stream_coalescer.flush(ai_name)
+            self.on_parallel_worker_finished(ai_name)
+        return callback
+    
+    def on_parallel_result(self, ai_name, result):
+        """Hold a parallel-round result until the whole round is in"""
+        if self._parallel_round is not None:
+            self._parallel_round['results'][ai_name] = result
+    
+    def on_parallel_worker_finished(self, ai_name):
+        """Advance the live stream and commit the round once every AI is done"""
+        round_state = self._parallel_round
+        if round_state is None:
+            return
+        round_state['finished'].add(ai_name)
+        self._advance_parallel_stream()
+        
+        if len(round_state['finished']) < len(round_state['order']):
+            return
+        
+        # Commit replies in fixed AI order
+        self._parallel_round = None
+        for name in round_state['order']:
+            if name in round_state['results']:
+                result = round_state['results'][name]
+                content = result.get('content', '') if isinstance(result, dict) else result
+                self.on_ai_response_received(name, content if content else "")
+                self.on_ai_result_received(name, result)
+            elif name in round_state['errors']:
+                self.on_ai_error(round_state['errors'][name])
+        
+        self.handle_turn_completion(round_state['max_iterations'])
+    
+    def _advance_parallel_stream(self):
+        """Move the live display on past AIs that have finished, flushing their buffers"""
+        round_state = self._parallel_round
+        order = round_state['order']
+        while round_state['live_index'] < len(order) and order[round_state['live_index']] in round_state['finished']:
+            round_state['live_index'] += 1
+            if round_state['live_index'] < len(order):
+                next_ai = order[round_state['live_index']]
+                buffered = ''.join(round_state['chunks'][next_ai])
+                if buffered:
+                    self._show_stream_header(next_ai)
+                    self.app.left_pane.append_text(buffered, "ai")
+    
+    def _show_stream_header(self, ai_name):
+        """Append the '<AI> (<model>):' header that precedes streamed text"""
+        ai_number = int(ai_name.split('-')[1]) if '-' in ai_name else 1
+        model_name = self.get_model_for_ai(ai_number)
+        self.app.left_pane.append_text(f"\n{ai_name} ({model_name}):\n\n", "header")
     
     def _make_next_turn_callback(self, worker, ai_number):
         """Factory function to create a callback for starting the next AI turn.
@@ -814,7 +624,17 @@ class ConversationManager:
         return callback
     
     def start_next_ai_turn(self, worker, ai_number):
-        """Start the next AI's turn in the conversation"""
+        """Schedule the next AI's turn after a non-blocking, per-AI/adaptive delay"""
+        if worker.cancel_token.cancelled:
+            return
+        previous_model = self.get_model_for_ai(ai_number - 1) if ai_number > 1 else None
+        delay = get_turn_delay(worker.ai_name, previous_model, worker.model)
+        if delay:
+            print(f"Waiting {delay:.1f}s before AI-{ai_number}'s turn")
+        self.turn_scheduler.schedule(delay, lambda: self._launch_ai_turn(worker, ai_number))
+    
+    def _launch_ai_turn(self, worker, ai_number):
+        """Start a scheduled AI turn against the latest conversation state"""
         # Get the latest conversation state
         if self.app.active_branch:
             branch_id = self.app.active_branch
@@ -826,15 +646,23 @@ class ConversationManager:
         # Update worker's conversation reference to ensure it has the latest state
         worker.conversation = latest_conversation.copy()
         
-        # Add a small delay between turns
-        time.sleep(TURN_DELAY)
-        
         # Start next AI's turn
         print(f"Starting AI-{ai_number}'s turn")
-        self.thread_pool.start(worker)
+        self._start_worker(worker)
+    
+    def cancel_pending_turn(self):
+        """Cancel an AI turn that is waiting on the inter-turn delay"""
+        if self.turn_scheduler.cancel():
+            print("Cancelled pending AI turn")
+            self.app.left_pane.stop_loading()
+            return True
+        return False
     
     def handle_turn_completion(self, max_iterations=1):
         """Handle the completion of a full turn (both AIs)"""
+        if self.run_token.cancelled:
+            return  # Stopped; a late finished signal must not start another turn
+        
         # Stop the loading animation
         self.app.left_pane.stop_loading()
         
@@ -900,6 +728,9 @@ class ConversationManager:
     
     def process_branch_input(self, user_input=None):
         """Process input from the user specifically for branch conversations"""
+        if user_input is not None:
+            self._begin_run()
+        
         # Check if we have an active branch
         if not self.app.active_branch:
             # Fallback to main conversation if no active branch
@@ -910,8 +741,6 @@ class ConversationManager:
         branch_id = self.app.active_branch
         branch_data = self.app.branch_conversations[branch_id]
         conversation = branch_data['conversation']
-        branch_type = branch_data.get('type', 'branch')
-        selected_text = branch_data.get('selected_text', '')
         
         # Check for duplicate messages first
         if len(conversation) >= 2:
@@ -924,50 +753,12 @@ class ConversationManager:
                 last_msg.get('content') == second_last_msg.get('content')):
                 # Remove the duplicate message
                 conversation.pop()
+                self.context_cache.invalidate(branch_id)
                 print("Removed duplicate message from branch conversation")
         
         # Add user input if provided
         if user_input:
-            # Handle both string and dict input (dict for image support)
-            if isinstance(user_input, dict):
-                # Extract text and image data
-                text = user_input.get('text', '')
-                image_data = user_input.get('image')
-                
-                if image_data:
-                    # Create message with image
-                    user_message = {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": image_data['media_type'],
-                                    "data": image_data['base64']
-                                }
-                            }
-                        ]
-                    }
-                    # Add text if provided
-                    if text:
-                        user_message["content"].insert(0, {
-                            "type": "text",
-                            "text": text
-                        })
-                else:
-                    # Text-only message
-                    user_message = {
-                        "role": "user",
-                        "content": text
-                    }
-            else:
-                # Legacy string input
-                user_message = {
-                    "role": "user",
-                    "content": user_input
-                }
-                
+            user_message = build_user_message(user_input)
             conversation.append(user_message)
             
             # Update the conversation display with the new user message
@@ -984,27 +775,12 @@ class ConversationManager:
         selected_prompt_pair = self.app.right_sidebar.control_panel.prompt_pair_selector.currentText()
         
         # Check if we've already had AI responses in this branch
-        has_ai_responses = False
-        ai_response_count = 0
-        for msg in conversation:
-            if msg.get('role') == 'assistant':
-                has_ai_responses = True
-                ai_response_count += 1
+        has_ai_responses = any(msg.get('role') == 'assistant' for msg in conversation)
         
-        # Determine which prompts to use based on branch type and response history
-        if branch_type.lower() == 'rabbithole' and ai_response_count < 2:
-            # Initial rabbitholing prompt - only for the first exchange
-            print("Using rabbithole-specific prompt for initial exploration")
-            rabbithole_prompt = f"You are interacting with other AIs. IMPORTANT: Focus this response specifically on exploring and expanding upon the concept of '{selected_text}' in depth. Discuss the most interesting aspects or connections related to this concept while maintaining the tone of the conversation. No numbered lists or headings."
-            ai_1_prompt = rabbithole_prompt
-            ai_2_prompt = rabbithole_prompt
-            ai_3_prompt = rabbithole_prompt
-        else:
-            # After initial exploration, revert to standard prompts
-            print("Using standard prompts for continued conversation")
-            ai_1_prompt = SYSTEM_PROMPT_PAIRS[selected_prompt_pair]["AI-1"]
-            ai_2_prompt = SYSTEM_PROMPT_PAIRS[selected_prompt_pair]["AI-2"]
-            ai_3_prompt = SYSTEM_PROMPT_PAIRS[selected_prompt_pair]["AI-3"]
+        # Rabbitholes use an exploration prompt for the first exchange, then the standard prompts
+        ai_1_prompt = get_branch_system_prompt(branch_data, SYSTEM_PROMPT_PAIRS[selected_prompt_pair]["AI-1"])
+        ai_2_prompt = get_branch_system_prompt(branch_data, SYSTEM_PROMPT_PAIRS[selected_prompt_pair]["AI-2"])
+        ai_3_prompt = get_branch_system_prompt(branch_data, SYSTEM_PROMPT_PAIRS[selected_prompt_pair]["AI-3"])
         
         # Start loading animation
         self.app.left_pane.start_loading()
@@ -1019,14 +795,23 @@ class ConversationManager:
         max_iterations = int(self.app.right_sidebar.control_panel.iterations_selector.currentText())
         
         # Create worker threads for AI-1, AI-2, and AI-3
-        worker1 = Worker("AI-1", conversation, ai_1_model, ai_1_prompt, is_branch=True, branch_id=branch_id, gui=self.app)
-        worker2 = Worker("AI-2", conversation, ai_2_model, ai_2_prompt, is_branch=True, branch_id=branch_id, gui=self.app)
-        worker3 = Worker("AI-3", conversation, ai_3_model, ai_3_prompt, is_branch=True, branch_id=branch_id, gui=self.app)
+        worker1 = Worker("AI-1", conversation, ai_1_model, ai_1_prompt, is_branch=True, branch_id=branch_id, gui=self.app,
+                          cancel_token=self.run_token)
+        worker2 = Worker("AI-2", conversation, ai_2_model, ai_2_prompt, is_branch=True, branch_id=branch_id, gui=self.app,
+                          cancel_token=self.run_token)
+        worker3 = Worker("AI-3", conversation, ai_3_model, ai_3_prompt, is_branch=True, branch_id=branch_id, gui=self.app,
+                          cancel_token=self.run_token)
+        
+        # Parallel round: all three AIs answer the same branch snapshot at once
+        if self.is_parallel_round_mode():
+            self.start_parallel_round([worker1, worker2, worker3], max_iterations)
+            return
         
         # Connect signals for worker1
         worker1.signals.response.connect(self.on_ai_response_received)
         worker1.signals.result.connect(self.on_ai_result_received)
         worker1.signals.streaming_chunk.connect(self.on_streaming_chunk)
+        worker1.signals.reconnecting.connect(self.on_ai_reconnecting)
         worker1.signals.finished.connect(lambda: self.start_ai2_turn(conversation, worker2))
         worker1.signals.error.connect(self.on_ai_error)
         
@@ -1034,6 +819,7 @@ class ConversationManager:
         worker2.signals.response.connect(self.on_ai_response_received)
         worker2.signals.result.connect(self.on_ai_result_received)
         worker2.signals.streaming_chunk.connect(self.on_streaming_chunk)
+        worker2.signals.reconnecting.connect(self.on_ai_reconnecting)
         worker2.signals.finished.connect(lambda: self.start_ai3_turn(conversation, worker3))
         worker2.signals.error.connect(self.on_ai_error)
         
@@ -1041,55 +827,77 @@ class ConversationManager:
         worker3.signals.response.connect(self.on_ai_response_received)
         worker3.signals.result.connect(self.on_ai_result_received)
         worker3.signals.streaming_chunk.connect(self.on_streaming_chunk)
+        worker3.signals.reconnecting.connect(self.on_ai_reconnecting)
         worker3.signals.finished.connect(lambda: self.handle_turn_completion(max_iterations))
         worker3.signals.error.connect(self.on_ai_error)
         
         # Start AI-1's turn
-        self.thread_pool.start(worker1)
+        self._start_worker(worker1)
         
     def on_streaming_chunk(self, ai_name, chunk):
-        """Handle streaming chunks as they arrive"""
-        # Initialize streaming buffer if not exists
-        if not hasattr(self, '_streaming_buffers'):
-            self._streaming_buffers = {}
+        """Handle streamed text (one frame's worth when it comes through the StreamCoalescer)"""
+        # Parallel rounds show one AI's stream at a time and buffer the rest
+        round_state = self._parallel_round
+        if round_state is not None and ai_name in round_state['chunks']:
+            buffered = round_state['chunks'][ai_name]
+            is_live = round_state['order'][round_state['live_index']] == ai_name
+            if is_live and not buffered:
+                self._show_stream_header(ai_name)
+            buffered.append(chunk)
+            if is_live:
+                self.app.left_pane.append_text(chunk, "ai")
+            return
         
         # Initialize buffer for this AI if needed
         if ai_name not in self._streaming_buffers:
-            self._streaming_buffers[ai_name] = ""
+            self._streaming_buffers[ai_name] = []
             # Add a header to show this AI is responding
-            ai_number = int(ai_name.split('-')[1]) if '-' in ai_name else 1
-            model_name = self.get_model_for_ai(ai_number)
-            self.app.left_pane.append_text(f"\n{ai_name} ({model_name}):\n\n", "header")
-            
-            # Calculate and update latency on first chunk
-            if hasattr(self, '_request_start_time') and hasattr(self.app, 'update_signal_latency'):
-                latency_ms = int((time.time() - self._request_start_time) * 1000)
-                self.app.update_signal_latency(latency_ms)
+            self._show_stream_header(ai_name)
         
         # Append chunk to buffer
-        self._streaming_buffers[ai_name] += chunk
+        self._streaming_buffers[ai_name].append(chunk)
         
         # Display the chunk in the GUI
         self.app.left_pane.append_text(chunk, "ai")
     
+    def on_ai_reconnecting(self, ai_name, attempt, reason):
+        """Show that a request is being retried and drop its partial streamed text
+        
+        The retried stream starts again from the beginning; the partial text
+        already on screen stays until the finished reply re-renders the
+        conversation, with a marker showing where the reconnect happened.
+        """
+        self.app.statusBar().showMessage(f"{ai_name} reconnecting (retry {attempt}): {reason}")
+        
+        round_state = self._parallel_round
+        if round_state is not None and ai_name in round_state['chunks']:
+            buffered = round_state['chunks'][ai_name]
+            is_live = round_state['order'][round_state['live_index']] == ai_name
+            if buffered:
+                buffered.clear()
+                if is_live:
+                    self.app.left_pane.append_text("\n[reconnecting...]\n\n", "system")
+            return
+        
+        if self._streaming_buffers.get(ai_name):
+            self._streaming_buffers[ai_name].clear()
+            self.app.left_pane.append_text("\n[reconnecting...]\n\n", "system")
+    
     def on_ai_response_received(self, ai_name, response_content):
         """Handle AI responses for both main and branch conversations"""
         print(f"Response received from {ai_name}: {response_content[:100]}...")
         
-        # Clear streaming buffer for this AI
-        if hasattr(self, '_streaming_buffers') and ai_name in self._streaming_buffers:
-            del self._streaming_buffers[ai_name]
+        # Clear streaming buffer for this AI; the display is re-rendered below, so
+        # chunks still waiting for the next frame are not drawn
+        self.stream_coalescer.discard(ai_name)
+        self._streaming_buffers.pop(ai_name, None)
         
         # Extract AI number from ai_name (e.g., "AI-1" -> 1)
         ai_number = int(ai_name.split('-')[1]) if '-' in ai_name else 1
         
-        # Format the AI response with proper metadata
-        ai_message = {
-            "role": "assistant",
-            "content": response_content,
-            "ai_name": ai_name,  # Add AI name to the message
-            "model": self.get_model_for_ai(ai_number)  # Get the selected model name
-        }
+        # Format the AI response with proper metadata; a failed turn is kept as
+        # a system message, so the other AIs never see the error as its reply
+        ai_message = result_to_message(ai_name, self.get_model_for_ai(ai_number), response_content)
         
         # Check if we're in a branch or main conversation
         if self.app.active_branch:
@@ -1124,6 +932,11 @@ class ConversationManager:
         """Handle the complete AI result"""
         print(f"Result received from {ai_name}")
         
+        # Show this turn's time to first token (see turn_metrics)
+        metrics = result.get('metrics') if isinstance(result, dict) else None
+        if metrics and metrics.get('ttft') is not None and hasattr(self.app, 'update_signal_latency'):
+            self.app.update_signal_latency(int(metrics['ttft'] * 1000))
+        
         # Determine which conversation to update
         conversation = self.app.main_conversation
         if self.app.active_branch:
@@ -1131,8 +944,11 @@ class ConversationManager:
             branch_data = self.app.branch_conversations[branch_id]
             conversation = branch_data['conversation']
         
+        # A failed turn was already added as an error by on_ai_response_received; it is only re-rendered below
+        failed = turn_status(result) == "error"
+        
         # Generate an image based on the AI response (for non-image responses) if auto-generation is enabled
-        if isinstance(result, dict) and "content" in result and not "image_url" in result:
+        if not failed and isinstance(result, dict) and "content" in result and not "image_url" in result:
             response_content = result.get("content", "")
             if response_content and len(response_content.strip()) > 20:
                 if hasattr(self.app.right_sidebar.control_panel, 'auto_image_checkbox') and self.app.right_sidebar.control_panel.auto_image_checkbox.isChecked():
@@ -1140,7 +956,7 @@ class ConversationManager:
                     self.generate_and_display_image(response_content, ai_name)
         
         # Display result content
-        if isinstance(result, dict):
+        if not failed and isinstance(result, dict):
             if "display" in result and SHOW_CHAIN_OF_THOUGHT_IN_CONTEXT:
                 self.app.left_pane.append_text(f"\n{ai_name} ({result.get('model', '')}):\n\n", "header")
                 cot_parts = result['display'].split('[Final Answer]')
@@ -1161,7 +977,7 @@ class ConversationManager:
         # Optionally trigger Sora video generation from AI-1 responses (no GUI embedding)
         try:
             auto_sora = os.getenv("SORA_AUTO_FROM_AI1", "0").strip() == "1"
-            if auto_sora and ai_name == "AI-1" and isinstance(result, dict):
+            if auto_sora and not failed and ai_name == "AI-1" and isinstance(result, dict):
                 prompt_text = result.get("content", "")
                 # Require a minimally substantive prompt
                 if isinstance(prompt_text, str) and len(prompt_text.strip()) > 20:
@@ -1179,21 +995,27 @@ class ConversationManager:
 
                     # Run in background to avoid blocking UI
                     import threading
-                    def _run_sora_job(prompt_capture: str):
-                        result_dict = generate_video_with_sora(
-                            prompt=prompt_capture,
-                            model=sora_model,
-                            seconds=sora_seconds,
-                            size=sora_size,
-                            poll_interval_seconds=5.0,
-                        )
+                    def _run_sora_job(prompt_capture: str, cancel_token):
+                        try:
+                            result_dict = generate_video_with_sora(
+                                prompt=prompt_capture,
+                                model=sora_model,
+                                seconds=sora_seconds,
+                                size=sora_size,
+                                poll_interval_seconds=5.0,
+                                cancel_token=cancel_token,
+                            )
+                        except Cancelled:
+                            print("Sora video job cancelled (the render keeps running on OpenAI's side)")
+                            return
                         # Log to console; UI updates from background threads are avoided
                         if result_dict.get("success"):
                             print(f"Sora video completed: {result_dict.get('video_path')}")
                         else:
                             print(f"Sora video failed: {result_dict.get('error')}")
 
-                    threading.Thread(target=_run_sora_job, args=(prompt_text,), daemon=True).start()
+                    # Aborting the run stops the polling; a later run gets a fresh token
+                    threading.Thread(target=_run_sora_job, args=(prompt_text, self.run_token), daemon=True).start()
         except Exception as e:
             print(f"Auto Sora trigger error: {e}")
         
@@ -1305,47 +1127,19 @@ class ConversationManager:
     def rabbithole_callback(self, selected_text):
         """Create a rabbithole branch from selected text"""
         print(f"Creating rabbithole branch for: '{selected_text}'")
+        self.abort()
         
-        # Create unique branch ID
-        branch_id = f"rabbithole_{time.time()}"
-        
-        # Create a new conversation for the branch
-        branch_conversation = []
-        
-        # If we're branching from another branch, copy over relevant context
-        parent_conversation = []
-        parent_id = None
-        
-        if self.app.active_branch:
-            # Branching from another branch
-            parent_id = self.app.active_branch
-            parent_data = self.app.branch_conversations[parent_id]
-            parent_conversation = parent_data['conversation']
+        # Branch from whichever conversation is active
+        parent_id = self.app.active_branch
+        if parent_id:
+            parent_conversation = self.app.branch_conversations[parent_id]['conversation']
         else:
-            # Branching from main conversation
             parent_conversation = self.app.main_conversation
         
-        # Copy ALL previous context except branch indicators
-        for msg in parent_conversation:
-            if not msg.get('_type') == 'branch_indicator':
-                # Copy the message excluding branch indicators
-                branch_conversation.append(msg.copy())
-        
-        # Add the branch indicator at the END (not beginning) 
-        branch_message = {
-            "role": "system", 
-            "content": f"🐇 Rabbitholing down: \"{selected_text}\"",
-            "_type": "branch_indicator"  # Special flag for branch indicators
-        }
-        branch_conversation.append(branch_message)
-        
-        # Store the branch data
-        self.app.branch_conversations[branch_id] = {
-            'type': 'rabbithole',
-            'selected_text': selected_text,
-            'conversation': branch_conversation,
-            'parent': parent_id
-        }
+        branch_id, branch_data = create_rabbithole_branch(parent_conversation, selected_text, parent_id,
+                                                        self.context_cache)
+        branch_conversation = branch_data['conversation']
+        self.app.branch_conversations[branch_id] = branch_data
         
         # Activate the branch
         self.app.active_branch = branch_id
@@ -1365,97 +1159,22 @@ class ConversationManager:
     def fork_callback(self, selected_text):
         """Create a fork branch from selected text"""
         print(f"Creating fork branch for: '{selected_text}'")
+        self.abort()
         
-        # Create unique branch ID
-        branch_id = f"fork_{time.time()}"
-        
-        # Create a new conversation for the branch
-        branch_conversation = []
-        
-        # If we're branching from another branch, copy over relevant context
-        parent_conversation = []
-        parent_id = None
-        
-        if self.app.active_branch:
-            # Forking from another branch
-            parent_id = self.app.active_branch
-            parent_data = self.app.branch_conversations[parent_id]
-            parent_conversation = parent_data['conversation']
+        # Fork from whichever conversation is active
+        parent_id = self.app.active_branch
+        if parent_id:
+            parent_conversation = self.app.branch_conversations[parent_id]['conversation']
         else:
-            # Forking from main conversation
             parent_conversation = self.app.main_conversation
         
-        # For fork branches, only include context UP TO the selected text
-        truncate_idx = None
-        msg_with_text = None
-        
-        # First pass: find the message containing the selected text
-        for i, msg in enumerate(parent_conversation):
-            if msg.get('role') in ['user', 'assistant'] and selected_text in msg.get('content', ''):
-                truncate_idx = i
-                msg_with_text = msg
-                break
-        
-        # If we didn't find the selected text, include all messages
-        # This can happen with multi-line selections that span messages
-        if truncate_idx is None:
-            print(f"Warning: Selected text not found in any single message, including all context")
-            # Copy all messages except branch indicators
-            for msg in parent_conversation:
-                if not msg.get('_type') == 'branch_indicator':
-                    branch_conversation.append(msg.copy())
-        else:
-            # We found the message with the selected text, proceed as normal
-            # Second pass: add all messages up to the truncate point
-            for i, msg in enumerate(parent_conversation):
-                # Always include system messages that aren't branch indicators
-                if msg.get('role') == 'system' and not msg.get('_type') == 'branch_indicator':
-                    branch_conversation.append(msg.copy())
-                    continue
-                
-                # For non-system messages, only include up to truncate point
-                if i <= truncate_idx:
-                    # Add message (potentially modified if it's the truncate point)
-                    if i == truncate_idx:
-                        # This is the message containing the selected text
-                        # Truncate the message at the selected text if possible
-                        content = msg.get('content', '')
-                        if selected_text in content:
-                            # Find where the selected text occurs
-                            pos = content.find(selected_text)
-                            # Include everything up to and including the selected text
-                            truncated_content = content[:pos + len(selected_text)]
-                            
-                            # Create a modified copy of the message with truncated content
-                            modified_msg = msg.copy()
-                            modified_msg['content'] = truncated_content
-                            branch_conversation.append(modified_msg)
-                        else:
-                            # If we can't find the text (unlikely), just add the whole message
-                            branch_conversation.append(msg.copy())
-                    else:
-                        # Regular message before the truncate point
-                        branch_conversation.append(msg.copy())
-        
-        # Add the branch indicator as the last message
-        branch_message = {
-            "role": "system", 
-            "content": f"🍴 Forking off: \"{selected_text}\"",
-            "_type": "branch_indicator"  # Special flag for branch indicators
-        }
-        branch_conversation.append(branch_message)
+        branch_id, branch_data = create_fork_branch(parent_conversation, selected_text, parent_id, self.context_cache)
+        branch_conversation = branch_data['conversation']
+        self.app.branch_conversations[branch_id] = branch_data
         
         # Create properly formatted fork instruction - simplified to just "..."
         fork_instruction = "..."
         
-        # Store the branch data
-        self.app.branch_conversations[branch_id] = {
-            'type': 'fork',
-            'selected_text': selected_text,
-            'conversation': branch_conversation,
-            'parent': parent_id
-        }
-        
         # Activate the branch
         self.app.active_branch = branch_id
         
@@ -1473,6 +1192,9 @@ class ConversationManager:
 
     def process_branch_input_with_hidden_instruction(self, user_input):
         """Process input from the user specifically for branch conversations, but mark the input as hidden"""
+        if user_input is not None:
+            self._begin_run()
+        
         # Check if we have an active branch
         if not self.app.active_branch:
             # Fallback to main conversation if no active branch
@@ -1486,12 +1208,7 @@ class ConversationManager:
         
         # Add user input if provided, but mark it as hidden
         if user_input:
-            user_message = {
-                "role": "user",
-                "content": user_input,
-                "hidden": True  # Mark as hidden
-            }
-            conversation.append(user_message)
+            conversation.append(build_user_message(user_input, hidden=True))
             
             # No need to update display since message is hidden
         
@@ -1540,14 +1257,23 @@ class ConversationManager:
         max_iterations = int(self.app.right_sidebar.control_panel.iterations_selector.currentText())
         
         # Create worker threads for AI-1, AI-2, and AI-3
-        worker1 = Worker("AI-1", conversation, ai_1_model, ai_1_prompt, is_branch=True, branch_id=branch_id, gui=self.app)
-        worker2 = Worker("AI-2", conversation, ai_2_model, ai_2_prompt, is_branch=True, branch_id=branch_id, gui=self.app)
-        worker3 = Worker("AI-3", conversation, ai_3_model, ai_3_prompt, is_branch=True, branch_id=branch_id, gui=self.app)
+        worker1 = Worker("AI-1", conversation, ai_1_model, ai_1_prompt, is_branch=True, branch_id=branch_id, gui=self.app,
+                          cancel_token=self.run_token)
+        worker2 = Worker("AI-2", conversation, ai_2_model, ai_2_prompt, is_branch=True, branch_id=branch_id, gui=self.app,
+                          cancel_token=self.run_token)
+        worker3 = Worker("AI-3", conversation, ai_3_model, ai_3_prompt, is_branch=True, branch_id=branch_id, gui=self.app,
+                          cancel_token=self.run_token)
+        
+        # Parallel round: all three AIs answer the same branch snapshot at once
+        if self.is_parallel_round_mode():
+            self.start_parallel_round([worker1, worker2, worker3], max_iterations)
+            return
         
         # Connect signals for worker1
         worker1.signals.response.connect(self.on_ai_response_received)
         worker1.signals.result.connect(self.on_ai_result_received)
         worker1.signals.streaming_chunk.connect(self.on_streaming_chunk)
+        worker1.signals.reconnecting.connect(self.on_ai_reconnecting)
         worker1.signals.finished.connect(lambda: self.start_ai2_turn(conversation, worker2))
         worker1.signals.error.connect(self.on_ai_error)
         
@@ -1555,6 +1281,7 @@ class ConversationManager:
         worker2.signals.response.connect(self.on_ai_response_received)
         worker2.signals.result.connect(self.on_ai_result_received)
         worker2.signals.streaming_chunk.connect(self.on_streaming_chunk)
+        worker2.signals.reconnecting.connect(self.on_ai_reconnecting)
         worker2.signals.finished.connect(lambda: self.start_ai3_turn(conversation, worker3))
         worker2.signals.error.connect(self.on_ai_error)
         
@@ -1562,11 +1289,12 @@ class ConversationManager:
         worker3.signals.response.connect(self.on_ai_response_received)
         worker3.signals.result.connect(self.on_ai_result_received)
         worker3.signals.streaming_chunk.connect(self.on_streaming_chunk)
+        worker3.signals.reconnecting.connect(self.on_ai_reconnecting)
         worker3.signals.finished.connect(lambda: self.handle_turn_completion(max_iterations))
         worker3.signals.error.connect(self.on_ai_error)
         
         # Start AI-1's turn
-        self.thread_pool.start(worker1)
+        self._start_worker(worker1)
 
     def update_conversation_html(self, conversation):
         """Update the full conversation HTML document with all messages"""
@@ -1924,6 +1652,9 @@ def create_gui():
     manager = ConversationManager(main_window)
     manager.initialize()
     
+    # Close in-flight streams on exit instead of waiting for them to finish
+    app.aboutToQuit.connect(manager.abort)
+    
     return main_window, app
 
 def run_gui(main_window, app):
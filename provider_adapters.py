@@ -0,0 +1,369 @@
+# provider_adapters.py
+"""Provider adapters: how a turn is sent to each backend and what it can do.
+
+Each adapter wraps one backend's call_* functions and declares capabilities
+that the engine uses to make decisions, instead of checking model names:
+- streaming: tokens are pushed to the streaming callback as they arrive
+- images: image parts can be sent (otherwise prepare_turn replaces them
+  with a placeholder)
+- max_context: input tokens the backend accepts; caps a model's context_budget
+- max_concurrency: default cap on turns in flight per upstream (batch runs)
+
+Models are routed by the "provider" key of their AI_MODELS entry, a single
+dict lookup. Raw model IDs (e.g. OpenRouter IDs in a session config) are
+matched once against each adapter's matches() and the answer is cached.
+New backends subclass ProviderAdapter and call register_adapter().
+"""
+
+import os
+import threading
+
+from async_providers import (
+    call_claude_api_async,
+    call_deepseek_api_async,
+    call_gemini_api_async,
+    call_openai_api_async,
+    call_openrouter_api_async,
+)
+from config import AI_MODELS, BATCH_PROVIDER_CONCURRENCY
+from shared_utils import (
+    call_claude_api,
+    call_deepseek_api,
+    call_gemini_api,
+    call_openai_api,
+    call_openrouter_api,
+    format_deepseek_response,
+    generate_video_with_sora,
+)
+
+
+def split_prompt(messages):
+    """Split turn messages into (prompt_content, context_messages)"""
+    if len(messages) > 0:
+        return messages[-1].get("content", ""), messages[:-1]
+    return "Connecting...", []
+
+
+def prepare_claude_messages(messages):
+    """Drop empty and system messages before a Claude call (duplicates are already gone)"""
+    final_messages = []
+
+    for msg in messages:
+        # Skip empty messages - handle both string and list content
+        content = msg.get("content", "")
+        is_empty = False
+        if isinstance(content, list):
+            # For structured content, check if all parts are empty
+            text_parts = [part.get('text', '').strip() for part in content if part.get('type') == 'text']
+            has_image = any(part.get('type') == 'image' for part in content)
+            is_empty = not text_parts and not has_image
+        elif isinstance(content, str):
+            is_empty = not content
+        else:
+            is_empty = not content
+
+        if is_empty:
+            continue
+
+        # Handle system message separately
+        if msg.get("role") == "system":
+            continue
+
+        final_messages.append(msg)
+
+    # Ensure we have at least one message
+    if not final_messages:
+        print("Warning: No messages left after filtering. Adding a default message.")
+        final_messages.append({"role": "user", "content": "Connecting..."})
+
+    return final_messages
+
+
+class ProviderAdapter:
+    """Base adapter: split the prompt, call the backend, wrap the response"""
+
+    name = None  # Value of the "provider" key in AI_MODELS
+    upstream = None  # Who serves the API: groups rate-limit backoff and concurrency caps
+    label = None  # For logs
+    streaming = True
+    images = False
+    max_context = 128000
+    max_concurrency = 4
+    empty_response = None  # Substituted when the backend returns nothing
+
+    def matches(self, model_id):
+        """True if a raw model ID (not in AI_MODELS) belongs to this backend"""
+        return False
+
+    def prepare(self, messages):
+        """Split turn messages into (prompt_content, context_messages) for call()"""
+        return split_prompt(messages)
+
+    def call(self, prompt, context_messages, model_id, system_prompt, stream_callback=None, cancel_token=None):
+        """Send the turn and return the response text (or dict)
+
+        cancel_token (a CancellationToken) aborts the request in flight where
+        the backend supports it.
+        """
+        raise NotImplementedError
+
+    # Async generator of text chunks (see async_providers); None runs call() on a thread
+    astream = None
+
+    def from_stream(self, text):
+        """Turn the joined chunks from astream() into what call() would have returned"""
+        return text
+
+    def build_result(self, response, model, ai_name):
+        """Wrap a response in the result dict the Worker emits"""
+        if not response and self.empty_response:
+            response = self.empty_response
+        return {
+            "role": "assistant",
+            "content": response,
+            "model": model,
+            "ai_name": ai_name
+        }
+
+    def run_turn(self, messages, model, model_id, ai_name, system_prompt, stream_callback=None, cancel_token=None):
+        """Execute a turn from prepared messages (the system message first)"""
+        prompt_content, context_messages = self.prepare(messages)
+        response = self.call(prompt_content, context_messages, model_id, system_prompt,
+                             stream_callback=stream_callback if self.streaming else None,
+                             cancel_token=cancel_token)
+        return self.build_result(response, model, ai_name)
+
+
+class AnthropicAdapter(ProviderAdapter):
+    name = "anthropic"
+    upstream = "anthropic"
+    label = "Claude API"
+    images = True
+    max_context = 200000
+
+    # OpenRouter-style IDs of Claude models are still sent to Anthropic directly
+    def matches(self, model_id):
+        return "claude" in model_id.lower()
+
+    def prepare(self, messages):
+        return split_prompt(prepare_claude_messages(messages))
+
+    def call(self, prompt, context_messages, model_id, system_prompt, stream_callback=None, cancel_token=None):
+        return call_claude_api(prompt, context_messages, model_id, system_prompt, stream_callback=stream_callback,
+                               cancel_token=cancel_token)
+
+    def astream(self, prompt, context_messages, model_id, system_prompt):
+        return call_claude_api_async(prompt, context_messages, model_id, system_prompt)
+
+
+class OpenAIAdapter(ProviderAdapter):
+    name = "openai"
+    upstream = "openai"
+    label = "OpenAI API"
+    max_context = 400000
+    empty_response = "No response from OpenAI"
+
+    def matches(self, model_id):
+        return model_id.startswith(("gpt-", "o1", "o3"))
+
+    def call(self, prompt, context_messages, model_id, system_prompt, stream_callback=None, cancel_token=None):
+        return call_openai_api(prompt, context_messages, model_id, system_prompt, stream_callback=stream_callback,
+                               cancel_token=cancel_token)
+
+    def astream(self, prompt, context_messages, model_id, system_prompt):
+        return call_openai_api_async(prompt, context_messages, model_id, system_prompt)
+
+
+class GoogleAdapter(ProviderAdapter):
+    name = "google"
+    upstream = "google"
+    label = "Google Gemini API"
+    max_context = 1000000
+    empty_response = "No response from Gemini"
+
+    def matches(self, model_id):
+        return "gemini" in model_id.lower()
+
+    def call(self, prompt, context_messages, model_id, system_prompt, stream_callback=None, cancel_token=None):
+        return call_gemini_api(prompt, context_messages, model_id, system_prompt, stream_callback=stream_callback,
+                               cancel_token=cancel_token)
+
+    def astream(self, prompt, context_messages, model_id, system_prompt):
+        return call_gemini_api_async(prompt, context_messages, model_id, system_prompt)
+
+
+class DeepSeekAdapter(ProviderAdapter):
+    """DeepSeek R1 via OpenRouter; output is shown once its chain of thought is split out"""
+
+    name = "deepseek"
+    upstream = "openrouter"
+    label = "DeepSeek (OpenRouter)"
+    streaming = False
+    max_context = 64000
+
+    def matches(self, model_id):
+        return "deepseek" in model_id.lower()
+
+    def call(self, prompt, context_messages, model_id, system_prompt, stream_callback=None, cancel_token=None):
+        return call_deepseek_api(prompt, context_messages, model_id, system_prompt, cancel_token=cancel_token)
+
+    def astream(self, prompt, context_messages, model_id, system_prompt):
+        return call_deepseek_api_async(prompt, context_messages, model_id, system_prompt)
+
+    def from_stream(self, text):
+        return format_deepseek_response(text)
+
+    def build_result(self, response, model, ai_name):
+        # Ensure response has the required format for the Worker class
+        if isinstance(response, dict) and 'content' in response:
+            # Add model info to the response
+            response['model'] = model
+            response['role'] = 'assistant'
+            response['ai_name'] = ai_name
+
+            # Check for HTML contribution
+            if "html_contribution" in response:
+                # Don't update HTML document here - we'll do it in on_ai_result_received
+                # Just add indicator to the conversation part
+                response["content"] += "\n\n..."
+                if "display" in response:
+                    response["display"] += "\n\n..."
+
+            return response
+        # Create a formatted response if not already in the right format
+        return {
+            "role": "assistant",
+            "content": str(response) if response else "No response from model",
+            "model": model,
+            "ai_name": ai_name,
+            "display": str(response) if response else "No response from model"
+        }
+
+
+class OpenRouterAdapter(ProviderAdapter):
+    """Fallback for any model ID no other adapter claims"""
+
+    name = "openrouter"
+    upstream = "openrouter"
+    label = "OpenRouter API"
+
+    def call(self, prompt, context_messages, model_id, system_prompt, stream_callback=None, cancel_token=None):
+        response = call_openrouter_api(prompt, context_messages, model_id, system_prompt, stream_callback=stream_callback,
+                                       cancel_token=cancel_token)
+        print(f"Raw {model_id} Response:")
+        print("-" * 50)
+        print(response)
+        print("-" * 50)
+        return response
+
+    def astream(self, prompt, context_messages, model_id, system_prompt):
+        return call_openrouter_api_async(prompt, context_messages, model_id, system_prompt)
+
+
+class SoraAdapter(ProviderAdapter):
+    """Sora video generation: the latest message becomes the video prompt"""
+
+    name = "sora"
+    upstream = "openai"
+    label = "Sora Video API"
+    streaming = False
+    max_context = 4000  # Only the final message is used
+    max_concurrency = 2
+
+    def matches(self, model_id):
+        return model_id in ("sora-2", "sora-2-pro")
+
+    def run_turn(self, messages, model, model_id, ai_name, system_prompt, stream_callback=None, cancel_token=None):
+        # Use last user message as the video prompt
+        prompt_content = ""
+        if len(messages) > 0:
+            last_content = messages[-1].get("content", "")
+            # Extract text from structured content if needed
+            if isinstance(last_content, list):
+                text_parts = [part.get('text', '') for part in last_content if part.get('type') == 'text']
+                prompt_content = ' '.join(text_parts)
+            elif isinstance(last_content, str):
+                prompt_content = last_content
+
+        if not prompt_content or not prompt_content.strip():
+            prompt_content = "A short abstract motion graphic in warm colors"
+
+        # Optional duration/size via env
+        sora_seconds_env = os.getenv("SORA_SECONDS", "")
+        sora_size = os.getenv("SORA_SIZE", "") or None
+        try:
+            sora_seconds = int(sora_seconds_env) if sora_seconds_env else None
+        except ValueError:
+            sora_seconds = None
+
+        print(f"[Sora] Starting job with seconds={sora_seconds} size={sora_size}")
+        video_result = generate_video_with_sora(
+            prompt=prompt_content,
+            model=model_id,
+            seconds=sora_seconds,
+            size=sora_size,
+            cancel_token=cancel_token,
+        )
+
+        if video_result.get("success"):
+            print(f"[Sora] Completed: id={video_result.get('video_id')} path={video_result.get('video_path')}")
+            # Return a lightweight textual confirmation; video is saved to disk
+            return {
+                "role": "assistant",
+                "content": f"[Sora] Video created: {video_result.get('video_path')}",
+                "model": model,
+                "ai_name": ai_name
+            }
+        err = video_result.get("error", "unknown error")
+        print(f"[Sora] Failed: {err}")
+        return {
+            "role": "system",
+            "content": f"[Sora] Video generation failed: {err}",
+            "model": model,
+            "ai_name": ai_name
+        }
+
+
+_adapters = {}  # name -> adapter, in registration (= raw ID matching) order
+_raw_model_adapters = {}  # raw model ID -> adapter, memoized matches() results
+_lock = threading.Lock()
+FALLBACK_ADAPTER = "openrouter"
+
+
+def register_adapter(adapter):
+    """Add (or replace) a backend; raw model IDs are re-matched afterwards"""
+    with _lock:
+        _adapters[adapter.name] = adapter
+        _raw_model_adapters.clear()
+
+
+def get_adapter(model):
+    """Adapter for a model display name (AI_MODELS "provider") or raw model ID"""
+    config = AI_MODELS.get(model)
+    if config is not None:
+        return _adapters[config["provider"]]
+    adapter = _raw_model_adapters.get(model)
+    if adapter is None:
+        with _lock:
+            adapter = next((a for a in _adapters.values() if a.matches(model)), _adapters[FALLBACK_ADAPTER])
+            _raw_model_adapters[model] = adapter
+    return adapter
+
+
+def get_named_adapter(name):
+    """Adapter registered under `name` (e.g. "openrouter"), whatever models it matches"""
+    return _adapters[name]
+
+
+def get_concurrency_limits():
+    """Turns in flight per upstream: the largest max_concurrency of its adapters,
+    overridden by BATCH_PROVIDER_CONCURRENCY"""
+    limits = {}
+    for adapter in list(_adapters.values()):
+        limits[adapter.upstream] = max(limits.get(adapter.upstream, 0), adapter.max_concurrency)
+    limits.update(BATCH_PROVIDER_CONCURRENCY)
+    return limits
+
+
+for _adapter in (SoraAdapter(), AnthropicAdapter(), OpenAIAdapter(), GoogleAdapter(), DeepSeekAdapter(), OpenRouterAdapter()):
+    register_adapter(_adapter)
@@ -0,0 +1,90 @@
+# providers.py
+"""Registry of provider SDK clients, created on first use.
+
+The provider SDKs (anthropic, openai, google.generativeai, replicate) take
+seconds to import between them, and most sessions only talk to one or two
+providers, usually over plain REST. Nothing here imports an SDK until
+get_client() is first called for that provider; the client is then built
+once and shared by every thread.
+"""
+
+import os
+import threading
+
+_factories = {}
+_clients = {}
+_lock = threading.Lock()
+
+
+def register_provider(name, factory):
+    """Register a zero-argument factory that imports an SDK and returns its client"""
+    with _lock:
+        _factories[name] = factory
+        _clients.pop(name, None)
+
+
+def get_client(name):
+    """Return the client for provider `name`, importing and building it on first use"""
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    with _lock:
+        if name not in _clients:
+            if name not in _factories:
+                raise KeyError(f"Unknown provider '{name}'. Registered: {', '.join(sorted(_factories))}")
+            _clients[name] = _factories[name]()
+        return _clients[name]
+
+
+def reset_client(name):
+    """Drop provider `name`'s client, so the next get_client() builds a fresh one"""
+    with _lock:
+        _clients.pop(name, None)
+
+
+def loaded_providers():
+    """Names of providers whose client has been created so far"""
+    with _lock:
+        return sorted(_clients)
+
+
+def _anthropic_client():
+    from anthropic import Anthropic
+    return Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+
+
+def _openai_client():
+    import httpx
+    from openai import DefaultHttpxClient, OpenAI
+
+    from cassette import wrap_httpx_transport
+
+    # While a cassette is active, requests go through a recording/replaying transport (cassette_httpx.py)
+    transport = wrap_httpx_transport(httpx.HTTPTransport)
+    http_client = DefaultHttpxClient(transport=transport) if transport is not None else None
+    return OpenAI(api_key=os.getenv('OPENAI_API_KEY'), http_client=http_client)
+
+
+def _async_openai_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
+
+def _gemini_module():
+    # google.generativeai is configured globally rather than through a client object
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+    return genai
+
+
+def _replicate_module():
+    # replicate reads REPLICATE_API_TOKEN itself
+    import replicate
+    return replicate
+
+
+register_provider("anthropic", _anthropic_client)
+register_provider("openai", _openai_client)
+register_provider("openai_async", _async_openai_client)
+register_provider("gemini", _gemini_module)
+register_provider("replicate", _replicate_module)
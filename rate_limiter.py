@@ -0,0 +1,222 @@
+# rate_limiter.py
+"""Adaptive per-provider and per-model request rate limiting.
+
+Every provider call first reserves a slot with reserve(), which returns how
+long the caller must wait (sync callers sleep, async callers await), so
+requests queue up locally instead of being rejected with a 429. Each call's
+response headers are then passed to observe(), which learns the real limits:
+
+- Anthropic: anthropic-ratelimit-requests-{limit,remaining,reset}
+- OpenAI: x-ratelimit-{limit,remaining,reset}-requests
+- OpenRouter: x-ratelimit-{limit,remaining,reset}
+- Any provider: Retry-After on 429/503
+
+A provider bucket starts at RATE_LIMIT_RPM and is raised to any larger limit
+the headers report; a model bucket exists once a model's own limit has been
+seen. A 429 (or remaining == 0) pauses the bucket until the reported reset.
+Only request-count limits are tracked; token-per-minute limits surface as
+429s and are handled the same way.
+"""
+
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from config import RATE_LIMIT_DEFAULT_BACKOFF, RATE_LIMIT_RPM
+
+_LIMIT_HEADERS = ("anthropic-ratelimit-requests-limit", "x-ratelimit-limit-requests", "x-ratelimit-limit")
+_REMAINING_HEADERS = ("anthropic-ratelimit-requests-remaining", "x-ratelimit-remaining-requests", "x-ratelimit-remaining")
+_RESET_HEADERS = ("anthropic-ratelimit-requests-reset", "x-ratelimit-reset-requests", "x-ratelimit-reset")
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def _first_header(headers, names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+def parse_reset(value, now=None):
+    """Seconds until a rate-limit reset given as a duration ("6m0s", "20ms"),
+    an epoch timestamp (s or ms), an RFC 3339 time or an HTTP date.
+    Returns None if the value cannot be parsed."""
+    if value is None:
+        return None
+    now = time.time() if now is None else now
+    value = str(value).strip()
+    try:
+        number = float(value)
+        if number > 1e12:  # Epoch milliseconds (OpenRouter)
+            return max(0.0, number / 1000 - now)
+        if number > 1e9:  # Epoch seconds
+            return max(0.0, number - now)
+        return max(0.0, number)  # Plain seconds (Retry-After)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(amount + unit for amount, unit in parts) == value:
+        return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, moment.timestamp() - now)
+
+
+class TokenBucket:
+    """Requests-per-minute bucket that hands out reservations
+
+    reserve() always takes a token, letting the balance go negative; the
+    debt is the caller's wait. This keeps waiting callers in FIFO order
+    without holding a lock while they sleep. rpm=None means unlimited (only
+    pauses from 429s apply).
+    """
+
+    def __init__(self, rpm=None):
+        self.rpm = rpm
+        self.tokens = float(rpm) if rpm else 0.0
+        self.updated = time.monotonic()
+        self.paused_until = 0.0  # monotonic time before which nothing may be sent
+        self.consecutive_429s = 0
+
+    def _refill(self, now):
+        if self.rpm and now > self.updated:
+            self.tokens = min(float(self.rpm), self.tokens + (now - self.updated) * self.rpm / 60)
+        self.updated = max(self.updated, now)
+
+    def wait_time(self, now):
+        """Seconds before a request could be sent, without reserving"""
+        self._refill(now)
+        pause = max(0.0, self.paused_until - now)
+        debt = max(0.0, 1 - self.tokens) * 60 / self.rpm if self.rpm else 0.0
+        return max(pause, debt)
+
+    def reserve(self, now):
+        """Take a token; returns the seconds the caller must wait before sending"""
+        self._refill(now)
+        pause = max(0.0, self.paused_until - now)
+        if not self.rpm:
+            return pause
+        self.tokens -= 1
+        debt = max(0.0, -self.tokens) * 60 / self.rpm
+        return max(pause, debt)
+
+    def pause(self, now, seconds):
+        """Stop sending until `seconds` from now, with an empty bucket afterwards"""
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = min(self.tokens, 0.0)
+        self.updated = max(self.updated, self.paused_until)
+
+    def learn(self, limit, remaining):
+        """Adopt the server's view: limit requests/minute with `remaining` left"""
+        if limit:
+            self.rpm = limit
+        if remaining is not None and self.rpm:
+            self.tokens = min(self.tokens, float(remaining))
+
+
+class RateLimiter:
+    """Token buckets per provider and per (provider, model), learned from responses"""
+
+    def __init__(self, rpm_defaults=None):
+        self._rpm_defaults = dict(RATE_LIMIT_RPM if rpm_defaults is None else rpm_defaults)
+        self._providers = {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _provider_bucket(self, provider):
+        bucket = self._providers.get(provider)
+        if bucket is None:
+            bucket = self._providers[provider] = TokenBucket(self._rpm_defaults.get(provider))
+        return bucket
+
+    def reserve(self, provider, model=None):
+        """Reserve a request slot; returns seconds to wait before sending"""
+        now = time.monotonic()
+        with self._lock:
+            wait = self._provider_bucket(provider).reserve(now)
+            model_bucket = self._models.get((provider, model))
+            if model_bucket is not None:
+                wait = max(wait, model_bucket.reserve(now))
+        return wait
+
+    def wait_time(self, provider, model=None):
+        """Seconds before `provider` (and `model`) could be called, without reserving"""
+        now = time.monotonic()
+        with self._lock:
+            wait = self._provider_bucket(provider).wait_time(now)
+            model_bucket = self._models.get((provider, model))
+            if model_bucket is not None:
+                wait = max(wait, model_bucket.wait_time(now))
+        return wait
+
+    def observe(self, provider, model, status_code, headers):
+        """Learn from a response's status and rate-limit headers
+
+        Returns:
+            Seconds the provider asked us to pause (0 if it did not)
+        """
+        limit = remaining = None
+        try:
+            value = _first_header(headers, _LIMIT_HEADERS)
+            limit = int(float(value)) if value is not None else None
+            value = _first_header(headers, _REMAINING_HEADERS)
+            remaining = int(float(value)) if value is not None else None
+        except ValueError:
+            pass
+        reset = parse_reset(_first_header(headers, _RESET_HEADERS))
+        retry_after = parse_reset(headers.get("retry-after"))
+
+        now = time.monotonic()
+        with self._lock:
+            provider_bucket = self._provider_bucket(provider)
+            buckets = [provider_bucket]
+            if limit:
+                model_bucket = self._models.get((provider, model))
+                if model_bucket is None:
+                    model_bucket = self._models[(provider, model)] = TokenBucket()
+                model_bucket.learn(limit, remaining)
+                buckets.append(model_bucket)
+                if not provider_bucket.rpm or limit > provider_bucket.rpm:
+                    provider_bucket.learn(limit, None)
+            elif (provider, model) in self._models:
+                buckets.append(self._models[(provider, model)])
+
+            pause = 0.0
+            if status_code == 429:
+                provider_bucket.consecutive_429s += 1
+                fallback = RATE_LIMIT_DEFAULT_BACKOFF * 2 ** (provider_bucket.consecutive_429s - 1)
+                pause = retry_after if retry_after is not None else (reset if reset is not None else fallback)
+            elif status_code == 503 and retry_after is not None:
+                pause = retry_after
+            else:
+                provider_bucket.consecutive_429s = 0
+                if remaining == 0 and reset:
+                    pause = reset
+            if pause:
+                for bucket in buckets:
+                    bucket.pause(now, pause)
+        return pause
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """The process-wide RateLimiter shared by every provider call"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
@@ -0,0 +1,137 @@
+# retry_policy.py
+"""Retries for transient provider failures.
+
+A request is retried when it fails with a connection error, a timeout, a
+dropped or unfinished stream, or a transient status (RETRYABLE_STATUSES).
+Waits grow exponentially with full jitter, and both the number of attempts
+and the total time spent retrying are capped (RETRY_* in config.py).
+
+Retries are idempotency-aware: a request that may already have been acted on
+(a POST that reached the server, e.g. creating a Sora job) is only retried
+when it provably never got there (connect failures). Chat completions are
+side-effect free and are sent with idempotent=True.
+
+Streams are retried from scratch. Listeners registered with retry_listener()
+are told about each retry, so the GUI can show a "reconnecting" state and
+discard the partial text instead of committing a truncated turn.
+"""
+
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from config import (
+    RETRY_BASE_DELAY,
+    RETRY_BUDGET_SECONDS,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY,
+)
+from turn_metrics import note_retry
+
+# 529 is Anthropic's "overloaded"
+RETRYABLE_STATUSES = frozenset([408, 425, 500, 502, 503, 504, 529])
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+
+class StreamInterrupted(Exception):
+    """A stream failed, or ended before its end-of-stream marker"""
+
+
+def _class_names(exc):
+    return {cls.__name__ for cls in type(exc).__mro__}
+
+
+def is_transient_error(exc):
+    """True for failures that a fresh attempt may not hit (network, timeouts, cut streams)"""
+    if isinstance(exc, (StreamInterrupted, ConnectionError, TimeoutError)):
+        return True
+    # requests and httpx exceptions, matched by name so neither has to be imported here
+    return bool(_class_names(exc) & {
+        "ConnectionError", "Timeout", "ChunkedEncodingError",  # requests
+        "TransportError",  # httpx (connect/read/write errors, timeouts, protocol errors)
+        "APIConnectionError", "APITimeoutError",  # openai
+    })
+
+
+def request_never_sent(exc):
+    """True when the failure happened before the server could see the request"""
+    return bool(_class_names(exc) & {"ConnectTimeout", "ConnectError", "NewConnectionError"})
+
+
+class RetryPolicy:
+    """Attempt cap, total time budget and jittered exponential backoff
+
+    Args:
+        max_attempts: Total tries, including the first
+        base_delay: Upper bound of the first backoff, in seconds (doubles per retry)
+        max_delay: Upper bound of any single backoff
+        budget: Give up once this many seconds have passed since the first try
+    """
+
+    def __init__(self, max_attempts=RETRY_MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY,
+                 max_delay=RETRY_MAX_DELAY, budget=RETRY_BUDGET_SECONDS):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def delay(self, attempt):
+        """Full-jitter backoff before retry number `attempt` (1 for the first retry)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def backoff(self, attempt, started, error=None, status=None, idempotent=True):
+        """Seconds to wait before retrying, or None to give up
+
+        Args:
+            attempt: Attempts made so far (1 after the first failure)
+            started: time.monotonic() when the first attempt began
+            error: The exception that ended the attempt, if any
+            status: The HTTP status that ended the attempt, if any
+            idempotent: False if the server may have acted on the request already
+        """
+        if attempt >= self.max_attempts:
+            return None
+        if error is not None:
+            if not is_transient_error(error):
+                return None
+            if not idempotent and not request_never_sent(error):
+                return None
+        elif status is not None:
+            if status not in RETRYABLE_STATUSES or not idempotent:
+                return None
+        delay = self.delay(attempt)
+        if time.monotonic() - started + delay > self.budget:
+            return None
+        return delay
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+_retry_listener = contextvars.ContextVar("retry_listener", default=None)
+
+
+@contextmanager
+def retry_listener(callback):
+    """Call callback(attempt, reason) whenever a request made in this context is retried
+
+    Context-local, so it covers the calling thread and any asyncio tasks or
+    to_thread() calls started from it.
+    """
+    token = _retry_listener.set(callback)
+    try:
+        yield
+    finally:
+        _retry_listener.reset(token)
+
+
+def notify_retry(provider, attempt, delay, reason):
+    """Log a retry and tell the current listener (if any) that the request is reconnecting"""
+    print(f"{provider}: {reason}; retrying in {delay:.1f}s (attempt {attempt + 1})")
+    note_retry()
+    listener = _retry_listener.get()
+    if listener is not None:
+        try:
+            listener(attempt, reason)
+        except Exception as e:
+            print(f"Error in retry listener: {e}")
@@ -0,0 +1,154 @@
+# rolling_summary.py
+"""Rolling summary of a conversation's older turns.
+
+Once a conversation is longer than SUMMARY_KEEP_RECENT messages, the
+messages that have aged out of that recent tail are folded into a running
+summary by a summarizer (normally a cheap model, see
+conversation_engine.make_model_summarizer). The work runs on a background
+thread started at the beginning of a turn, so it overlaps with the AI that
+is speaking; each turn uses whatever summary is finished by then. One
+summary is kept per conversation and shared by every AI in it.
+
+A summarizer is any callable(previous_summary, messages) -> str, where
+messages are raw conversation messages; stub_summarizer needs no network,
+which makes the whole tier deterministic offline.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import SUMMARY_KEEP_RECENT, SUMMARY_MIN_BATCH
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between AIs (and sometimes a human).
+
+Summary so far:
+{previous_summary}
+
+New messages:
+{transcript}
+
+Rewrite the summary so it also covers the new messages. Keep who said what, the threads still open, recurring motifs and any ASCII art or images only by description. Reply with the summary only, at most 300 words."""
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Shared background pool for summary jobs (created on first use)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summary")
+        return _executor
+
+
+def _speaker(msg):
+    ai_name = msg.get("ai_name")
+    model = msg.get("model")
+    if ai_name and model:
+        return f"{ai_name} ({model})"
+    return ai_name or model or ("User" if msg.get("role") == "user" else msg.get("role", "unknown"))
+
+
+def format_transcript(messages):
+    """Plain-text '[speaker]: text' lines for the messages a summary should cover"""
+    lines = []
+    for msg in messages:
+        if not isinstance(msg, dict):
+            msg = {"role": "user", "content": str(msg)}
+        if msg.get("hidden") or msg.get("role") == "system" or msg.get("_type") == "branch_indicator":
+            continue
+        content = msg.get("content", "")
+        if isinstance(content, list):
+            parts = [part.get('text', '') if part.get('type') == 'text' else "[image]" for part in content]
+            content = " ".join(part for part in parts if part)
+        if str(content).strip():
+            lines.append(f"[{_speaker(msg)}]: {content}")
+    return "\n\n".join(lines)
+
+
+def stub_summarizer(previous_summary, messages):
+    """Offline summarizer: appends the first line of each message (no API call)"""
+    lines = [previous_summary] if previous_summary else []
+    for line in format_transcript(messages).split("\n\n"):
+        if line:
+            first_line = line.split("\n", 1)[0]
+            lines.append(first_line[:120])
+    return "\n".join(lines)
+
+
+class RollingSummary:
+    """Running summary of one conversation, refreshed in the background
+
+    `covered` counts the conversation messages the summary stands in for.
+    Edits to covered history are dropped with the whole summary by
+    ContextCache.invalidate(); as a cheap (O(1)) safety net, a conversation
+    that is shorter or whose last covered message was swapped out drops the
+    summary too, instead of using a stale one.
+    """
+
+    def __init__(self, summarizer, keep_recent=SUMMARY_KEEP_RECENT, min_batch=SUMMARY_MIN_BATCH):
+        self.summarizer = summarizer
+        self.keep_recent = keep_recent
+        self.min_batch = min_batch
+        self.text = ""
+        self.covered = 0
+        self._boundary = None  # Last covered message
+        self._generation = 0  # Bumped on reset so in-flight jobs are discarded
+        self._future = None
+        self._lock = threading.Lock()
+
+    def _reset(self):
+        self.text = ""
+        self.covered = 0
+        self._boundary = None
+        self._generation += 1
+        self._future = None
+
+    def current(self, conversation):
+        """Returns (summary_text, covered) usable for `conversation`, or ("", 0)"""
+        with self._lock:
+            if self.covered and (self.covered > len(conversation) or conversation[self.covered - 1] is not self._boundary):
+                print("Conversation history changed - discarding its rolling summary")
+                self._reset()
+            return self.text, self.covered
+
+    def refresh(self, conversation):
+        """Start folding messages older than the recent tail into the summary
+
+        Does nothing while a job is running or until at least min_batch
+        messages have aged out since the last refresh.
+        """
+        with self._lock:
+            if self._future is not None and not self._future.done():
+                return
+            target = len(conversation) - self.keep_recent
+            if target - self.covered < self.min_batch:
+                return
+            batch = list(conversation[self.covered:target])
+            self._future = _get_executor().submit(
+                self._summarize, self._generation, self.text, batch, conversation[target - 1], target
+            )
+
+    def wait(self, timeout=None):
+        """Block until the running refresh (if any) finishes"""
+        future = self._future
+        if future is not None:
+            future.result(timeout)
+
+    def _summarize(self, generation, previous_summary, batch, boundary, covered):
+        try:
+            text = self.summarizer(previous_summary, batch)
+        except Exception as e:
+            print(f"Rolling summary failed, keeping the previous one: {e}")
+            return
+        if not text or not str(text).strip():
+            print("Rolling summary came back empty, keeping the previous one")
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.text = str(text).strip()
+            self.covered = covered
+            self._boundary = boundary
+        print(f"Rolling summary now covers {covered} messages ({len(self.text)} chars)")
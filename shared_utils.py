@@ -2,55 +2,381 @@
 
 import requests
 import logging
-import replicate
-import openai
+import socket
+import threading
 import time
 import json
 import os
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
-from anthropic import Anthropic
 import base64
-from together import Together
-from openai import OpenAI
 import re
-import google.generativeai as genai
-try:
-    from bs4 import BeautifulSoup
-except ImportError:
-    print("BeautifulSoup not found. Please install it with 'pip install beautifulsoup4'")
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from sse import iter_sse_json
+from providers import get_client
+from rate_limiter import get_rate_limiter
+from retry_policy import DEFAULT_POLICY, IDEMPOTENT_METHODS, StreamInterrupted, notify_retry
+from cancellation import Cancelled
+from turn_metrics import note_connect, note_retry, note_usage
+from ttft_stats import note_request_sent
+from cassette import check_uncaptured, wrap_adapter
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Anthropic client with API key
-anthropic = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+# Provider SDK clients (Anthropic, OpenAI, Gemini, Replicate) are imported and
+# built on first use through providers.get_client(), not at import time
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Provider endpoints (overridable so calls can be pointed at a local mock server)
+ANTHROPIC_BASE_URL = os.getenv('ANTHROPIC_BASE_URL', 'https://api.anthropic.com')
+OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
+TOGETHER_BASE_URL = os.getenv('TOGETHER_BASE_URL', 'https://api.together.xyz/v1')
 
-# Initialize Google Gemini
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+# -------------------- HTTP Connection Pooling --------------------
+# One requests.Session (and therefore one urllib3 keep-alive pool) per
+# (provider, host) pair, shared by every thread. Reusing the pooled
+# connection skips the TCP+TLS handshake on every turn after the first.
+_http_sessions = {}
+_http_metrics = {}
+_http_lock = threading.Lock()
+_claude_cache_usage = {"requests": 0, "input_tokens": 0, "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+
+class _PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies custom socket options to its pool manager"""
+
+    def __init__(self, socket_options, **kwargs):
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+def _new_http_session():
+    """Create a session with a sized connection pool and keep-alive settings"""
+    from config import HTTP_POOL_SIZE, HTTP_KEEP_ALIVE
+
+    session = requests.Session()
+    if HTTP_KEEP_ALIVE:
+        # Ask the OS to keep idle pooled sockets alive between turns
+        socket_options = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    else:
+        socket_options = HTTPConnection.default_socket_options
+        session.headers["Connection"] = "close"
+    adapter = _PooledHTTPAdapter(socket_options, pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+    # Recording or replaying a cassette swaps in its own adapter (see cassette.py)
+    adapter = wrap_adapter(adapter)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_http_session(provider, url):
+    """Return the shared keep-alive session for this provider's host (thread-safe)"""
+    parts = urlsplit(url)
+    key = (provider, parts.scheme, parts.netloc)
+    with _http_lock:
+        session = _http_sessions.get(key)
+        if session is None:
+            session = _new_http_session()
+            _http_sessions[key] = session
+            _http_metrics.setdefault(provider, {"requests": 0, "errors": 0, "rate_limited": 0})
+        return session
+
+def http_request(provider, method, url, rate_limited=True, idempotent=None, retry_policy=DEFAULT_POLICY,
+                 cancel_token=None, **kwargs):
+    """Send a request through the pooled session for `provider`, recording metrics
+
+    Provider API calls wait for a slot from the shared rate limiter first, and
+    a 429 is waited out and resent (up to RATE_LIMIT_MAX_RETRIES times) rather
+    than returned; pass rate_limited=False for plain downloads (e.g. images).
+
+    Connection errors, timeouts and transient statuses are retried under
+    retry_policy (None disables this). Only idempotent requests are resent once
+    the server may have seen them: GET and friends by default, and any POST
+    passed with idempotent=True (e.g. chat completions). A cancelled
+    cancel_token stops further attempts, retry waits and rate-limit waits with
+    Cancelled.
+    """
+    from config import RATE_LIMIT_MAX_RETRIES
+
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    session = get_http_session(provider, url)
+    body = kwargs.get("json")
+    model = body.get("model") if isinstance(body, dict) else None
+    limiter = get_rate_limiter()
+    started = time.monotonic()
+    failures = rate_limit_waits = 0
+    while True:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        if rate_limited:
+            # Also waits out the Retry-After of a 429 answered below
+            wait_for_rate_limit(provider, model, cancel_token)
+        try:
+            note_request_sent()
+            response = session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            with _http_lock:
+                _http_metrics[provider]["requests"] += 1
+                _http_metrics[provider]["errors"] += 1
+            failures += 1
+            delay = retry_policy.backoff(failures, started, error=e, idempotent=idempotent) if retry_policy else None
+            if delay is None:
+                raise
+            notify_retry(provider, failures, delay, type(e).__name__)
+            _sleep(delay, cancel_token)
+            continue
+        with _http_lock:
+            _http_metrics[provider]["requests"] += 1
+            if response.status_code >= 400:
+                _http_metrics[provider]["errors"] += 1
+        # Request sent -> response headers parsed
+        note_connect(response.elapsed.total_seconds())
+        if rate_limited:
+            limiter.observe(provider, model, response.status_code, response.headers)
+            if response.status_code == 429 and rate_limit_waits < RATE_LIMIT_MAX_RETRIES:
+                # The request was rejected before any work was done, so resending it is safe
+                rate_limit_waits += 1
+                response.close()
+                with _http_lock:
+                    _http_metrics[provider]["rate_limited"] += 1
+                note_retry()
+                continue
+        if response.status_code < 400 or retry_policy is None:
+            return response
+        failures += 1
+        delay = retry_policy.backoff(failures, started, status=response.status_code, idempotent=idempotent)
+        if delay is None:
+            return response
+        response.close()
+        notify_retry(provider, failures, delay, f"HTTP {response.status_code}")
+        _sleep(delay, cancel_token)
+
+def stream_with_retry(provider, send, read, stream_callback, retry_policy=DEFAULT_POLICY, cancel_token=None):
+    """Send a streaming request and read it to the end, restarting dropped streams
 
-def call_claude_api(prompt, messages, model_id, system_prompt=None, stream_callback=None):
-    """Call the Claude API with the given messages and prompt
-    
     Args:
-        stream_callback: Optional function(chunk: str) to call with each streaming token
+        send: Function returning a streaming response (e.g. via http_request)
+        read: Function(response, emit) that passes each text chunk to emit and
+            returns True once the stream's end-of-stream marker was seen
+        stream_callback: Function(chunk: str) receiving text as it arrives
+        cancel_token: Optional CancellationToken; cancelling closes the open
+            response and raises Cancelled here instead of retrying
+
+    Returns:
+        (response, text): text is None when the response status was not 200
+        (the caller reports that error). A stream that breaks or ends early is
+        sent again from scratch, and retry listeners are told so the partial
+        text can be discarded; once retries are exhausted StreamInterrupted is
+        raised rather than returning truncated text.
     """
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        return "Error: ANTHROPIC_API_KEY not found in environment variables"
+    started = time.monotonic()
+    failures = 0
+    while True:
+        response = send()
+        if response.status_code != 200:
+            return response, None
+        chunks = []
+
+        def emit(text):
+            if cancel_token is not None and cancel_token.cancelled:
+                raise Cancelled("cancelled")
+            chunks.append(text)
+            stream_callback(text)
+
+        # Cancelling from another thread shuts the socket down, waking up the blocked read
+        unregister = cancel_token.on_cancel(lambda: _abort_response(response)) if cancel_token is not None else None
+        try:
+            if read(response, emit):
+                return response, ''.join(chunks)
+            error = StreamInterrupted(f"stream ended after {len(chunks)} chunks without an end-of-stream marker")
+        except Exception as e:
+            if cancel_token is not None and cancel_token.cancelled:
+                raise Cancelled("cancelled") from e
+            if not isinstance(e, (requests.exceptions.RequestException, StreamInterrupted)):
+                raise
+            error = e
+        finally:
+            if unregister is not None:
+                unregister()
+            response.close()
+        failures += 1
+        delay = retry_policy.backoff(failures, started, error=error) if retry_policy else None
+        if delay is None:
+            raise StreamInterrupted(f"{provider} stream failed after {failures} attempt(s): {error}")
+        notify_retry(provider, failures, delay, f"stream interrupted ({error})")
+        _sleep(delay, cancel_token)
+
+def _abort_response(response):
+    """Wake up a thread blocked reading `response` (a requests response or an
+    OpenAI SDK stream) by shutting its socket down
+
+    Closing the response from another thread would wait for the blocked read
+    to finish; shutdown() makes that read return at once. The reading thread
+    then closes the response itself.
+    """
+    sock = None
+    raw = getattr(response, "raw", None)
+    if hasattr(raw, "abort"):
+        # A replayed response (cassette.py) has no socket
+        raw.abort()
+        return
+    if raw is not None:
+        # requests/urllib3
+        sock = getattr(getattr(raw, "_connection", None), "sock", None)
+        if sock is None:
+            try:
+                sock = raw._fp.fp.raw._sock
+            except AttributeError:
+                pass
+    else:
+        # OpenAI SDK Stream wrapping an httpx response
+        http_response = getattr(response, "response", response)
+        if hasattr(http_response.stream, "abort"):
+            # Replayed from a cassette (cassette_httpx.py)
+            http_response.stream.abort()
+            return
+        network_stream = http_response.extensions.get("network_stream")
+        if network_stream is not None:
+            sock = network_stream.get_extra_info("socket")
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+def _sleep(seconds, cancel_token=None):
+    """time.sleep that wakes up early (raising Cancelled) if cancel_token is cancelled"""
+    if cancel_token is None:
+        time.sleep(seconds)
+    elif cancel_token.wait(seconds):
+        raise Cancelled("cancelled")
+
+def wait_for_rate_limit(provider, model=None, cancel_token=None):
+    """Block until the shared rate limiter has a slot for `provider`/`model`
+
+    http_request() does this itself; SDK-based calls (OpenAI, Gemini) call it directly.
+
+    Args:
+        cancel_token: Optional CancellationToken; cancelling it ends the wait
+            (e.g. a long Retry-After pause) with Cancelled
+    """
+    wait = get_rate_limiter().reserve(provider, model)
+    if wait > 0:
+        if wait >= 1:
+            print(f"Rate limit: waiting {wait:.1f}s before calling {provider}" + (f" ({model})" if model else ""))
+        _sleep(wait, cancel_token)
+
+def get_provider_backoff(provider):
+    """Seconds before `provider` may be called again under its rate limits (0 if now)"""
+    return get_rate_limiter().wait_time(provider)
+
+def get_connection_metrics():
+    """Return per-provider counters: requests, errors, connections opened and reused"""
+    with _http_lock:
+        sessions = list(_http_sessions.items())
+        metrics = {provider: dict(counts, connections_opened=0, hosts=[])
+                   for provider, counts in _http_metrics.items()}
+
+    for (provider, scheme, netloc), session in sessions:
+        stats = metrics[provider]
+        stats["hosts"].append(netloc)
+        adapter = session.get_adapter(f"{scheme}://{netloc}")
+        pools = getattr(getattr(adapter, "poolmanager", None), "pools", {})  # Replayed sessions have no pool
+        for pool_key in pools.keys():
+            stats["connections_opened"] += pools[pool_key].num_connections
+
+    for stats in metrics.values():
+        stats["connections_reused"] = max(0, stats["requests"] - stats["connections_opened"])
+    return metrics
+
+def close_http_sessions():
+    """Close every pooled session (e.g. on shutdown)"""
+    with _http_lock:
+        sessions = list(_http_sessions.values())
+        _http_sessions.clear()
+    for session in sessions:
+        session.close()
+
+def _finish_stream(response):
+    """Drain bytes left after the end-of-stream marker so the pooled connection is reused"""
+    try:
+        for _ in response.iter_content(chunk_size=8192):
+            pass
+    except requests.exceptions.StreamConsumedError:
+        pass  # The body ended without a marker and was already read to the end
+    finally:
+        response.close()
+
+def _cache_breakpoint(msg):
+    """Copy of a message with its last content block marked as a prompt-cache breakpoint"""
+    content = msg.get("content", "")
+    if isinstance(content, list) and content:
+        blocks = list(content)
+        blocks[-1] = dict(blocks[-1], cache_control={"type": "ephemeral"})
+    else:
+        blocks = [{"type": "text", "text": str(content), "cache_control": {"type": "ephemeral"}}]
+    return dict(msg, content=blocks)
+
+def add_claude_cache_breakpoints(payload):
+    """Mark the stable prefix of a Claude request as cacheable
     
-    url = "https://api.anthropic.com/v1/messages"
+    Breakpoints go on the system prompt, on the final message (so the next
+    turn, whose history starts with this whole request, reads it back) and
+    on a rolling boundary every CLAUDE_CACHE_BOUNDARY_STEP messages, which
+    stays put across several turns in case more than the API's 20-block
+    lookback was added since the last write. The passed-in message dicts
+    are never modified.
+    """
+    from config import CLAUDE_CACHE_BOUNDARY_STEP
+    
+    if isinstance(payload.get("system"), str):
+        payload["system"] = [{"type": "text", "text": payload["system"], "cache_control": {"type": "ephemeral"}}]
+    
+    messages = list(payload["messages"])
+    if messages:
+        last = len(messages) - 1
+        boundary = (last // CLAUDE_CACHE_BOUNDARY_STEP) * CLAUDE_CACHE_BOUNDARY_STEP - 1
+        for index in (boundary, last):
+            if index >= 0:
+                messages[index] = _cache_breakpoint(messages[index])
+    payload["messages"] = messages
+    return payload
+
+def record_claude_usage(usage):
+    """Add a Claude response's usage block to the prompt-cache counters (and the turn's metrics)"""
+    if not usage:
+        return
+    note_usage(input_tokens=sum(usage.get(key) or 0 for key in
+                                ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")))
+    with _http_lock:
+        _claude_cache_usage["requests"] += 1
+        for key in ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+            _claude_cache_usage[key] += usage.get(key) or 0
+    print(f"Claude prompt cache: {usage.get('cache_read_input_tokens') or 0} tokens read, "
+          f"{usage.get('cache_creation_input_tokens') or 0} written, {usage.get('input_tokens') or 0} uncached")
+
+def get_claude_cache_usage():
+    """Totals of Claude input tokens: uncached, written to and read from the prompt cache"""
+    with _http_lock:
+        return dict(_claude_cache_usage)
+
+def build_claude_payload(prompt, messages, model_id, system_prompt=None, stream=False):
+    """Build the Anthropic Messages API payload (shared by the sync and async clients)"""
+    from config import CLAUDE_PROMPT_CACHING
     
     # Ensure we have a system prompt
     payload = {
         "model": model_id,
         "max_tokens": 4000,
         "temperature": 1,
-        "stream": stream_callback is not None  # Enable streaming if callback provided
+        "stream": stream  # Enable streaming if callback provided
     }
     
     # Set system if provided
@@ -58,37 +384,8 @@ def call_claude_api(prompt, messages, model_id, system_prompt=None, stream_callb
         payload["system"] = system_prompt
         print(f"CLAUDE API USING SYSTEM PROMPT: {system_prompt}")
     
-    # Clean messages to remove duplicates
-    filtered_messages = []
-    seen_contents = set()
-    
-    for msg in messages:
-        # Skip system messages (handled separately)
-        if msg.get("role") == "system":
-            continue
-            
-        # Get content - handle both string and list formats
-        content = msg.get("content", "")
-        
-        # For duplicate detection, use a hashable representation (always a string)
-        if isinstance(content, list):
-            # For image messages, create a hash based on text content only
-            text_parts = [part.get('text', '') for part in content if part.get('type') == 'text']
-            content_hash = ''.join(text_parts)
-        elif isinstance(content, str):
-            content_hash = content
-        else:
-            # For any other type, convert to string
-            content_hash = str(content) if content else ""
-            
-        # Check for duplicates
-        if content_hash and content_hash in seen_contents:
-            print(f"Skipping duplicate message in API call: {str(content_hash)[:30]}...")
-            continue
-            
-        if content_hash:
-            seen_contents.add(content_hash)
-        filtered_messages.append(msg)
+    # Duplicates were already dropped in prepare_turn; only system messages go here
+    filtered_messages = [msg for msg in messages if msg.get("role") != "system"]
     
     # Add the current prompt as the final user message (if it's not already an image message)
     if prompt and not any(isinstance(msg.get("content"), list) for msg in filtered_messages[-1:]):
@@ -100,6 +397,48 @@ def call_claude_api(prompt, messages, model_id, system_prompt=None, stream_callb
     # Add filtered messages to payload
     payload["messages"] = filtered_messages
     
+    if CLAUDE_PROMPT_CACHING:
+        add_claude_cache_breakpoints(payload)
+    return payload
+
+def _read_claude_stream(response, emit):
+    """Pass text deltas from a Claude SSE stream to emit; True once message_stop arrives"""
+    for chunk_data in iter_sse_json(response.iter_content(chunk_size=None)):
+        # Handle different event types from Claude's SSE stream
+        event_type = chunk_data.get('type')
+        if event_type == 'message_start':
+            record_claude_usage(chunk_data.get('message', {}).get('usage'))
+        elif event_type == 'message_delta':
+            note_usage(output_tokens=chunk_data.get('usage', {}).get('output_tokens'))
+        elif event_type == 'content_block_delta':
+            delta = chunk_data.get('delta', {})
+            if delta.get('type') == 'text_delta':
+                text = delta.get('text', '')
+                if text:
+                    emit(text)
+        elif event_type == 'message_stop':
+            return True
+        elif event_type == 'error':
+            # Mid-stream errors (e.g. overloaded_error) arrive as an event after a 200
+            error = chunk_data.get('error', {})
+            raise StreamInterrupted(f"{error.get('type', 'error')}: {error.get('message', '')}")
+    return False
+
+def call_claude_api(prompt, messages, model_id, system_prompt=None, stream_callback=None, cancel_token=None):
+    """Call the Claude API with the given messages and prompt
+    
+    Args:
+        stream_callback: Optional function(chunk: str) to call with each streaming token
+        cancel_token: Optional CancellationToken that aborts a stream in flight
+    """
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        return "Error: ANTHROPIC_API_KEY not found in environment variables"
+    
+    url = f"{ANTHROPIC_BASE_URL}/v1/messages"
+    
+    payload = build_claude_payload(prompt, messages, model_id, system_prompt, stream=stream_callback is not None)
+    
     # Actual API call
     headers = {
         "Content-Type": "application/json",
@@ -111,41 +450,27 @@ def call_claude_api(prompt, messages, model_id, system_prompt=None, stream_callb
         if stream_callback:
             # Streaming mode using REST API directly
             payload["stream"] = True
-            full_response = ""
-            
-            response = requests.post(url, json=payload, headers=headers, stream=True)
+            response, full_response = stream_with_retry(
+                "anthropic",
+                lambda: http_request("anthropic", "POST", url, json=payload, headers=headers, stream=True,
+                                     idempotent=True, cancel_token=cancel_token),
+                _read_claude_stream,
+                stream_callback,
+                cancel_token=cancel_token
+            )
             
-            if response.status_code == 200:
-                for line in response.iter_lines():
-                    if line:
-                        line_text = line.decode('utf-8')
-                        if line_text.startswith('data: '):
-                            json_str = line_text[6:]  # Remove 'data: ' prefix
-                            # Skip if this is a ping or message_stop event
-                            if json_str.strip() in ['[DONE]', '']:
-                                continue
-                            try:
-                                chunk_data = json.loads(json_str)
-                                # Handle different event types from Claude's SSE stream
-                                event_type = chunk_data.get('type')
-                                
-                                if event_type == 'content_block_delta':
-                                    delta = chunk_data.get('delta', {})
-                                    if delta.get('type') == 'text_delta':
-                                        text = delta.get('text', '')
-                                        if text:
-                                            full_response += text
-                                            stream_callback(text)
-                            except json.JSONDecodeError:
-                                continue
+            if full_response is not None:
                 return full_response
             else:
                 return f"Error: API returned status {response.status_code}: {response.text}"
         else:
             # Non-streaming mode (original behavior)
-            response = requests.post(url, json=payload, headers=headers)
+            response = http_request("anthropic", "POST", url, json=payload, headers=headers, idempotent=True,
+                                    cancel_token=cancel_token)
             response.raise_for_status()
             data = response.json()
+            record_claude_usage(data.get('usage'))
+            note_usage(output_tokens=(data.get('usage') or {}).get('output_tokens'))
             if 'content' in data and len(data['content']) > 0:
                 for content_item in data['content']:
                     if content_item.get('type') == 'text':
@@ -153,6 +478,8 @@ def call_claude_api(prompt, messages, model_id, system_prompt=None, stream_callb
                 # Fallback if no text type content is found
                 return str(data['content'])
             return "No content in response"
+    except (Cancelled, StreamInterrupted):
+        raise
     except Exception as e:
         return f"Error calling Claude API: {str(e)}"
 
@@ -172,7 +499,7 @@ def call_llama_api(prompt, conversation_history, model, system_prompt):
     try:
         # Stream the output and collect it piece by piece
         response_chunks = []
-        for chunk in replicate.run(
+        for chunk in get_client("replicate").run(
             model,
             input={
                 "prompt": formatted_history,
@@ -196,48 +523,159 @@ def call_llama_api(prompt, conversation_history, model, system_prompt):
         print(f"Error calling LLaMA API: {e}")
         return None
 
-def call_openai_api(prompt, conversation_history, model, system_prompt, stream_callback=None):
+def build_openai_messages(prompt, conversation_history, system_prompt):
+    """Format the chat-completions message list sent to OpenAI"""
+    messages = []
+
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+
+    for msg in conversation_history:
+        messages.append({"role": msg["role"], "content": msg["content"]})
+
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+def call_openai_api(prompt, conversation_history, model, system_prompt, stream_callback=None, cancel_token=None):
     """Call the OpenAI API directly for GPT models.
 
     Args:
         stream_callback: Optional function(chunk: str) to call with each streaming token
+        cancel_token: Optional CancellationToken that aborts a stream in flight
     """
     try:
-        messages = []
+        messages = build_openai_messages(prompt, conversation_history, system_prompt)
 
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-
-        for msg in conversation_history:
-            messages.append({"role": msg["role"], "content": msg["content"]})
-
-        messages.append({"role": "user", "content": prompt})
-
-        # GPT-5 and reasoning models use max_completion_tokens instead of max_tokens
-        response = openai_client.chat.completions.create(
-            model=model,
-            messages=messages,
-            max_completion_tokens=4000,
-            stream=True
-        )
+        # The SDK retries failed requests itself; a stream that drops partway is restarted here
+        started = time.monotonic()
+        failures = 0
+        while True:
+            # GPT-5 and reasoning models use max_completion_tokens instead of max_tokens
+            wait_for_rate_limit("openai", model, cancel_token)
+            note_request_sent()
+            sent = time.monotonic()
+            raw_response = get_client("openai").chat.completions.with_raw_response.create(
+                model=model,
+                messages=messages,
+                max_completion_tokens=4000,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            note_connect(time.monotonic() - sent)
+            get_rate_limiter().observe("openai", model, raw_response.status_code, raw_response.headers)
+            response = raw_response.parse()
 
-        collected_messages = []
-        for chunk in response:
-            if chunk.choices[0].delta.content is not None:
-                token = chunk.choices[0].delta.content
-                collected_messages.append(token)
-                if stream_callback:
-                    stream_callback(token)
+            collected_messages = []
+            unregister = cancel_token.on_cancel(lambda: _abort_response(response)) if cancel_token is not None else None
+            try:
+                for chunk in response:
+                    if chunk.usage:
+                        # Sent last, with no choices, because of include_usage
+                        note_usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+                    if chunk.choices and chunk.choices[0].delta.content is not None:
+                        token = chunk.choices[0].delta.content
+                        collected_messages.append(token)
+                        if stream_callback:
+                            stream_callback(token)
+                break
+            except Exception as e:
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise Cancelled("cancelled") from e
+                failures += 1
+                delay = DEFAULT_POLICY.backoff(failures, started, error=e)
+                if delay is None:
+                    raise StreamInterrupted(f"openai stream failed after {failures} attempt(s): {e}") from e
+                notify_retry("openai", failures, delay, f"stream interrupted ({e})")
+                _sleep(delay, cancel_token)
+            finally:
+                if unregister is not None:
+                    unregister()
 
         full_reply = ''.join(collected_messages)
         return full_reply
 
+    except (Cancelled, StreamInterrupted):
+        raise
     except Exception as e:
+        # SDK errors (e.g. a 429 that outlasted the SDK's own retries) still teach the limiter
+        error_response = getattr(e, "response", None)
+        if error_response is not None:
+            get_rate_limiter().observe("openai", model, error_response.status_code, error_response.headers)
         print(f"Error calling OpenAI API: {e}")
         return None
 
 
-def call_gemini_api(prompt, conversation_history, model, system_prompt, stream_callback=None):
+GEMINI_GENERATION_CONFIG = {
+    "temperature": 1.0,
+    "max_output_tokens": 8192,
+}
+
+def build_gemini_history(conversation_history):
+    """Convert chat messages into Gemini user/model history entries
+    
+    System messages are skipped; the system prompt goes in system_instruction.
+    """
+    history = []
+    for msg in conversation_history:
+        if msg.get("role") == "system":
+            continue
+        role = "user" if msg["role"] == "user" else "model"
+        history.append({"role": role, "parts": [msg["content"]]})
+    return history
+
+# GenerativeModel objects and converted chat histories, reused across turns
+_GEMINI_CACHE_SIZE = 32  # Entries kept in each cache (least recently used are dropped)
+_gemini_models = OrderedDict()  # (model, system_instruction, generation_config) -> GenerativeModel
+_gemini_histories = OrderedDict()  # (model, system_instruction) -> (source messages, Contents)
+_gemini_lock = threading.Lock()
+
+def _lru_put(cache, key, value):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > _GEMINI_CACHE_SIZE:
+        cache.popitem(last=False)
+
+def get_gemini_model(model, system_prompt, generation_config=GEMINI_GENERATION_CONFIG):
+    """Return a cached GenerativeModel for this model, system instruction and config"""
+    key = (model, system_prompt or None, tuple(sorted(generation_config.items())))
+    with _gemini_lock:
+        gemini_model = _gemini_models.get(key)
+        if gemini_model is None:
+            gemini_model = get_client("gemini").GenerativeModel(
+                model_name=model,
+                generation_config=generation_config,
+                system_instruction=system_prompt if system_prompt else None
+            )
+            _lru_put(_gemini_models, key, gemini_model)
+        else:
+            _gemini_models.move_to_end(key)
+        return gemini_model
+
+def get_gemini_history(model, system_prompt, conversation_history):
+    """Gemini Content history for conversation_history, converting only new messages
+    
+    Each AI's turn context hands over the same message dicts every turn plus
+    the new ones, so the cached history for (model, system prompt) is
+    extended in place when its messages are still the start of the new
+    history (checked by identity); otherwise it is rebuilt.
+    """
+    from google.generativeai.types.content_types import strict_to_content
+    
+    messages = [msg for msg in conversation_history if msg.get("role") != "system"]
+    key = (model, system_prompt or None)
+    with _gemini_lock:
+        sources, contents = _gemini_histories.get(key, ([], []))
+        count = len(sources)
+        reusable = count <= len(messages) and (count == 0 or (messages[0] is sources[0] and messages[count - 1] is sources[-1]))
+        if not reusable:
+            sources, contents, count = [], [], 0
+        for entry in build_gemini_history(messages[count:]):
+            contents.append(strict_to_content(entry))
+        sources.extend(messages[count:])
+        _lru_put(_gemini_histories, key, (sources, contents))
+        return list(contents)
+
+def call_gemini_api(prompt, conversation_history, model, system_prompt, stream_callback=None, cancel_token=None):
     """Call the Google Gemini API directly.
 
     Args:
@@ -246,53 +684,111 @@ def call_gemini_api(prompt, conversation_history, model, system_prompt, stream_c
         model: Model ID (e.g., 'gemini-2.0-flash', 'gemini-1.5-pro')
         system_prompt: System instruction for the model
         stream_callback: Optional function(chunk: str) to call with each streaming token
+        cancel_token: Optional CancellationToken; cancelling it cancels the stream in flight
     """
+    check_uncaptured("Gemini SDK")  # Never goes out live while replaying a cassette
+    unregister = None
     try:
-        # Create the model with system instruction
-        generation_config = {
-            "temperature": 1.0,
-            "max_output_tokens": 8192,
-        }
+        # Reuse the model object and the already-converted history from earlier turns
+        gemini_model = get_gemini_model(model, system_prompt)
+        history = get_gemini_history(model, system_prompt, conversation_history)
 
-        gemini_model = genai.GenerativeModel(
-            model_name=model,
-            generation_config=generation_config,
-            system_instruction=system_prompt if system_prompt else None
-        )
-
-        # Build conversation history for Gemini
-        history = []
-        for msg in conversation_history:
-            role = "user" if msg["role"] == "user" else "model"
-            history.append({"role": role, "parts": [msg["content"]]})
-
-        # Start chat with history
+        # Start chat with history (the SDK exposes no rate-limit headers, so only the configured rate applies)
         chat = gemini_model.start_chat(history=history)
+        wait_for_rate_limit("google", model, cancel_token)
 
         # Generate response with streaming
+        note_request_sent()
+        sent = time.monotonic()
         response = chat.send_message(prompt, stream=True)
+        note_connect(time.monotonic() - sent)
 
+        # Cancelling from another thread cancels the stream, waking up the blocked read
+        if cancel_token is not None:
+            unregister = cancel_token.on_cancel(lambda: _cancel_gemini_stream(response))
         collected_chunks = []
         for chunk in response:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            note_gemini_usage(chunk)
             if chunk.text:
                 collected_chunks.append(chunk.text)
                 if stream_callback:
                     stream_callback(chunk.text)
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
 
         full_reply = ''.join(collected_chunks)
         return full_reply
 
+    except Cancelled:
+        raise
     except Exception as e:
+        if cancel_token is not None and cancel_token.cancelled:
+            raise Cancelled("cancelled") from e
+        if type(e).__name__ == "ResourceExhausted":  # google.api_core's 429
+            get_rate_limiter().observe("google", model, 429, {})
         print(f"Error calling Gemini API: {e}")
         import traceback
         traceback.print_exc()
         return None
+    finally:
+        if unregister is not None:
+            unregister()
+
+def _cancel_gemini_stream(response):
+    """Stop a streaming Gemini response from another thread
+
+    The SDK response wraps the transport's stream iterator: a gRPC call
+    (cancel() ends it) or, with transport="rest", a requests response whose
+    socket _abort_response shuts down.
+    """
+    stream = getattr(response, "_iterator", None)
+    http_response = getattr(stream, "_response", None)
+    if http_response is not None:
+        _abort_response(http_response)
+    elif hasattr(stream, "cancel"):
+        stream.cancel()
+
+def note_gemini_usage(chunk):
+    """Pass a Gemini chunk's usage_metadata (running totals) to the turn's metrics"""
+    usage = getattr(chunk, "usage_metadata", None)
+    if usage:
+        note_usage(getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None))
+
+def note_chat_usage(data):
+    """Pass the usage block of an OpenAI-style response or stream chunk to the turn's metrics"""
+    usage = data.get('usage')
+    if usage:
+        note_usage(usage.get('prompt_tokens'), usage.get('completion_tokens'))
 
-def call_openrouter_api(prompt, conversation_history, model, system_prompt, stream_callback=None):
+def _read_chat_completions_stream(response, emit):
+    """Pass content deltas from an OpenAI-style SSE stream to emit; True once a
+    choice reports its finish_reason"""
+    finished = False
+    for chunk_data in iter_sse_json(response.iter_content(chunk_size=None)):
+        if 'error' in chunk_data:
+            # OpenRouter reports upstream failures mid-stream as an error payload
+            raise StreamInterrupted(str(chunk_data['error'].get('message', chunk_data['error'])))
+        note_chat_usage(chunk_data)
+        if 'choices' in chunk_data and len(chunk_data['choices']) > 0:
+            choice = chunk_data['choices'][0]
+            content = choice.get('delta', {}).get('content', '')
+            if content:
+                emit(content)
+            if choice.get('finish_reason') == 'error':
+                raise StreamInterrupted("upstream provider error")
+            if choice.get('finish_reason'):
+                finished = True
+    _finish_stream(response)
+    return finished
+
+def call_openrouter_api(prompt, conversation_history, model, system_prompt, stream_callback=None, cancel_token=None):
     """Call the OpenRouter API to access various LLM models.
     
     Args:
         stream_callback: Optional function(chunk: str) to call with each streaming token
+        cancel_token: Optional CancellationToken that aborts a stream in flight
     """
     try:
         headers = {
@@ -302,19 +798,7 @@ def call_openrouter_api(prompt, conversation_history, model, system_prompt, stre
             "X-Title": "AI Conversation"  # Adding title for OpenRouter tracking
         }
         
-        # Format messages
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-            
-        for msg in conversation_history:
-            if msg["role"] != "system":  # Skip system prompts
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
-        
-        messages.append({"role": "user", "content": prompt})
+        messages = build_openrouter_messages(prompt, conversation_history, system_prompt)
         
         payload = {
             "model": model,  # Using the exact model name from config
@@ -330,35 +814,25 @@ def call_openrouter_api(prompt, conversation_history, model, system_prompt, stre
         
         if stream_callback:
             # Streaming mode
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=180,
-                stream=True
+            response, full_response = stream_with_retry(
+                "openrouter",
+                lambda: http_request(
+                    "openrouter", "POST", f"{OPENROUTER_BASE_URL}/chat/completions",
+                    headers=headers,
+                    json=payload,
+                    timeout=180,
+                    stream=True,
+                    idempotent=True,
+                    cancel_token=cancel_token
+                ),
+                _read_chat_completions_stream,
+                stream_callback,
+                cancel_token=cancel_token
             )
             
             print(f"Response status: {response.status_code}")
             
-            if response.status_code == 200:
-                full_response = ""
-                for line in response.iter_lines():
-                    if line:
-                        line_text = line.decode('utf-8')
-                        if line_text.startswith('data: '):
-                            json_str = line_text[6:]  # Remove 'data: ' prefix
-                            if json_str.strip() == '[DONE]':
-                                break
-                            try:
-                                chunk_data = json.loads(json_str)
-                                if 'choices' in chunk_data and len(chunk_data['choices']) > 0:
-                                    delta = chunk_data['choices'][0].get('delta', {})
-                                    content = delta.get('content', '')
-                                    if content:
-                                        full_response += content
-                                        stream_callback(content)
-                            except json.JSONDecodeError:
-                                continue
+            if full_response is not None:
                 return full_response
             else:
                 error_msg = f"OpenRouter API error {response.status_code}: {response.text}"
@@ -366,11 +840,13 @@ def call_openrouter_api(prompt, conversation_history, model, system_prompt, stre
                 return f"Error: {error_msg}"
         else:
             # Non-streaming mode (original behavior)
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
+            response = http_request(
+                "openrouter", "POST", f"{OPENROUTER_BASE_URL}/chat/completions",
                 headers=headers,
                 json=payload,
-                timeout=60  # Add timeout
+                timeout=60,  # Add timeout
+                idempotent=True,
+                cancel_token=cancel_token
             )
             
             print(f"Response status: {response.status_code}")
@@ -379,6 +855,7 @@ def call_openrouter_api(prompt, conversation_history, model, system_prompt, stre
             if response.status_code == 200:
                 response_data = response.json()
                 print(f"Response data: {json.dumps(response_data, indent=2)}")
+                note_chat_usage(response_data)
                 
                 if 'choices' in response_data and len(response_data['choices']) > 0:
                     message = response_data['choices'][0].get('message', {})
@@ -399,6 +876,8 @@ def call_openrouter_api(prompt, conversation_history, model, system_prompt, stre
                     print("Authentication error. Please check your API key.")
                 return f"Error: {error_msg}"
             
+    except (Cancelled, StreamInterrupted):
+        raise
     except requests.exceptions.Timeout:
         print("Request timed out. The server took too long to respond.")
         return "Error: Request timed out"
@@ -411,6 +890,7 @@ def call_openrouter_api(prompt, conversation_history, model, system_prompt, stre
         return f"Error: {str(e)}"
 
 def call_replicate_api(prompt, conversation_history, model, gui=None):
+    check_uncaptured("Replicate SDK")
     try:
         # Only use the prompt, ignore conversation history
         input_params = {
@@ -419,7 +899,7 @@ def call_replicate_api(prompt, conversation_history, model, gui=None):
             "prompt": prompt
         }
         
-        output = replicate.run(
+        output = get_client("replicate").run(
             "black-forest-labs/flux-1.1-pro",
             input=input_params
         )
@@ -432,7 +912,7 @@ def call_replicate_api(prompt, conversation_history, model, gui=None):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         image_path = image_dir / f"generated_{timestamp}.jpg"
         
-        response = requests.get(image_url)
+        response = http_request("replicate", "GET", image_url, rate_limited=False)
         with open(image_path, "wb") as f:
             f.write(response.content)
         
@@ -456,28 +936,89 @@ def call_replicate_api(prompt, conversation_history, model, gui=None):
         print(f"Error calling Flux API: {e}")
         return None
 
-def call_deepseek_api(prompt, conversation_history, model, system_prompt, stream_callback=None):
-    """Call the DeepSeek model through OpenRouter API."""
-    try:
-        import re
-        from config import SHOW_CHAIN_OF_THOUGHT_IN_CONTEXT
+def build_openrouter_messages(prompt, conversation_history, system_prompt):
+    """Format the chat-completions message list sent to OpenRouter"""
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
         
-        # Build messages array
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
+    for msg in conversation_history:
+        if msg["role"] != "system":  # Skip system prompts
+            messages.append({
+                "role": msg["role"],
+                "content": msg["content"]
+            })
+    
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+def build_deepseek_messages(prompt, conversation_history, system_prompt):
+    """Format the message list sent to DeepSeek (text-only history)"""
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    
+    # Add conversation history
+    for msg in conversation_history:
+        if isinstance(msg, dict):
+            role = msg.get("role", "user")
+            content = msg.get("content", "")
+            if isinstance(content, str) and content.strip():
+                messages.append({"role": role, "content": content})
+    
+    # Add current prompt if provided
+    if prompt:
+        messages.append({"role": "user", "content": prompt})
+    return messages
+
+def format_deepseek_response(response_text):
+    """Split DeepSeek's <think> reasoning from the answer into a result dict"""
+    from config import SHOW_CHAIN_OF_THOUGHT_IN_CONTEXT
+    
+    # Initialize result with content
+    result = {
+        "content": response_text,
+        "model": "deepseek/deepseek-r1"
+    }
+    
+    # Extract and format chain of thought if enabled
+    if SHOW_CHAIN_OF_THOUGHT_IN_CONTEXT:
+        reasoning = None
+        content = response_text
         
-        # Add conversation history
-        for msg in conversation_history:
-            if isinstance(msg, dict):
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                if isinstance(content, str) and content.strip():
-                    messages.append({"role": role, "content": content})
+        if content:
+            # Try both <think> and <thinking> tags
+            think_match = re.search(r'<(think|thinking)>(.*?)</\1>', content, re.DOTALL | re.IGNORECASE)
+            if think_match:
+                reasoning = think_match.group(2).strip()
+                content = re.sub(r'<(think|thinking)>.*?</\1>', '', content, flags=re.DOTALL | re.IGNORECASE).strip()
+        
+        display_text = ""
+        if reasoning:
+            display_text += f"[Chain of Thought]\n{reasoning}\n\n"
+        if content:
+            display_text += f"[Final Answer]\n{content}"
         
-        # Add current prompt if provided
-        if prompt:
-            messages.append({"role": "user", "content": prompt})
+        result["display"] = display_text
+        result["content"] = content
+    else:
+        # Clean up thinking tags from content
+        content = response_text
+        if content:
+            content = re.sub(r'<(think|thinking)>.*?</\1>', '', content, flags=re.DOTALL | re.IGNORECASE).strip()
+            result["content"] = content
+    
+    return result
+
+def call_deepseek_api(prompt, conversation_history, model, system_prompt, stream_callback=None, cancel_token=None):
+    """Call the DeepSeek model through OpenRouter API.
+    
+    Args:
+        stream_callback: Optional function(chunk: str) to call with each streaming token
+        cancel_token: Optional CancellationToken that aborts a stream in flight
+    """
+    try:
+        messages = build_deepseek_messages(prompt, conversation_history, system_prompt)
         
         headers = {
             "Content-Type": "application/json",
@@ -498,33 +1039,23 @@ def call_deepseek_api(prompt, conversation_history, model, system_prompt, stream
         
         if stream_callback:
             # Streaming mode
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=180,
-                stream=True
+            response, full_response = stream_with_retry(
+                "openrouter",
+                lambda: http_request(
+                    "openrouter", "POST", f"{OPENROUTER_BASE_URL}/chat/completions",
+                    headers=headers,
+                    json=payload,
+                    timeout=180,
+                    stream=True,
+                    idempotent=True,
+                    cancel_token=cancel_token
+                ),
+                _read_chat_completions_stream,
+                stream_callback,
+                cancel_token=cancel_token
             )
             
-            if response.status_code == 200:
-                full_response = ""
-                for line in response.iter_lines():
-                    if line:
-                        line_text = line.decode('utf-8')
-                        if line_text.startswith('data: '):
-                            json_str = line_text[6:]
-                            if json_str.strip() == '[DONE]':
-                                break
-                            try:
-                                chunk_data = json.loads(json_str)
-                                if 'choices' in chunk_data and len(chunk_data['choices']) > 0:
-                                    delta = chunk_data['choices'][0].get('delta', {})
-                                    content = delta.get('content', '')
-                                    if content:
-                                        full_response += content
-                                        stream_callback(content)
-                            except json.JSONDecodeError:
-                                continue
+            if full_response is not None:
                 response_text = full_response
             else:
                 error_msg = f"OpenRouter API error {response.status_code}: {response.text}"
@@ -532,15 +1063,18 @@ def call_deepseek_api(prompt, conversation_history, model, system_prompt, stream
                 return None
         else:
             # Non-streaming mode
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
+            response = http_request(
+                "openrouter", "POST", f"{OPENROUTER_BASE_URL}/chat/completions",
                 headers=headers,
                 json=payload,
-                timeout=180
+                timeout=180,
+                idempotent=True,
+                cancel_token=cancel_token
             )
             
             if response.status_code == 200:
                 data = response.json()
+                note_chat_usage(data)
                 response_text = data['choices'][0]['message']['content']
             else:
                 error_msg = f"OpenRouter API error {response.status_code}: {response.text}"
@@ -549,41 +1083,9 @@ def call_deepseek_api(prompt, conversation_history, model, system_prompt, stream
         
         print(f"\nRaw Response: {response_text[:500]}...")
         
-        # Initialize result with content
-        result = {
-            "content": response_text,
-            "model": "deepseek/deepseek-r1"
-        }
-        
-        # Extract and format chain of thought if enabled
-        if SHOW_CHAIN_OF_THOUGHT_IN_CONTEXT:
-            reasoning = None
-            content = response_text
-            
-            if content:
-                # Try both <think> and <thinking> tags
-                think_match = re.search(r'<(think|thinking)>(.*?)</\1>', content, re.DOTALL | re.IGNORECASE)
-                if think_match:
-                    reasoning = think_match.group(2).strip()
-                    content = re.sub(r'<(think|thinking)>.*?</\1>', '', content, flags=re.DOTALL | re.IGNORECASE).strip()
-            
-            display_text = ""
-            if reasoning:
-                display_text += f"[Chain of Thought]\n{reasoning}\n\n"
-            if content:
-                display_text += f"[Final Answer]\n{content}"
-            
-            result["display"] = display_text
-            result["content"] = content
-        else:
-            # Clean up thinking tags from content
-            content = response_text
-            if content:
-                content = re.sub(r'<(think|thinking)>.*?</\1>', '', content, flags=re.DOTALL | re.IGNORECASE).strip()
-                result["content"] = content
-        
-        return result
-        
+        return format_deepseek_response(response_text)
+    except (Cancelled, StreamInterrupted):
+        raise
     except Exception as e:
         print(f"Error calling DeepSeek via OpenRouter: {e}")
         print(f"Error type: {type(e)}")
@@ -640,8 +1142,9 @@ def print_conversation_state(conversation):
 
 def call_claude_vision_api(image_url):
     """Have Claude analyze the generated image"""
+    check_uncaptured("Anthropic SDK")
     try:
-        response = anthropic.messages.create(
+        response = get_client("anthropic").messages.create(
             model="claude-3-opus-20240229",
             max_tokens=1000,
             messages=[{
@@ -673,8 +1176,8 @@ def list_together_models():
             "Content-Type": "application/json"
         }
         
-        response = requests.get(
-            "https://api.together.xyz/v1/models",
+        response = http_request(
+            "together", "GET", f"{TOGETHER_BASE_URL}/models",
             headers=headers
         )
         
@@ -698,12 +1201,12 @@ def start_together_model(model_id):
         
         # URL encode the model ID
         encoded_model = requests.utils.quote(model_id, safe='')
-        start_url = f"https://api.together.xyz/v1/models/{encoded_model}/start"
+        start_url = f"{TOGETHER_BASE_URL}/models/{encoded_model}/start"
         
         print(f"\nAttempting to start model: {model_id}")
         print(f"Using URL: {start_url}")
-        response = requests.post(
-            start_url,
+        response = http_request(
+            "together", "POST", start_url,
             headers=headers
         )
         
@@ -749,10 +1252,11 @@ def call_together_api(prompt, conversation_history, model, system_prompt):
             "top_p": 0.95,
         }
         
-        response = requests.post(
-            "https://api.together.xyz/v1/chat/completions",
+        response = http_request(
+            "together", "POST", f"{TOGETHER_BASE_URL}/chat/completions",
             headers=headers,
-            json=payload
+            json=payload,
+            idempotent=True
         )
         
         if response.status_code == 200:
@@ -815,11 +1319,12 @@ def generate_image_from_text(text, model="google/gemini-3-pro-image-preview"):
         }
         
         print(f"Generating image with {model}...")
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
+        response = http_request(
+            "openrouter", "POST", f"{OPENROUTER_BASE_URL}/chat/completions",
             headers=headers,
             data=json.dumps(payload),
-            timeout=60
+            timeout=60,
+            idempotent=True
         )
         
         if response.status_code == 200:
@@ -862,7 +1367,7 @@ def generate_image_from_text(text, model="google/gemini-3-pro-image-preview"):
                         else:
                             # If it's a regular URL, download it
                             try:
-                                img_response = requests.get(image_url, timeout=30)
+                                img_response = http_request("openrouter", "GET", image_url, rate_limited=False, timeout=30)
                                 if img_response.status_code == 200:
                                     image_path = image_dir / f"generated_{timestamp}.png"
                                     with open(image_path, "wb") as f:
@@ -921,10 +1426,14 @@ def generate_video_with_sora(
     seconds: int | None = None,
     size: str | None = None,
     poll_interval_seconds: float = 5.0,
+    cancel_token=None,
 ) -> dict:
     """
     Create a Sora video via REST API, poll until completion, and save MP4 to videos/.
 
+    cancel_token (a CancellationToken) stops polling or downloading and raises Cancelled.
+    The render job itself keeps running on OpenAI's side.
+
     Returns a dict with keys: success, video_id, status, video_path (when completed), error
     """
     try:
@@ -952,7 +1461,8 @@ def generate_video_with_sora(
         create_url = f"{base_url}/videos"
         vlog(f"[Sora] Create: url={create_url} model={model} seconds={seconds} size={size}")
         vlog(f"[Sora] Prompt (truncated): {prompt[:200]}{'...' if len(prompt) > 200 else ''}")
-        resp = requests.post(create_url, headers=headers_json, json=payload, timeout=60)
+        resp = http_request("openai", "POST", create_url, headers=headers_json, json=payload, timeout=60,
+                            cancel_token=cancel_token)
         if not resp.ok:
             err_text = resp.text
             try:
@@ -973,8 +1483,9 @@ def generate_video_with_sora(
         last_status = status
         last_progress = None
         while status in ("queued", "in_progress"):
-            time.sleep(poll_interval_seconds)
-            r = requests.get(retrieve_url, headers=headers_json, timeout=60)
+            _sleep(poll_interval_seconds, cancel_token)
+            r = http_request("openai", "GET", retrieve_url, headers=headers_json, timeout=60,
+                             cancel_token=cancel_token)
             if not r.ok:
                 vlog(f"[Sora] Retrieve failed: code={r.status_code} body={r.text}")
                 return {"success": False, "video_id": video_id, "error": f"Retrieve failed {r.status_code}: {r.text}"}
@@ -993,7 +1504,8 @@ def generate_video_with_sora(
         # Download the MP4
         content_url = f"{base_url}/videos/{video_id}/content"
         vlog(f"[Sora] Download: url={content_url}")
-        rc = requests.get(content_url, headers={'Authorization': f'Bearer {api_key}'}, stream=True, timeout=300)
+        rc = http_request("openai", "GET", content_url, headers={'Authorization': f'Bearer {api_key}'}, stream=True, timeout=300,
+                          cancel_token=cancel_token)
         if not rc.ok:
             vlog(f"[Sora] Download failed: code={rc.status_code} body={rc.text}")
             return {"success": False, "video_id": video_id, "status": status, "error": f"Download failed {rc.status_code}: {rc.text}"}
@@ -1002,10 +1514,20 @@ def generate_video_with_sora(
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         safe_snippet = re.sub(r"[^a-zA-Z0-9_-]", "_", prompt[:40]) or "video"
         out_path = videos_dir / f"{timestamp}_{safe_snippet}.mp4"
-        with open(out_path, "wb") as f:
-            for chunk in rc.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    f.write(chunk)
+        unregister = cancel_token.on_cancel(lambda: _abort_response(rc)) if cancel_token is not None else None
+        try:
+            with open(out_path, "wb") as f:
+                for chunk in rc.iter_content(chunk_size=1024 * 1024):
+                    if chunk:
+                        f.write(chunk)
+        except Exception:
+            if cancel_token is not None and cancel_token.cancelled:
+                out_path.unlink(missing_ok=True)
+                raise Cancelled("cancelled")
+            raise
+        finally:
+            if unregister is not None:
+                unregister()
 
         vlog(f"[Sora] Saved video: {out_path}")
         return {
@@ -1014,6 +1536,9 @@ def generate_video_with_sora(
             "status": status,
             "video_path": str(out_path)
         }
+    except Cancelled:
+        vlog("[Sora] Cancelled")
+        raise
     except Exception as e:
         logging.exception("Sora video generation error")
         return {"success": False, "error": str(e)}
@@ -0,0 +1,161 @@
+# sse.py
+"""Incremental Server-Sent Events parser shared by the streaming providers.
+
+Works directly on the raw byte chunks a streaming HTTP response yields, so
+no per-line decoding is done up front:
+- lines are split on b"\n" (a UTF-8 multi-byte character never contains
+  that byte, so characters split across chunk boundaries are reassembled
+  with the line they belong to before anything is decoded)
+- multi-line `data:` fields are joined with "\n" as the SSE spec requires
+- `event:` names are tracked, and events named in skip_events (e.g. Anthropic's
+  "ping") are dropped without touching their data
+- JSON is decoded once per kept event, never for skipped ones
+"""
+
+import json
+
+# Anthropic sends keep-alive "ping" events; they never carry content
+DEFAULT_SKIP_EVENTS = frozenset(["ping"])
+
+
+class SSEParser:
+    """Turn a stream of byte chunks into (event_name, data_bytes) pairs
+
+    Usage:
+        parser = SSEParser()
+        for chunk in response.iter_content(chunk_size=None):
+            for event, data in parser.feed(chunk):
+                ...
+        for event, data in parser.close():
+            ...
+    """
+
+    def __init__(self, skip_events=DEFAULT_SKIP_EVENTS):
+        self._skip = frozenset(name.encode("utf-8") for name in skip_events)
+        self._pending = b""  # Incomplete trailing event from the last chunk
+
+    def feed(self, chunk):
+        """Parse a chunk of bytes; returns the events it completed"""
+        buffer = self._pending + chunk if self._pending else chunk
+        if b"\r" in buffer:
+            # Normalise CRLF; hold back a trailing CR whose LF is still in flight
+            buffer = buffer.replace(b"\r\n", b"\n")
+            if buffer.endswith(b"\r"):
+                blocks = buffer[:-1].split(b"\n\n")
+                self._pending = blocks.pop() + b"\r"
+                return self._parse_blocks(blocks)
+        blocks = buffer.split(b"\n\n")
+        self._pending = blocks.pop()
+        return self._parse_blocks(blocks)
+
+    def close(self):
+        """Flush a final event the server did not terminate with a blank line"""
+        pending, self._pending = self._pending.rstrip(b"\r\n"), b""
+        return self._parse_blocks([pending]) if pending else []
+
+    def _parse_blocks(self, blocks):
+        events = []
+        for block in blocks:
+            # Fast paths for the shapes providers actually send:
+            # "data: {...}" and "event: name\ndata: {...}"
+            if block.startswith(b"data: ") and b"\n" not in block:
+                events.append((None, block[6:]))
+                continue
+            if block.startswith(b"event: "):
+                newline = block.find(b"\n")
+                if newline != -1 and block.startswith(b"data: ", newline + 1) and b"\n" not in block[newline + 1:]:
+                    name = block[7:newline].strip()
+                    if name not in self._skip:
+                        events.append((name.decode("utf-8", "replace"), block[newline + 7:]))
+                    continue
+            self._parse_block(block, events)
+        return events
+
+    def _parse_block(self, block, events):
+        """General case: any mix of comment, event and (multi-line) data fields"""
+        event = None
+        data = []
+        for line in block.split(b"\n"):
+            if line.startswith(b"data:"):
+                value = line[5:]
+                data.append(value[1:] if value.startswith(b" ") else value)
+            elif line.startswith(b"event:"):
+                event = line[6:].strip()
+            # Comments (":...") and id/retry fields are not used by any provider
+        if data and event not in self._skip:
+            events.append((event.decode("utf-8", "replace") if event is not None else None, b"\n".join(data)))
+
+
+# Decoding str directly skips json.loads' per-call encoding sniffing of bytes
+_decode_json = json.JSONDecoder().decode
+
+
+def iter_sse_events(byte_chunks, skip_events=DEFAULT_SKIP_EVENTS):
+    """Yield (event_name, data_bytes) for each event in an iterable of byte chunks"""
+    parser = SSEParser(skip_events)
+    for chunk in byte_chunks:
+        if chunk:
+            yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def _decode_events(events):
+    """Decode event data as JSON; returns (payloads, saw_done)
+    
+    All events from one network chunk are decoded with a single JSON-array
+    parse (one C-level call instead of one per token); if any event is not
+    valid JSON the batch falls back to decoding events one by one.
+    """
+    datas = []
+    done = False
+    for _, data in events:
+        if data == b"[DONE]":
+            done = True
+            break
+        if data:
+            datas.append(data)
+    if not datas:
+        return [], done
+    
+    try:
+        return _decode_json("[" + b",".join(datas).decode("utf-8") + "]"), done
+    except ValueError:
+        pass
+    payloads = []
+    for data in datas:
+        try:
+            payloads.append(_decode_json(data.decode("utf-8")))
+        except ValueError:
+            continue
+    return payloads, done
+
+
+def iter_sse_json(byte_chunks, skip_events=DEFAULT_SKIP_EVENTS):
+    """Yield the decoded JSON payload of each event until `data: [DONE]`
+
+    Events whose data is empty or not valid JSON are skipped.
+    """
+    parser = SSEParser(skip_events)
+    for chunk in byte_chunks:
+        if chunk:
+            payloads, done = _decode_events(parser.feed(chunk))
+            yield from payloads
+            if done:
+                return
+    payloads, _ = _decode_events(parser.close())
+    yield from payloads
+
+
+async def aiter_sse_json(byte_chunks, skip_events=DEFAULT_SKIP_EVENTS):
+    """Async counterpart of iter_sse_json for an async iterable of byte chunks"""
+    parser = SSEParser(skip_events)
+    async for chunk in byte_chunks:
+        if chunk:
+            payloads, done = _decode_events(parser.feed(chunk))
+            for payload in payloads:
+                yield payload
+            if done:
+                return
+    payloads, _ = _decode_events(parser.close())
+    for payload in payloads:
+        yield payload
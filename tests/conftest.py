@@ -0,0 +1,37 @@
+# tests/conftest.py
+"""Shared fixtures: the repo's modules on sys.path and a local mock provider server."""
+
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
+
+from mock_provider_server import MockProviderServer, MockSettings  # noqa: E402
+
+
+@pytest.fixture
+def mock_server(monkeypatch):
+    """A running MockProviderServer with the app's Anthropic and OpenRouter calls pointed at it
+
+    Replies are short and unthrottled; tests change knobs through
+    mock_server.settings.
+    """
+    import async_providers
+    import rate_limiter
+    import shared_utils
+
+    server = MockProviderServer(MockSettings(ttft=0, tokens_per_sec=0, output_tokens=20, seed=1)).start()
+    for name, value in server.env().items():
+        monkeypatch.setenv(name, value)
+    # The base URLs are read when shared_utils is imported
+    for module in (shared_utils, async_providers):
+        monkeypatch.setattr(module, "ANTHROPIC_BASE_URL", server.url)
+        monkeypatch.setattr(module, "OPENROUTER_BASE_URL", f"{server.url}/v1")
+    # A fresh limiter, so pauses learned in one test do not hold up the next
+    monkeypatch.setattr(rate_limiter, "_rate_limiter", None)
+    yield server
+    server.stop()
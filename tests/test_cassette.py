@@ -0,0 +1,69 @@
+# tests/test_cassette.py
+"""OpenAI SDK traffic is recorded and replayed; uncapturable calls fail in replay mode."""
+
+import asyncio
+
+import pytest
+
+import cassette
+import shared_utils
+from async_providers import call_openai_api_async
+from cassette import CassetteError
+
+
+@pytest.fixture
+def cassette_path(tmp_path):
+    yield str(tmp_path / "session.jsonl.gz")
+    cassette.stop_cassette()
+
+
+def openai_reply():
+    streamed = []
+    reply = shared_utils.call_openai_api("Hello", [], "gpt-mock", "Prompt", stream_callback=streamed.append)
+    assert not str(reply).startswith("Error"), reply
+    assert "".join(streamed) == reply
+    return reply
+
+
+def test_openai_sdk_record_and_replay(mock_server, cassette_path):
+    cassette.start_recording(cassette_path)
+    recorded = openai_reply()
+    cassette.stop_cassette()
+    cassette.start_replay(cassette_path, speed=0)
+    requests = mock_server.get_stats()["requests"]
+
+    assert openai_reply() == recorded
+    assert mock_server.get_stats()["requests"] == requests  # Served from the cassette
+
+    entries = cassette.load_cassette(cassette_path)
+    assert [(entry["method"], entry["url"].split("/v1")[1]) for entry in entries] == [("POST", "/chat/completions")]
+    assert entries[0]["request"]["model"] == "gpt-mock"
+
+
+def test_gemini_is_not_called_while_replaying(mock_server, cassette_path, monkeypatch):
+    cassette.start_recording(cassette_path)
+    openai_reply()
+    cassette.stop_cassette()
+    cassette.start_replay(cassette_path, speed=0)
+
+    def live_call(*args):
+        raise AssertionError("Gemini was called while replaying")
+
+    monkeypatch.setattr(shared_utils, "get_gemini_model", live_call)
+    with pytest.raises(CassetteError):
+        shared_utils.call_gemini_api("Hello", [], "gemini-mock", "Prompt")
+
+
+def test_async_mode_is_not_called_while_replaying(mock_server, cassette_path):
+    cassette.start_recording(cassette_path)
+    openai_reply()
+    cassette.stop_cassette()
+    cassette.start_replay(cassette_path, speed=0)
+    requests = mock_server.get_stats()["requests"]
+
+    async def stream():
+        return [chunk async for chunk in call_openai_api_async("Hello", [], "gpt-mock", "Prompt")]
+
+    with pytest.raises(CassetteError):
+        asyncio.run(stream())
+    assert mock_server.get_stats()["requests"] == requests
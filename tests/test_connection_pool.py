@@ -0,0 +1,35 @@
+# tests/test_connection_pool.py
+"""Sequential provider calls share one pooled keep-alive connection."""
+
+import pytest
+
+import shared_utils
+
+CALLS = 5
+
+
+@pytest.fixture
+def fresh_pool(monkeypatch):
+    """Empty session pool and connection counters for this test"""
+    monkeypatch.setattr(shared_utils, "_http_sessions", {})
+    monkeypatch.setattr(shared_utils, "_http_metrics", {})
+    yield
+    shared_utils.close_http_sessions()
+
+
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("provider", ["anthropic", "openrouter"])
+def test_connection_is_reused(mock_server, fresh_pool, provider, stream):
+    callback = (lambda chunk: None) if stream else None
+    for i in range(CALLS):
+        if provider == "anthropic":
+            reply = shared_utils.call_claude_api(f"Turn {i}", [], "claude-mock", "Prompt", stream_callback=callback)
+        else:
+            reply = shared_utils.call_openrouter_api(f"Turn {i}", [], "mock/model", "Prompt", stream_callback=callback)
+        assert not str(reply).startswith("Error"), reply
+
+    metrics = shared_utils.get_connection_metrics()[provider]
+    assert metrics["requests"] == CALLS
+    assert metrics["connections_opened"] == 1
+    assert metrics["connections_reused"] == CALLS - 1
+    assert metrics["hosts"] == [mock_server.url.split("://", 1)[1]]
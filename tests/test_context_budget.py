@@ -0,0 +1,132 @@
+# tests/test_context_budget.py
+"""Token estimates and the truncation strategies behind fit_to_budget."""
+
+import pytest
+
+from context_budget import (
+    IMAGE_PLACEHOLDER,
+    STRATEGIES,
+    estimate_message_tokens,
+    estimate_text_tokens,
+    fit_to_budget,
+)
+
+TEXT = "x" * 400  # 100 tokens
+
+
+def image_message(role="user"):
+    return {"role": role, "content": [{"type": "image", "source": {"type": "base64", "media_type": "image/png", "data": "AAAA"}},
+                                      {"type": "text", "text": TEXT}]}
+
+
+def make_turn(history):
+    """[system, history..., final prompt] as prepare_turn builds it"""
+    return [{"role": "system", "content": "You are AI-1."}] + history + [{"role": "user", "content": "Your turn."}]
+
+
+def text_history(count):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"{i} {TEXT}"} for i in range(count)]
+
+
+def size(messages):
+    return sum(estimate_message_tokens(msg) for msg in messages)
+
+
+def budget_for(messages, history_messages):
+    """Budget that fits the system message, the final prompt and about `history_messages` history messages"""
+    return size([messages[0], messages[-1]]) + size(messages[1:1 + history_messages]) + 2
+
+
+def test_estimate_text_tokens():
+    assert estimate_text_tokens("") == 0
+    assert estimate_text_tokens("abcd") == 1
+    assert estimate_text_tokens("abcde") == 2
+    assert estimate_text_tokens("a" * 40) == 10
+    # Box drawing and CJK characters cost about a token each
+    assert estimate_text_tokens("─" * 40) == 40
+    assert estimate_text_tokens("漢字" * 10) == 20
+
+
+def test_estimate_message_tokens_counts_images():
+    text_only = {"role": "user", "content": [{"type": "text", "text": TEXT}]}
+    assert estimate_message_tokens(image_message()) > estimate_message_tokens(text_only) + 1000
+
+
+def test_under_budget_is_untouched():
+    messages = make_turn(text_history(4))
+    result, stats = fit_to_budget(messages, size(messages))
+    assert result is messages
+    assert stats["dropped"] == 0 and stats["images_dropped"] == 0
+    assert stats["tokens_after"] == stats["tokens_before"] == size(messages)
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        fit_to_budget(make_turn(text_history(2)), 10, strategy="newest_only")
+
+
+@pytest.mark.parametrize("strategy", sorted(STRATEGIES))
+def test_strategy_fits_budget(strategy):
+    messages = make_turn(text_history(10))
+    budget = budget_for(messages, 4)
+    result, stats = fit_to_budget(messages, budget, strategy=strategy)
+
+    assert stats["tokens_after"] == size(result) <= budget
+    assert stats["dropped"] == len(messages) - len(result) > 0
+    # System message and final prompt always survive, and the order is preserved
+    assert result[0] is messages[0] and result[-1] is messages[-1]
+    positions = [messages.index(msg) for msg in result]
+    assert positions == sorted(positions)
+    # The newest history message is always kept
+    assert result[-2] is messages[-2]
+
+
+def test_sliding_window_keeps_newest():
+    messages = make_turn(text_history(10))
+    result, _ = fit_to_budget(messages, budget_for(messages, 4), strategy="sliding_window")
+    history = result[1:-1]
+    assert history == messages[len(messages) - 1 - len(history):-1]
+    # The window never opens on a reply whose prompt was dropped
+    assert history[0]["role"] == "user"
+
+
+def test_head_tail_keeps_opening_messages():
+    messages = make_turn(text_history(10))
+    result, _ = fit_to_budget(messages, budget_for(messages, 5), strategy="head_tail", head_messages=2)
+    assert result[1:3] == messages[1:3]
+    assert result[-3:-1] == messages[-3:-1]
+    assert messages[5] not in result
+
+
+@pytest.mark.parametrize("strategy", sorted(STRATEGIES))
+def test_images_dropped_before_text(strategy):
+    history = [image_message(), {"role": "assistant", "content": TEXT}, image_message(), {"role": "assistant", "content": TEXT}]
+    messages = make_turn(history)
+    # Room for all the text, but not for the images
+    text_only = [{"role": "user", "content": TEXT}] * 4
+    budget = size([messages[0], messages[-1]]) + size(text_only) + 50
+    result, stats = fit_to_budget(messages, budget, strategy=strategy)
+
+    assert stats["tokens_after"] <= budget
+    if strategy == "drop_images_first":
+        assert stats["dropped"] == 0
+        assert stats["images_dropped"] == 2
+        assert IMAGE_PLACEHOLDER in str(result[1]["content"]) and IMAGE_PLACEHOLDER in str(result[3]["content"])
+        # Trimmed copies are made; the caller's messages keep their images
+        assert messages[1]["content"][0]["type"] == "image"
+    else:
+        assert stats["dropped"] > 0
+        assert stats["images_dropped"] == 0
+
+
+def test_images_dropped_counts_kept_messages_only():
+    history = [image_message(), {"role": "assistant", "content": TEXT}, image_message(), {"role": "assistant", "content": TEXT}]
+    messages = make_turn(history)
+    # Both images are replaced, but only the newest two messages fit afterwards
+    budget = size([messages[0], messages[-1]]) + 2 * estimate_message_tokens({"role": "user", "content": TEXT}) + 10
+    result, stats = fit_to_budget(messages, budget, strategy="drop_images_first")
+
+    assert [msg.get("content") for msg in result[1:-1]][-1] == TEXT
+    assert stats["dropped"] == 2
+    assert stats["images_dropped"] == 1
+    assert IMAGE_PLACEHOLDER in str(result[1]["content"])
@@ -0,0 +1,62 @@
+# tests/test_hedging.py
+"""Hedged requests time the first token from the send, not from the rate-limit wait.
+
+A turn queued behind a Retry-After (before sending, or after a 429) is not
+late, so no duplicate is sent for it; a slow first token still is.
+"""
+
+import threading
+
+import pytest
+
+import hedging
+import shared_utils
+import ttft_stats
+from provider_adapters import get_adapter
+
+CLAUDE = "Claude Sonnet 4.5"
+DEADLINE = 0.3
+MESSAGES = [{"role": "system", "content": "You are AI-1."}, {"role": "user", "content": "Hello"}]
+
+
+@pytest.fixture(autouse=True)
+def short_deadline(monkeypatch):
+    monkeypatch.setattr(hedging, "get_hedge_deadline", lambda model_id: DEADLINE)
+    monkeypatch.setattr(ttft_stats, "_histograms", {})
+
+
+def hedged_turn():
+    adapter = get_adapter(CLAUDE)
+    before = hedging.get_hedge_stats()["hedged"]
+    winner, response = hedging.hedged_call(adapter, MESSAGES, "claude-mock", "Prompt", stream_callback=lambda chunk: None)
+    assert not str(response).startswith("Error"), response
+    return hedging.get_hedge_stats()["hedged"] - before
+
+
+def ttft_p50():
+    return ttft_stats.get_ttft_stats()["claude-mock"]["p50"]
+
+
+def test_rate_limit_wait_before_sending_is_not_hedged(mock_server):
+    mock_server.settings.ttft = 0.1
+    shared_utils.get_rate_limiter().observe("anthropic", "claude-mock", 429, {"retry-after": "1"})
+
+    assert hedged_turn() == 0
+    assert mock_server.get_stats()["requests"] == 1
+    assert ttft_p50() < DEADLINE
+
+
+def test_429_backoff_is_not_hedged(mock_server):
+    mock_server.settings.update({"ttft": 0.1, "error_rate": 1.0, "error_status": 429, "retry_after": 1})
+    timer = threading.Timer(0.2, mock_server.settings.update, args=({"error_rate": 0.0},))
+    timer.start()
+
+    assert hedged_turn() == 0
+    assert mock_server.get_stats()["requests"] == 2  # The 429 and its resend, no duplicate
+    assert ttft_p50() < DEADLINE
+
+
+def test_slow_first_token_is_hedged(mock_server):
+    mock_server.settings.ttft = 1.0
+    assert hedged_turn() == 1
+    assert mock_server.get_stats()["requests"] == 2
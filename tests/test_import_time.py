@@ -0,0 +1,31 @@
+# tests/test_import_time.py
+"""The headless engine imports quickly and without provider SDKs or PyQt6.
+
+Each module is imported in a fresh interpreter under `python -X importtime`
+(see benchmarks/bench_import_time.py, which also lists the slowest modules).
+"""
+
+import pytest
+from bench_import_time import LAZY_MODULES, measure
+
+# Cumulative import time allowed for each module, best of REPEAT fresh interpreters
+BUDGET_MS = 500
+REPEAT = 3
+
+# Never imported by the headless engine: provider SDKs load on first use, and the GUI is separate
+FORBIDDEN = LAZY_MODULES + ["PyQt6"]
+
+
+def imported(timings, package):
+    return sorted(name for name in timings if name == package or name.startswith(package + "."))
+
+
+@pytest.mark.parametrize("module", ["conversation_engine", "headless"])
+def test_headless_import(module):
+    runs = [measure(module) for _ in range(REPEAT)]
+
+    for package in FORBIDDEN:
+        assert not imported(runs[0], package), f"import {module} pulls in {package}"
+
+    best_ms = min(timings[module] for timings in runs) / 1000
+    assert best_ms <= BUDGET_MS, f"import {module} took {best_ms:.1f} ms (budget {BUDGET_MS} ms)"
@@ -0,0 +1,76 @@
+# tests/test_prompt_caching.py
+"""Claude prompt caching against the mock server: breakpoints sent, cache usage read back."""
+
+import pytest
+
+import shared_utils
+from config import CLAUDE_CACHE_BOUNDARY_STEP
+
+
+def make_history(count):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"Message {i} about the hallway."}
+            for i in range(count)]
+
+
+def breakpoint_positions(payload):
+    """Indices of the messages whose last content block carries cache_control"""
+    positions = []
+    for index, message in enumerate(payload["messages"]):
+        content = message["content"]
+        if isinstance(content, list) and content[-1].get("cache_control"):
+            positions.append(index)
+        for block in content[:-1] if isinstance(content, list) else []:
+            assert "cache_control" not in block, f"breakpoint on a non-final block of message {index}"
+    return positions
+
+
+def last_claude_request(server):
+    path, payload = server.captured[-1]
+    assert path == "/v1/messages"
+    return payload
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_breakpoints_and_cache_usage(mock_server, stream):
+    callback = (lambda chunk: None) if stream else None
+    history = make_history(2 * CLAUDE_CACHE_BOUNDARY_STEP + 2)
+
+    before = shared_utils.get_claude_cache_usage()
+    shared_utils.call_claude_api("Go on.", history, "claude-mock", "Stay in character.", stream_callback=callback)
+    payload = last_claude_request(mock_server)
+
+    # System prompt, the rolling boundary and the final message are marked
+    assert payload["system"] == [{"type": "text", "text": "Stay in character.", "cache_control": {"type": "ephemeral"}}]
+    last = len(payload["messages"]) - 1
+    boundary = (last // CLAUDE_CACHE_BOUNDARY_STEP) * CLAUDE_CACHE_BOUNDARY_STEP - 1
+    assert breakpoint_positions(payload) == [boundary, last]
+    # The caller's message dicts are left as they were
+    assert all(isinstance(message["content"], str) for message in history)
+
+    first = shared_utils.get_claude_cache_usage()
+    assert first["requests"] == before["requests"] + 1
+    assert first["cache_creation_input_tokens"] > before["cache_creation_input_tokens"]
+    assert first["cache_read_input_tokens"] == before["cache_read_input_tokens"]
+
+    # The next turn extends the same history, so its prefix is read back from the cache
+    history += [{"role": "assistant", "content": "A door opens."}, {"role": "user", "content": "Go through it."}]
+    shared_utils.call_claude_api("Go on.", history, "claude-mock", "Stay in character.", stream_callback=callback)
+    second = shared_utils.get_claude_cache_usage()
+    assert second["requests"] == first["requests"] + 1
+    assert second["cache_read_input_tokens"] > first["cache_read_input_tokens"]
+    assert second["input_tokens"] > first["input_tokens"]
+
+
+def test_no_breakpoints_when_disabled(mock_server, monkeypatch):
+    import config
+    monkeypatch.setattr(config, "CLAUDE_PROMPT_CACHING", False)
+
+    before = shared_utils.get_claude_cache_usage()
+    shared_utils.call_claude_api("Go on.", make_history(4), "claude-mock", "Stay in character.")
+    payload = last_claude_request(mock_server)
+
+    assert payload["system"] == "Stay in character."
+    assert breakpoint_positions(payload) == []
+    after = shared_utils.get_claude_cache_usage()
+    assert after["cache_creation_input_tokens"] == before["cache_creation_input_tokens"]
+    assert after["cache_read_input_tokens"] == before["cache_read_input_tokens"]
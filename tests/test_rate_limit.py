@@ -0,0 +1,42 @@
+# tests/test_rate_limit.py
+"""Rate-limit pauses end as soon as the turn waiting on them is cancelled."""
+
+import threading
+import time
+
+import pytest
+
+import rate_limiter
+import shared_utils
+from cancellation import CancellationToken, Cancelled
+
+
+def cancel_after(seconds):
+    token = CancellationToken()
+    timer = threading.Timer(seconds, token.cancel)
+    timer.daemon = True
+    timer.start()
+    return token
+
+
+def test_retry_after_wait_is_cancelled(mock_server):
+    # Every request gets a 429 asking for a 30 s pause
+    mock_server.settings.update({"error_rate": 1.0, "error_status": 429, "retry_after": 30})
+    token = cancel_after(0.2)
+
+    started = time.monotonic()
+    with pytest.raises(Cancelled):
+        shared_utils.call_claude_api("Hello", [], "claude-mock", stream_callback=lambda chunk: None, cancel_token=token)
+    assert time.monotonic() - started < 5
+    assert mock_server.get_stats()["requests"] == 1
+
+
+def test_sdk_rate_limit_wait_is_cancelled(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_rate_limiter", None)
+    shared_utils.get_rate_limiter().observe("openai", "gpt-mock", 429, {"retry-after": "30"})
+    token = cancel_after(0.2)
+
+    started = time.monotonic()
+    with pytest.raises(Cancelled):
+        shared_utils.wait_for_rate_limit("openai", "gpt-mock", cancel_token=token)
+    assert time.monotonic() - started < 5
@@ -0,0 +1,112 @@
+# tests/test_rolling_summary.py
+"""Rolling summaries with the offline stub_summarizer.
+
+Older messages are folded into one summary in the background, every AI in
+the conversation reuses it, and edits rebuild it after ContextCache.invalidate().
+"""
+
+import threading
+
+import pytest
+
+from config import SUMMARY_KEEP_RECENT, SUMMARY_MIN_BATCH
+from conversation_engine import ContextCache, prepare_turn
+from rolling_summary import stub_summarizer
+
+SUMMARY_HEADER = "[Summary of the earlier conversation]"
+LENGTH = SUMMARY_KEEP_RECENT + SUMMARY_MIN_BATCH + 4
+
+
+def make_conversation(count):
+    return [{"role": "assistant", "ai_name": f"AI-{i % 2 + 1}", "model": "Mock", "content": f"Reply {i}"}
+            for i in range(count)]
+
+
+class CountingSummarizer:
+    """stub_summarizer that records its calls and can be held back"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, previous_summary, messages):
+        self.calls.append(len(messages))
+        assert self.release.wait(5)
+        return stub_summarizer(previous_summary, messages)
+
+
+@pytest.fixture
+def summarizer():
+    return CountingSummarizer()
+
+
+def turn(ai_name, conversation, cache):
+    _, _, messages = prepare_turn(ai_name, list(conversation), "Mock", "Prompt", cache)
+    return [str(msg["content"]) for msg in messages[1:]]
+
+
+def test_first_turn_does_not_wait_for_the_summary(summarizer):
+    cache = ContextCache(summarizer)
+    conversation = make_conversation(LENGTH)
+    summarizer.release.clear()  # The summary job cannot finish during this turn
+
+    contents = turn("AI-1", conversation, cache)
+    assert not any(SUMMARY_HEADER in content for content in contents)
+    assert "Reply 0" in contents[0]
+
+    # ...but it was started in the background
+    summarizer.release.set()
+    cache.summary("main").wait(5)
+    assert summarizer.calls == [LENGTH - SUMMARY_KEEP_RECENT]
+    assert cache.summary("main").covered == LENGTH - SUMMARY_KEEP_RECENT
+
+
+def test_summary_replaces_older_messages(summarizer):
+    cache = ContextCache(summarizer)
+    conversation = make_conversation(LENGTH)
+    turn("AI-1", conversation, cache)
+    cache.summary("main").wait(5)
+
+    contents = turn("AI-1", conversation, cache)
+    covered = LENGTH - SUMMARY_KEEP_RECENT
+    assert contents[0].startswith(SUMMARY_HEADER)
+    assert "Reply 0" in contents[0] and f"Reply {covered - 1}" in contents[0]
+    # The recent tail is sent verbatim, after the summary
+    tail = contents[1:]
+    assert not any(content.endswith(f"Reply {covered - 1}") for content in tail)
+    assert any(content.endswith(f"Reply {covered}") for content in tail)
+    assert any(content.endswith(f"Reply {LENGTH - 1}") for content in tail)
+
+
+def test_summary_is_shared_across_ais(summarizer):
+    cache = ContextCache(summarizer)
+    conversation = make_conversation(LENGTH)
+    turn("AI-1", conversation, cache)
+    cache.summary("main").wait(5)
+
+    conversation.append({"role": "assistant", "ai_name": "AI-1", "model": "Mock", "content": "One more"})
+    contents = turn("AI-2", conversation, cache)
+    assert contents[0].startswith(SUMMARY_HEADER)
+    # Too few messages aged out for another refresh, so AI-2 reused AI-1's summary
+    assert len(summarizer.calls) == 1
+
+
+def test_edit_rebuilds_summary_after_invalidate(summarizer):
+    cache = ContextCache(summarizer)
+    conversation = make_conversation(LENGTH)
+    turn("AI-1", conversation, cache)
+    cache.summary("main").wait(5)
+
+    conversation[0] = dict(conversation[0], content="Edited opening")
+    cache.invalidate("main")
+    contents = turn("AI-1", conversation, cache)
+    # The stale summary is gone; the full history goes out while a new one is built
+    assert not any(SUMMARY_HEADER in content for content in contents)
+    assert "Edited opening" in contents[0]
+
+    cache.summary("main").wait(5)
+    contents = turn("AI-1", conversation, cache)
+    assert contents[0].startswith(SUMMARY_HEADER)
+    assert "Edited opening" in contents[0] and "Reply 0" not in contents[0]
+    assert len(summarizer.calls) == 2
@@ -0,0 +1,112 @@
+# tests/test_stream_retry.py
+"""Dropped and failing streams against the fault-injecting mock server.
+
+A dropped stream is sent again from scratch and the retry listener is told;
+once the retry budget is spent, the failed turn is kept out of the
+conversation the AIs see.
+"""
+
+import asyncio
+
+import pytest
+from mock_provider_server import make_tokens
+
+import retry_policy
+from config import RETRY_MAX_ATTEMPTS
+from conversation_engine import (
+    ConversationEngine,
+    ai_turn_async,
+    prepare_turn,
+    result_to_message,
+)
+from provider_adapters import get_adapter
+
+CLAUDE = "Claude Sonnet 4.5"
+OPENROUTER = "meta-llama/llama-3.3-70b-instruct"  # Raw model IDs go through OpenRouter
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(retry_policy.DEFAULT_POLICY, "base_delay", 0.01)
+
+
+def expected_reply(server):
+    return "".join(make_tokens(server.settings.output_tokens, server.settings.token_chars))
+
+
+def run_engine(model, streamed, retries):
+    """One AI turn through ConversationEngine, recording streamed chunks and retries"""
+    engine = ConversationEngine(
+        [model], iterations=1, use_turn_delay=False,
+        streaming_callback=lambda ai_name, chunk: streamed.append(chunk),
+        retry_callback=lambda ai_name, attempt, reason: retries.append((ai_name, attempt, reason)),
+    )
+    return engine.run("What is behind the wallpaper?")
+
+
+def test_openrouter_model_routing():
+    assert get_adapter(OPENROUTER).name == "openrouter"
+
+
+@pytest.mark.parametrize("model", [CLAUDE, OPENROUTER])
+def test_dropped_stream_is_restarted(mock_server, model):
+    mock_server.settings.drop_rate = 1.0
+    streamed, retries = [], []
+
+    def on_retry(ai_name, attempt, reason):
+        retries.append((ai_name, attempt, reason))
+        mock_server.settings.drop_rate = 0.0  # The next attempt gets through
+
+    engine = ConversationEngine([model], iterations=1, use_turn_delay=False,
+                                streaming_callback=lambda ai_name, chunk: streamed.append(chunk),
+                                retry_callback=on_retry)
+    conversation = engine.run("What is behind the wallpaper?")
+
+    stats = mock_server.get_stats()
+    assert stats["streams_dropped"] == 1
+    assert stats["requests"] == 2
+    assert [(ai_name, attempt) for ai_name, attempt, _ in retries] == [("AI-1", 1)]
+    assert "stream interrupted" in retries[0][2]
+
+    # The listener saw the partial text; the conversation only gets the complete reply
+    reply = conversation[-1]
+    assert reply["role"] == "assistant" and reply["ai_name"] == "AI-1"
+    assert reply["content"] == expected_reply(mock_server)
+    assert "".join(streamed).endswith(expected_reply(mock_server))
+    assert len("".join(streamed)) > len(reply["content"])
+
+
+@pytest.mark.parametrize("model", [CLAUDE, OPENROUTER])
+@pytest.mark.parametrize("fault", ["drop_rate", "error_rate"])
+def test_exhausted_retries_commit_no_reply(mock_server, model, fault):
+    setattr(mock_server.settings, fault, 1.0)
+    streamed, retries = [], []
+    conversation = run_engine(model, streamed, retries)
+
+    stats = mock_server.get_stats()
+    assert stats["requests"] == RETRY_MAX_ATTEMPTS
+    assert len(retries) == RETRY_MAX_ATTEMPTS - 1
+    if fault == "drop_rate":
+        assert stats["streams_dropped"] == RETRY_MAX_ATTEMPTS
+        assert streamed  # Partial text was streamed before every drop
+
+    # The failure is recorded as a system message, not as the AI's reply
+    assert [msg["role"] for msg in conversation] == ["user", "system"]
+    assert conversation[-1]["content"].startswith("Error")
+
+    # ...so the next turn does not send it (or the truncated text) to any AI
+    _, _, messages = prepare_turn("AI-2", conversation, model, "Stay in character.")
+    assert [msg["role"] for msg in messages] == ["system", "user"]
+    assert "Error" not in str(messages[1]["content"])
+
+
+def test_exhausted_retries_async(mock_server):
+    mock_server.settings.drop_rate = 1.0
+    retries = []
+    with retry_policy.retry_listener(lambda attempt, reason: retries.append(attempt)):
+        result = asyncio.run(ai_turn_async("AI-1", [{"role": "user", "content": "Hello"}], CLAUDE, "Stay in character.",
+                                           streaming_callback=lambda chunk: None))
+
+    assert retries == list(range(1, RETRY_MAX_ATTEMPTS))
+    assert result["turn_status"] == "error"
+    assert result_to_message("AI-1", CLAUDE, result)["role"] == "system"
@@ -0,0 +1,62 @@
+# tests/test_turn_context.py
+"""Incremental turn contexts: only new messages are processed, edits go through invalidate()."""
+
+from conversation_engine import ContextCache, create_fork_branch, prepare_turn
+
+
+def make_conversation(count):
+    return [{"role": "assistant", "ai_name": f"AI-{i % 2 + 1}", "model": "Mock", "content": f"Reply {i}"}
+            for i in range(count)]
+
+
+def sent_contents(messages):
+    return [msg["content"] for msg in messages[1:]]
+
+
+def test_only_new_messages_are_processed():
+    cache = ContextCache()
+    conversation = make_conversation(6)
+    prepare_turn("AI-1", conversation, "Mock", "Prompt", cache)
+    context = cache.get("main", "AI-1")
+    assert context.processed == 6
+
+    conversation.append({"role": "user", "content": "More please"})
+    prepare_turn("AI-1", list(conversation), "Mock", "Prompt", cache)
+    assert cache.get("main", "AI-1") is context
+    assert context.processed == 7
+    assert context.sources[-1] == 6
+
+
+def test_edit_is_picked_up_after_invalidate():
+    cache = ContextCache()
+    conversation = make_conversation(4)
+    prepare_turn("AI-1", conversation, "Mock", "Prompt", cache)
+
+    conversation[1] = dict(conversation[1], content="Edited reply")
+    cache.invalidate("main")
+    _, _, messages = prepare_turn("AI-1", conversation, "Mock", "Prompt", cache)
+    assert "[Mock]: Edited reply" in sent_contents(messages)
+    assert "[Mock]: Reply 1" not in sent_contents(messages)
+
+
+def test_shorter_conversation_rebuilds():
+    cache = ContextCache()
+    conversation = make_conversation(5)
+    prepare_turn("AI-1", conversation, "Mock", "Prompt", cache)
+
+    _, _, messages = prepare_turn("AI-1", conversation[:2], "Mock", "Prompt", cache)
+    assert cache.get("main", "AI-1").processed == 2
+    assert "Reply 4" not in str(sent_contents(messages))
+
+
+def test_branch_creation_invalidates_its_key(monkeypatch):
+    cache = ContextCache()
+    monkeypatch.setattr("conversation_engine.time.time", lambda: 1.0)
+    stale = cache.get("fork_1.0", "AI-1")
+    stale.processed = 99
+
+    branch_id, branch_data = create_fork_branch(make_conversation(3), "Reply 1", context_cache=cache)
+    assert branch_id == "fork_1.0"
+    assert cache.get(branch_id, "AI-1") is not stale
+    prepare_turn("AI-1", branch_data["conversation"], "Mock", "Prompt", cache, branch_id)
+    assert cache.get(branch_id, "AI-1").processed == len(branch_data["conversation"])
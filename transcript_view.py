@@ -0,0 +1,693 @@
+# transcript_view.py
+"""Virtualized conversation transcript for very long sessions.
+
+A QTextEdit holds the whole transcript in one document, which gets slow to
+lay out, scroll and select once a session reaches megabytes of text (e.g.
+ASCII-art prompt pairs over 100 iterations). TranscriptView shows the same
+messages through a model/view pair instead:
+
+- TranscriptModel has one row per conversation message. When it is given a
+  new conversation it compares messages by identity, as
+  ConversationPane.render_conversation does, and inserts, updates or removes
+  only the rows that differ.
+- TranscriptView lays out only the rows in and around the viewport. Each
+  message is rendered into its own QTextDocument, held in an LRU cache of
+  TRANSCRIPT_DOCUMENT_CACHE documents. A row that has never been on screen
+  uses a height estimated from its text until it is first laid out. Row
+  positions are prefix sums over the row heights, so appending a message,
+  streaming text or painting at any scroll position only touches the rows
+  involved, not the whole transcript.
+
+Text can be selected across messages by dragging, double-clicking a word or
+pressing Ctrl+A, and copied with Ctrl+C. selectedText() returns the
+selection as QTextCursor.selectedText() would, which is what the
+rabbithole/fork context menu uses. Streamed text and images that arrive
+before a reply is committed go into a trailing document after the last row
+(append_text, append_image). The next set_conversation() drops them.
+"""
+
+import bisect
+import math
+from collections import OrderedDict
+from html import escape
+from itertools import accumulate, islice
+
+from PyQt6.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QPointF,
+    QRect,
+    QRectF,
+    Qt,
+    QTimer,
+)
+from PyQt6.QtGui import (
+    QAbstractTextDocumentLayout,
+    QClipboard,
+    QGuiApplication,
+    QKeySequence,
+    QPainter,
+    QRegion,
+    QTextCharFormat,
+    QTextCursor,
+    QTextDocument,
+)
+from PyQt6.QtWidgets import QAbstractItemView
+
+from config import RENDER_MAX_IN_PLACE_UPDATES, TRANSCRIPT_DOCUMENT_CACHE
+
+MessageRole = Qt.ItemDataRole.UserRole + 1
+HtmlRole = Qt.ItemDataRole.UserRole + 2
+
+MARGIN = 4  # Around the transcript, as QTextDocument's default document margin
+END = 2 ** 31  # Selection position meaning "end of that row's document"
+PARAGRAPH_SEPARATOR = "\u2029"  # What QTextCursor.selectedText() puts between blocks
+
+
+def message_text(message):
+    """A message's text (the text parts of structured content)"""
+    content = message.get("content", "")
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return content or ""
+
+
+class TranscriptModel(QAbstractListModel):
+    """Conversation messages, one row each, with their HTML rendered on first use"""
+
+    def __init__(self, message_html, parent=None):
+        """
+        Args:
+            message_html: Callable turning a message dict into HTML ("" for hidden messages)
+        """
+        super().__init__(parent)
+        self._message_html = message_html
+        self.messages = []
+        self._contents = []  # Each message's content when it was added, to spot replaced content
+        self._html = []  # Rendered HTML per row (None until needed)
+        self._line_lengths = []  # Line lengths per row, for height estimates (None until needed)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.messages)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self.messages):
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return message_text(self.messages[index.row()])
+        if role == MessageRole:
+            return self.messages[index.row()]
+        if role == HtmlRole:
+            return self.message_html(index.row())
+        return None
+
+    def message_html(self, row):
+        html = self._html[row]
+        if html is None:
+            html = self._html[row] = self._message_html(self.messages[row])
+        return html
+
+    def line_lengths(self, row):
+        lengths = self._line_lengths[row]
+        if lengths is None:
+            lengths = self._line_lengths[row] = [len(line) for line in message_text(self.messages[row]).split("\n")]
+        return lengths
+
+    def set_conversation(self, conversation):
+        """Make the rows match `conversation`, changing only the rows that differ"""
+        count = len(self.messages)
+        changed = [
+            i for i in range(min(count, len(conversation)))
+            if self.messages[i] is not conversation[i]
+            or self._contents[i] is not conversation[i].get("content", "")
+        ]
+        keep = count
+        if len(conversation) < count:
+            keep = changed[0] if changed else len(conversation)
+        elif len(changed) > RENDER_MAX_IN_PLACE_UPDATES:
+            keep = changed[0]
+        if keep < count:
+            self.beginRemoveRows(QModelIndex(), keep, count - 1)
+            for rows in (self.messages, self._contents, self._html, self._line_lengths):
+                del rows[keep:]
+            self.endRemoveRows()
+        else:
+            for i in changed:
+                self._set_row(i, conversation[i])
+                self.dataChanged.emit(self.index(i), self.index(i))
+
+        if len(conversation) > len(self.messages):
+            start = len(self.messages)
+            self.beginInsertRows(QModelIndex(), start, len(conversation) - 1)
+            for message in conversation[start:]:
+                self.messages.append(message)
+                self._contents.append(None)
+                self._html.append(None)
+                self._line_lengths.append(None)
+                self._set_row(len(self.messages) - 1, message)
+            self.endInsertRows()
+
+    def _set_row(self, row, message):
+        self.messages[row] = message
+        self._contents[row] = message.get("content", "")
+        self._html[row] = None
+        self._line_lengths[row] = None
+
+
+class TranscriptView(QAbstractItemView):
+    """Shows a TranscriptModel, laying out only the rows near the viewport"""
+
+    def __init__(self, message_html, stylesheet, parent=None):
+        """
+        Args:
+            message_html: Callable turning a message dict into HTML (see TranscriptModel)
+            stylesheet: CSS applied to every message document
+        """
+        super().__init__(parent)
+        self._stylesheet = stylesheet
+        self._heights = []  # Per row, in pixels (estimated until the row is laid out)
+        self._measured = []  # Per row: has its height been laid out at the current width
+        self._offsets = []  # Per row: where its document starts within it (collapsed margin)
+        self._tops = [0]  # _tops[row] is the row's y offset; _tops[-1] the end of the last row
+        self._dirty_from = None  # First row whose _tops entry is stale
+        self._documents = OrderedDict()  # row -> QTextDocument, least recently used first
+        self._width = None  # Text width the heights were measured at
+        self._anchor = None  # Selection start as (row, position); row == row count is the stream
+        self._position = None  # Selection end (where the mouse is)
+        self._selecting = False
+
+        # Streamed text after the last message (row index == row count)
+        self._stream = self._new_document()
+        self._stream_height = 0
+
+        self._autoscroll = QTimer(self)
+        self._autoscroll.setInterval(30)
+        self._autoscroll.timeout.connect(self._autoscroll_step)
+
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.viewport().setCursor(Qt.CursorShape.IBeamCursor)
+        self.setModel(TranscriptModel(message_html, self))
+
+    # --- Public API -------------------------------------------------------
+
+    def set_conversation(self, conversation):
+        """Show `conversation` (only new or changed messages are re-rendered) and drop streamed text"""
+        self.clear_stream()
+        self.model().set_conversation(conversation)
+
+    def clear(self):
+        """Remove every message and the streamed text"""
+        self.set_conversation([])
+
+    def clear_stream(self):
+        """Drop the streamed text shown after the last message"""
+        if self._stream.isEmpty():
+            return
+        self._stream.clear()
+        if self._anchor is not None and max(self._anchor[0], self._position[0]) >= len(self._heights):
+            self._anchor = self._position = None
+        self._stream_changed()
+
+    def append_text(self, text, char_format=None):
+        """Append streamed text after the last message"""
+        cursor = QTextCursor(self._stream)
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text, char_format if char_format is not None else QTextCharFormat())
+        self._stream_changed()
+
+    def append_image(self, image):
+        """Append a QImage after the last message"""
+        cursor = QTextCursor(self._stream)
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertImage(image)
+        cursor.insertText("\n\n")
+        self._stream_changed()
+
+    def selectedText(self):
+        """The selected text, with U+2029 between paragraphs (as QTextCursor.selectedText())"""
+        if self._anchor is None or self._anchor == self._position:
+            return ""
+        start, end = sorted((self._anchor, self._position))
+        parts = []
+        for row in range(start[0], end[0] + 1):
+            document = self._row_document(row)
+            if document is None:
+                continue
+            last = document.characterCount() - 1
+            cursor = QTextCursor(document)
+            cursor.setPosition(min(start[1], last) if row == start[0] else 0)
+            cursor.setPosition(min(end[1], last) if row == end[0] else last, QTextCursor.MoveMode.KeepAnchor)
+            parts.append(cursor.selectedText())
+        return PARAGRAPH_SEPARATOR.join(parts)
+
+    def selectAll(self):
+        """Select the whole transcript, streamed text included"""
+        self._anchor, self._position = (0, 0), (len(self._heights), END)
+        self.viewport().update()
+
+    def copy(self):
+        """Copy the selection to the clipboard"""
+        text = self.selectedText()
+        if text:
+            QGuiApplication.clipboard().setText(text.replace(PARAGRAPH_SEPARATOR, "\n"))
+
+    def toPlainText(self):
+        """The whole transcript as plain text (for export)"""
+        parts = []
+        for row in range(len(self._heights) + 1):
+            document = self._row_document(row)
+            if document is not None:
+                parts.append(document.toPlainText())
+        return "\n".join(parts)
+
+    def toHtml(self):
+        """The whole transcript as one HTML document (for export)"""
+        model = self.model()
+        body = "".join(model.message_html(row) for row in range(model.rowCount()))
+        if not self._stream.isEmpty():
+            body += f'<div class="content">{escape(self._stream.toPlainText())}</div>'
+        return f"<html><head><style>{self._stylesheet}</style></head><body>{body}</body></html>"
+
+    # --- Row documents and layout ----------------------------------------
+
+    def _new_document(self):
+        document = QTextDocument(self)
+        document.setDocumentMargin(0)
+        document.setDefaultFont(self.font())
+        document.setDefaultStyleSheet(self._stylesheet)
+        return document
+
+    def _text_width(self):
+        return max(1, self.viewport().width() - 2 * MARGIN)
+
+    def _row_document(self, row):
+        """The laid-out document for a row (the stream for row == row count); None for hidden rows"""
+        if row >= len(self._heights):
+            return None if self._stream.isEmpty() else self._stream
+        document = self._documents.get(row)
+        if document is None:
+            html = self.model().message_html(row)
+            if not html:
+                return None
+            document = self._new_document()
+            document.setHtml(html)
+            self._documents[row] = document
+            if len(self._documents) > TRANSCRIPT_DOCUMENT_CACHE:
+                self._documents.popitem(last=False)[1].deleteLater()
+        else:
+            self._documents.move_to_end(row)
+        if document.textWidth() != self._text_width():
+            document.setTextWidth(self._text_width())
+        return document
+
+    def _estimate(self, row):
+        """A row's height before it has been laid out, from its line lengths"""
+        lengths = self.model().line_lengths(row)
+        if lengths == [0]:
+            return 0
+        metrics = self.fontMetrics()
+        per_line = max(1, self._text_width() // max(1, metrics.horizontalAdvance("M")))
+        lines = sum(max(1, math.ceil(length / per_line)) for length in lengths)
+        if self.model().messages[row].get("role") == "assistant":
+            lines += 2  # Header and its margins
+        return lines * metrics.lineSpacing() + 8
+
+    def _previous_bottom_margin(self, row):
+        """Bottom margin of the last shown row before `row` (None if there is none)"""
+        for previous in range(row - 1, -1, -1):
+            document = self._row_document(previous)
+            if document is not None:
+                return document.lastBlock().blockFormat().bottomMargin()
+        return None
+
+    def _measure(self, row):
+        """Lay out a row and record its height and where its document starts in it"""
+        document = self._row_document(row)
+        height = offset = 0
+        if document is not None:
+            # One long document collapses the margins between messages to the larger
+            # of the two (and drops the first one), but a row's own document drops
+            # its first top margin and last bottom margin, so rows add them back
+            previous_bottom = self._previous_bottom_margin(row)
+            if previous_bottom is not None:
+                offset = max(0, document.firstBlock().blockFormat().topMargin() - previous_bottom)
+            bottom = document.lastBlock().blockFormat().bottomMargin()
+            height = math.ceil(offset + document.size().height() + bottom)
+        self._offsets[row] = offset
+        if height != self._heights[row]:
+            self._heights[row] = height
+            self._mark_dirty(row)
+        self._measured[row] = True
+
+    def _unmeasure_next(self, row):
+        """Have the first shown row after `row` laid out again (its margin depends on the row before)"""
+        model = self.model()
+        for following in range(row + 1, len(self._measured)):
+            self._measured[following] = False
+            if model.message_html(following):
+                break
+
+    def _mark_dirty(self, row):
+        if self._dirty_from is None or row < self._dirty_from:
+            self._dirty_from = row
+
+    def _update_tops(self):
+        start = self._dirty_from
+        if start is None:
+            return
+        self._dirty_from = None
+        del self._tops[start + 1:]
+        self._tops.extend(islice(accumulate(self._heights[start:], initial=self._tops[start]), 1, None))
+
+    def _content_height(self):
+        self._update_tops()
+        return self._tops[-1] + self._stream_height + 2 * MARGIN
+
+    def _row_at(self, y):
+        """The row at content offset `y` (ignoring MARGIN); the last row below the end"""
+        self._update_tops()
+        return min(max(0, bisect.bisect_right(self._tops, y) - 1), max(0, len(self._heights) - 1))
+
+    def _relayout(self):
+        """Forget every measured height (the width or font changed)"""
+        self._width = self._text_width()
+        self._measured = [False] * len(self._heights)
+        self._offsets = [0] * len(self._heights)
+        self._heights = [self._estimate(row) for row in range(len(self._heights))]
+        self._dirty_from = 0
+        self._stream_changed()
+
+    def _layout_viewport(self):
+        """Lay out the rows in and around the viewport, keeping the top row where it was on screen"""
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        resized = self._width != self._text_width()
+        if not self._heights:
+            if resized:
+                self._relayout()
+            return
+        anchor_row = self._row_at(scrollbar.value() - MARGIN)
+        anchor_offset = scrollbar.value() - MARGIN - self._tops[anchor_row]
+        if resized:
+            self._relayout()
+        viewport_height = self.viewport().height()
+        changed = resized
+        for _ in range(8):
+            self._update_tops()
+            if at_bottom:
+                view_top = self._tops[-1] + self._stream_height + MARGIN - viewport_height
+            else:
+                view_top = self._tops[anchor_row] + anchor_offset
+            first = self._row_at(view_top - viewport_height // 2)
+            last = self._row_at(view_top + viewport_height * 3 // 2)
+            pending = [row for row in range(first, last + 1) if not self._measured[row]]
+            if not pending:
+                break
+            for row in pending:
+                self._measure(row)
+            changed = True
+        if not changed:
+            return
+        self.updateGeometries()
+        value = scrollbar.maximum() if at_bottom else MARGIN + self._tops[anchor_row] + anchor_offset
+        scrollbar.blockSignals(True)
+        scrollbar.setValue(value)
+        scrollbar.blockSignals(False)
+
+    def _stream_changed(self):
+        if self._stream.textWidth() != self._text_width():
+            self._stream.setTextWidth(self._text_width())
+        self._stream_height = 0 if self._stream.isEmpty() else math.ceil(self._stream.size().height())
+        self.updateGeometries()
+        self.viewport().update()
+
+    # --- QAbstractItemView --------------------------------------------------
+
+    def updateGeometries(self):
+        scrollbar = self.verticalScrollBar()
+        scrollbar.setRange(0, max(0, self._content_height() - self.viewport().height()))
+        scrollbar.setPageStep(self.viewport().height())
+        scrollbar.setSingleStep(self.fontMetrics().lineSpacing() * 3)
+
+    def rowsInserted(self, parent, start, end):
+        count = end - start + 1
+        if start < len(self._heights):
+            self._documents = OrderedDict(
+                (row + count if row >= start else row, document) for row, document in self._documents.items())
+        self._heights[start:start] = [self._estimate(row) for row in range(start, end + 1)]
+        self._measured[start:start] = [False] * count
+        self._offsets[start:start] = [0] * count
+        self._unmeasure_next(end)
+        self._mark_dirty(start)
+        if self._anchor is not None and max(self._anchor[0], self._position[0]) >= start:
+            self._anchor = self._position = None
+        self._stream_changed()
+        super().rowsInserted(parent, start, end)
+
+    def rowsAboutToBeRemoved(self, parent, start, end):
+        count = end - start + 1
+        documents = OrderedDict()
+        for row, document in self._documents.items():
+            if start <= row <= end:
+                document.deleteLater()
+            else:
+                documents[row - count if row > end else row] = document
+        self._documents = documents
+        del self._heights[start:end + 1]
+        del self._measured[start:end + 1]
+        del self._offsets[start:end + 1]
+        self._unmeasure_next(start - 1)
+        self._mark_dirty(start)
+        if self._anchor is not None and max(self._anchor[0], self._position[0]) >= start:
+            self._anchor = self._position = None
+        super().rowsAboutToBeRemoved(parent, start, end)
+        self._stream_changed()
+
+    def dataChanged(self, top_left, bottom_right, roles=()):
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            document = self._documents.pop(row, None)
+            if document is not None:
+                document.deleteLater()
+            self._heights[row] = self._estimate(row)
+            self._measured[row] = False
+            self._mark_dirty(row)
+        self._unmeasure_next(bottom_right.row())
+        self._stream_changed()
+
+    def reset(self):
+        for document in self._documents.values():
+            document.deleteLater()
+        self._documents.clear()
+        count = self.model().rowCount() if self.model() is not None else 0
+        self._heights = [self._estimate(row) for row in range(count)]
+        self._measured = [False] * count
+        self._offsets = [0] * count
+        self._tops = [0]
+        self._dirty_from = 0
+        self._anchor = self._position = None
+        super().reset()
+        self._stream_changed()
+
+    def visualRect(self, index):
+        if not index.isValid() or index.row() >= len(self._heights):
+            return QRect()
+        self._update_tops()
+        top = MARGIN + self._tops[index.row()] - self.verticalScrollBar().value()
+        return QRect(MARGIN, top, self._text_width(), self._heights[index.row()])
+
+    def indexAt(self, point):
+        if not self._heights:
+            return QModelIndex()
+        y = point.y() + self.verticalScrollBar().value() - MARGIN
+        if y < 0 or y >= self._content_height() - 2 * MARGIN - self._stream_height:
+            return QModelIndex()
+        return self.model().index(self._row_at(y))
+
+    def scrollTo(self, index, hint=QAbstractItemView.ScrollHint.EnsureVisible):
+        if not index.isValid():
+            return
+        self._update_tops()
+        self.verticalScrollBar().setValue(MARGIN + self._tops[index.row()])
+
+    def moveCursor(self, action, modifiers):
+        return QModelIndex()
+
+    def horizontalOffset(self):
+        return 0
+
+    def verticalOffset(self):
+        return self.verticalScrollBar().value()
+
+    def isIndexHidden(self, index):
+        return False
+
+    def setSelection(self, rect, command):
+        pass
+
+    def visualRegionForSelection(self, selection):
+        return QRegion()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    # --- Painting -------------------------------------------------------------
+
+    def paintEvent(self, event):
+        self._layout_viewport()
+        painter = QPainter(self.viewport())
+        scroll = self.verticalScrollBar().value()
+        clip = event.rect()
+        if self._heights:
+            row = self._row_at(scroll + clip.top() - MARGIN)
+            while row < len(self._heights) and self._tops[row] <= scroll + clip.bottom() - MARGIN:
+                if self._heights[row]:
+                    self._paint_document(painter, row, MARGIN + self._tops[row] - scroll, clip)
+                row += 1
+        if self._stream_height:
+            self._paint_document(painter, len(self._heights), MARGIN + self._tops[-1] - scroll, clip)
+        painter.end()
+
+    def _paint_document(self, painter, row, y, clip):
+        document = self._row_document(row)
+        if document is None:
+            return
+        if row < len(self._offsets):
+            y += self._offsets[row]
+        painter.save()
+        painter.translate(MARGIN, y)
+        context = QAbstractTextDocumentLayout.PaintContext()
+        context.palette = self.palette()
+        context.clip = QRectF(clip).translated(-MARGIN, -y)
+        selection = self._row_selection(row, document)
+        if selection is not None:
+            context.selections = [selection]
+        painter.setClipRect(context.clip)
+        document.documentLayout().draw(painter, context)
+        painter.restore()
+
+    def _row_selection(self, row, document):
+        """The part of `row` that is selected, as a paint context selection (None if nothing is)"""
+        if self._anchor is None or self._anchor == self._position:
+            return None
+        start, end = sorted((self._anchor, self._position))
+        if not start[0] <= row <= end[0]:
+            return None
+        last = document.characterCount() - 1
+        cursor = QTextCursor(document)
+        cursor.setPosition(min(start[1], last) if row == start[0] else 0)
+        cursor.setPosition(min(end[1], last) if row == end[0] else last, QTextCursor.MoveMode.KeepAnchor)
+        selection = QAbstractTextDocumentLayout.Selection()
+        selection.cursor = cursor
+        selection.format = QTextCharFormat()
+        selection.format.setBackground(self.palette().highlight())
+        selection.format.setForeground(self.palette().highlightedText())
+        return selection
+
+    # --- Selection with the mouse and keyboard ---------------------------------
+
+    def _hit(self, point):
+        """The (row, position) of the text under a viewport point"""
+        y = point.y() + self.verticalScrollBar().value() - MARGIN
+        if y < 0 or not (self._heights or self._stream_height):
+            return (0, 0)
+        self._update_tops()
+        if y >= self._tops[-1] and self._stream_height:
+            row = len(self._heights)
+        elif y >= self._tops[-1]:
+            return (len(self._heights) - 1, END)
+        else:
+            row = self._row_at(y)
+        document = self._row_document(row)
+        if document is None:
+            return (row, 0)
+        top = self._tops[row] if row < len(self._heights) else self._tops[-1]
+        if row < len(self._offsets):
+            top += self._offsets[row]
+        position = document.documentLayout().hitTest(QPointF(point.x() - MARGIN, y - top),
+                                                     Qt.HitTestAccuracy.FuzzyHit)
+        return (row, max(0, position))
+
+    def mousePressEvent(self, event):
+        if event.button() != Qt.MouseButton.LeftButton:
+            return
+        hit = self._hit(event.position().toPoint())
+        if not (event.modifiers() & Qt.KeyboardModifier.ShiftModifier and self._anchor is not None):
+            self._anchor = hit
+        self._position = hit
+        self._selecting = True
+        self.viewport().update()
+
+    def mouseMoveEvent(self, event):
+        if not self._selecting:
+            return
+        point = event.position().toPoint()
+        self._position = self._hit(point)
+        if self.viewport().rect().contains(point):
+            self._autoscroll.stop()
+        else:
+            self._autoscroll.start()
+        self.viewport().update()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() != Qt.MouseButton.LeftButton or not self._selecting:
+            return
+        self._selecting = False
+        self._autoscroll.stop()
+        self._position = self._hit(event.position().toPoint())
+        self.viewport().update()
+        clipboard = QGuiApplication.clipboard()
+        if clipboard.supportsSelection() and self.selectedText():
+            clipboard.setText(self.selectedText().replace(PARAGRAPH_SEPARATOR, "\n"), QClipboard.Mode.Selection)
+
+    def mouseDoubleClickEvent(self, event):
+        if event.button() != Qt.MouseButton.LeftButton:
+            return
+        row, position = self._hit(event.position().toPoint())
+        document = self._row_document(row)
+        if document is None:
+            return
+        cursor = QTextCursor(document)
+        cursor.setPosition(min(position, document.characterCount() - 1))
+        cursor.select(QTextCursor.SelectionType.WordUnderCursor)
+        self._anchor, self._position = (row, cursor.selectionStart()), (row, cursor.selectionEnd())
+        self.viewport().update()
+
+    def _autoscroll_step(self):
+        point = self.viewport().mapFromGlobal(self.cursor().pos())
+        scrollbar = self.verticalScrollBar()
+        if point.y() < 0:
+            scrollbar.setValue(scrollbar.value() + point.y())
+        elif point.y() > self.viewport().height():
+            scrollbar.setValue(scrollbar.value() + point.y() - self.viewport().height())
+        self._position = self._hit(point)
+        self.viewport().update()
+
+    def keyPressEvent(self, event):
+        scrollbar = self.verticalScrollBar()
+        if event.matches(QKeySequence.StandardKey.Copy):
+            self.copy()
+        elif event.matches(QKeySequence.StandardKey.SelectAll):
+            self.selectAll()
+        elif event.key() in (Qt.Key.Key_PageUp, Qt.Key.Key_PageDown):
+            step = scrollbar.pageStep() if event.key() == Qt.Key.Key_PageDown else -scrollbar.pageStep()
+            scrollbar.setValue(scrollbar.value() + step)
+        elif event.key() in (Qt.Key.Key_Up, Qt.Key.Key_Down):
+            step = scrollbar.singleStep() if event.key() == Qt.Key.Key_Down else -scrollbar.singleStep()
+            scrollbar.setValue(scrollbar.value() + step)
+        elif event.key() == Qt.Key.Key_Home:
+            scrollbar.setValue(0)
+        elif event.key() == Qt.Key.Key_End:
+            scrollbar.setValue(scrollbar.maximum())
+        else:
+            event.ignore()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == event.Type.FontChange:
+            for document in list(self._documents.values()) + [self._stream]:
+                document.setDefaultFont(self.font())
+            self._width = None
+            self.viewport().update()
@@ -0,0 +1,137 @@
+# ttft_stats.py
+"""Per-model time-to-first-token (TTFT) histograms.
+
+Every streamed turn records how long its first token took, measured from
+when its request was actually sent: provider calls report each send with
+note_request_sent(), after any rate-limit or retry wait, so queueing behind
+a Retry-After does not inflate the histogram. Samples go into
+log-spaced buckets (about 20% wide), so a percentile costs one pass over ~50
+counters and memory stays constant. Once a model has TTFT_HISTORY_SIZE
+samples, the counts are halved, so older behaviour fades out and the
+percentiles follow the provider's current latency.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from config import TTFT_HISTORY_SIZE
+
+# Bucket upper edges in seconds: 50 ms growing by 20% per bucket, up to ~5 minutes
+BUCKET_EDGES = []
+_edge = 0.05
+while _edge < 300:
+    BUCKET_EDGES.append(round(_edge, 4))
+    _edge *= 1.2
+BUCKET_EDGES.append(float("inf"))
+
+
+class TTFTHistogram:
+    """Bucketed TTFT samples for one model"""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKET_EDGES)
+        self.total = 0
+
+    def record(self, seconds):
+        index = next(i for i, edge in enumerate(BUCKET_EDGES) if seconds <= edge)
+        self.counts[index] += 1
+        self.total += 1
+        if self.total >= TTFT_HISTORY_SIZE:
+            self.counts = [count // 2 for count in self.counts]
+            self.total = sum(self.counts)
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-quantile (0 < q <= 1); None if empty"""
+        if not self.total:
+            return None
+        target = q * self.total
+        seen = 0
+        for edge, count in zip(BUCKET_EDGES, self.counts, strict=True):
+            seen += count
+            if seen >= target:
+                return edge
+        return BUCKET_EDGES[-1]
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def record_ttft(model_id, seconds):
+    """Add a time-to-first-token sample for a model"""
+    with _lock:
+        histogram = _histograms.get(model_id)
+        if histogram is None:
+            histogram = _histograms[model_id] = TTFTHistogram()
+        histogram.record(seconds)
+
+
+def ttft_percentile(model_id, q, min_samples=1):
+    """TTFT q-quantile for a model in seconds, or None with fewer than min_samples samples"""
+    with _lock:
+        histogram = _histograms.get(model_id)
+        if histogram is None or histogram.total < min_samples:
+            return None
+        return histogram.percentile(q)
+
+
+def get_ttft_stats():
+    """Return {model_id: {"samples", "p50", "p95"}} for every model seen so far"""
+    with _lock:
+        return {
+            model_id: {"samples": h.total, "p50": h.percentile(0.5), "p95": h.percentile(0.95)}
+            for model_id, h in _histograms.items()
+        }
+
+
+_request_sent_listener = contextvars.ContextVar("request_sent_listener", default=None)
+
+
+@contextmanager
+def request_sent_listener(callback):
+    """Call callback(sent_at) whenever a provider request made in this context is sent
+
+    sent_at is a time.monotonic() timestamp. Context-local like
+    retry_policy.retry_listener, so it covers asyncio tasks and threads
+    started with a copy of the context.
+    """
+    token = _request_sent_listener.set(callback)
+    try:
+        yield
+    finally:
+        _request_sent_listener.reset(token)
+
+
+def note_request_sent():
+    """Report that the current request is going out now (called by the provider calls)"""
+    listener = _request_sent_listener.get()
+    if listener is not None:
+        listener(time.monotonic())
+
+
+@contextmanager
+def timed_stream(model_id, stream_callback):
+    """Wrap a stream callback so the first chunk records the model's TTFT
+
+    The clock runs from the latest send of the request made inside the
+    block. Yields the wrapped callback, or None when stream_callback is None.
+    """
+    if stream_callback is None:
+        yield None
+        return
+    state = {"sent": time.monotonic(), "first": True}
+
+    def on_sent(sent_at):
+        if state["first"]:
+            state["sent"] = sent_at
+
+    def callback(chunk):
+        if state["first"]:
+            state["first"] = False
+            record_ttft(model_id, time.monotonic() - state["sent"])
+        stream_callback(chunk)
+
+    with request_sent_listener(on_sent):
+        yield callback
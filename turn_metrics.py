@@ -0,0 +1,259 @@
+# turn_metrics.py
+"""Per-turn latency and throughput metrics.
+
+ai_turn and ai_turn_async record one entry per AI turn:
+
+    queue_wait      seconds between the turn being started and a thread (or
+                    provider slot) picking it up
+    connect         seconds from sending the request to its response headers
+                    (the attempt that was used)
+    ttft            seconds from the turn starting to its first streamed chunk
+    duration        seconds the turn took, not counting queue_wait
+    tokens_per_sec  output tokens over the time spent streaming them (the
+                    whole duration for non-streaming backends)
+    input_tokens, output_tokens
+                    as reported by the provider; estimated from the text when
+                    it reports nothing (tokens_estimated is then True)
+    retries         reconnects and resends during the turn
+    ai_name, model, provider, status ("ok", "error" or "cancelled"), timestamp
+
+The provider code reports connect times, usage and retries through the
+note_*() functions, which update whichever turn is recording in the current
+context (thread or asyncio task); outside a turn they do nothing.
+
+Records are kept in memory (get_turn_metrics, summarize_turn_metrics) and,
+when TURN_METRICS_FILE is set, appended to a JSONL file as each turn ends.
+`python headless.py metrics FILE` prints the summary table for such a file.
+"""
+
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from cancellation import Cancelled
+from config import TURN_METRICS_FILE, TURN_METRICS_HISTORY
+from context_budget import estimate_text_tokens
+
+_records = deque(maxlen=TURN_METRICS_HISTORY)
+_lock = threading.Lock()
+_metrics_file = TURN_METRICS_FILE
+_current_turn = contextvars.ContextVar("current_turn", default=None)
+
+
+class TurnRecorder:
+    """Collects the metrics of one turn while it runs"""
+
+    def __init__(self, ai_name, model, provider, queue_wait=None):
+        self.started = time.monotonic()
+        self.first_chunk_at = None
+        self.record = {
+            "timestamp": time.time(),
+            "ai_name": ai_name,
+            "model": model,
+            "provider": provider,
+            "status": "ok",
+            "queue_wait": queue_wait,
+            "connect": None,
+            "ttft": None,
+            "duration": None,
+            "tokens_per_sec": None,
+            "input_tokens": None,
+            "output_tokens": None,
+            "tokens_estimated": False,
+            "retries": 0,
+        }
+        self._content = None
+        self._input_estimate = None
+
+    def wrap(self, stream_callback):
+        """Wrap a stream callback so the first chunk records the turn's TTFT"""
+        def callback(chunk):
+            if self.first_chunk_at is None:
+                self.first_chunk_at = time.monotonic()
+                self.record["ttft"] = self.first_chunk_at - self.started
+            if stream_callback:
+                stream_callback(chunk)
+        return callback
+
+    def set_result(self, content, status="ok", input_estimate=None):
+        """Record what the turn produced, for the token counts"""
+        self._content = content
+        self.record["status"] = status
+        self._input_estimate = input_estimate
+
+    def finish(self):
+        """Fill in durations and token counts; returns the finished record"""
+        record = self.record
+        ended = time.monotonic()
+        record["duration"] = ended - self.started
+        if record["input_tokens"] is None and self._input_estimate is not None:
+            record["input_tokens"] = self._input_estimate
+            record["tokens_estimated"] = True
+        if record["output_tokens"] is None and isinstance(self._content, str) and record["status"] == "ok":
+            record["output_tokens"] = estimate_text_tokens(self._content)
+            record["tokens_estimated"] = True
+        if record["output_tokens"]:
+            streaming_time = ended - (self.first_chunk_at or self.started)
+            if streaming_time > 0:
+                record["tokens_per_sec"] = record["output_tokens"] / streaming_time
+        return record
+
+
+@contextmanager
+def turn_recorder(ai_name, model, provider, queue_wait=None):
+    """Record a turn's metrics while the block runs, then publish them
+
+    Call recorder.set_result() before leaving the block. A Cancelled
+    exception is recorded as status "cancelled", any other as "error".
+    """
+    recorder = TurnRecorder(ai_name, model, provider, queue_wait)
+    token = _current_turn.set(recorder)
+    try:
+        yield recorder
+    except Cancelled:
+        recorder.record["status"] = "cancelled"
+        raise
+    except BaseException:
+        recorder.record["status"] = "error"
+        raise
+    finally:
+        _current_turn.reset(token)
+        publish(recorder.finish())
+
+
+def note_connect(seconds):
+    """Time from sending the current turn's request to its response headers"""
+    recorder = _current_turn.get()
+    if recorder is not None:
+        recorder.record["connect"] = seconds
+
+
+def note_usage(input_tokens=None, output_tokens=None):
+    """Token counts reported by the provider for the current turn (latest report wins)"""
+    recorder = _current_turn.get()
+    if recorder is not None:
+        if input_tokens is not None:
+            recorder.record["input_tokens"] = input_tokens
+        if output_tokens is not None:
+            recorder.record["output_tokens"] = output_tokens
+
+
+def note_retry():
+    """Count a reconnect or resend in the current turn"""
+    recorder = _current_turn.get()
+    if recorder is not None:
+        recorder.record["retries"] += 1
+
+
+def set_metrics_file(path):
+    """Append every turn's metrics to this JSONL file from now on (None stops)"""
+    global _metrics_file
+    _metrics_file = path
+
+
+def publish(record):
+    """Add a finished record to the registry and the JSONL file"""
+    with _lock:
+        _records.append(record)
+        if _metrics_file:
+            try:
+                directory = os.path.dirname(_metrics_file)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(_metrics_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                print(f"Could not write turn metrics to {_metrics_file}: {e}")
+
+
+def get_turn_metrics():
+    """Return the most recent turn records (up to TURN_METRICS_HISTORY), oldest first"""
+    with _lock:
+        return list(_records)
+
+
+def load_turn_metrics(path):
+    """Read turn records from a JSONL metrics file"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _percentile(values, q):
+    """Nearest-rank q-quantile of a list of numbers; None if empty"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def summarize_turn_metrics(records=None):
+    """Aggregate turn records per model
+
+    Args:
+        records: Records to summarize (default: the in-memory registry)
+
+    Returns:
+        {model: {"provider", "turns", "errors", "cancelled", "retries",
+                 "duration_p50", "duration_p99", "ttft_p50", "ttft_p99",
+                 "tokens_per_sec_p50", "queue_wait_mean", "input_tokens", "output_tokens"}}
+        Latency figures cover successful turns only.
+    """
+    if records is None:
+        records = get_turn_metrics()
+    by_model = {}
+    for record in records:
+        by_model.setdefault(record["model"], []).append(record)
+
+    summary = {}
+    for model, model_records in by_model.items():
+        ok = [r for r in model_records if r["status"] == "ok"]
+
+        def values(key):
+            return [r[key] for r in ok if r.get(key) is not None]
+
+        queue_waits = values("queue_wait")
+        summary[model] = {
+            "provider": model_records[-1].get("provider"),
+            "turns": len(model_records),
+            "errors": sum(1 for r in model_records if r["status"] == "error"),
+            "cancelled": sum(1 for r in model_records if r["status"] == "cancelled"),
+            "retries": sum(r.get("retries") or 0 for r in model_records),
+            "duration_p50": _percentile(values("duration"), 0.5),
+            "duration_p99": _percentile(values("duration"), 0.99),
+            "ttft_p50": _percentile(values("ttft"), 0.5),
+            "ttft_p99": _percentile(values("ttft"), 0.99),
+            "tokens_per_sec_p50": _percentile(values("tokens_per_sec"), 0.5),
+            "queue_wait_mean": sum(queue_waits) / len(queue_waits) if queue_waits else None,
+            "input_tokens": sum(values("input_tokens")),
+            "output_tokens": sum(values("output_tokens")),
+        }
+    return summary
+
+
+def format_turn_metrics_summary(summary=None):
+    """Render summarize_turn_metrics() output as a fixed-width text table"""
+    if summary is None:
+        summary = summarize_turn_metrics()
+    if not summary:
+        return "No turns recorded"
+
+    def seconds(value):
+        return "-" if value is None else f"{value:.2f}s"
+
+    header = (f"{'model':<34} {'turns':>5} {'err':>4} {'retry':>5} {'p50':>7} {'p99':>7} "
+              f"{'ttft50':>7} {'ttft99':>7} {'tok/s':>6} {'queue':>7} {'in tok':>8} {'out tok':>8}")
+    lines = [header, "-" * len(header)]
+    for model, row in sorted(summary.items(), key=lambda item: -item[1]["turns"]):
+        tokens_per_sec = "-" if row["tokens_per_sec_p50"] is None else f"{row['tokens_per_sec_p50']:.0f}"
+        lines.append(
+            f"{model[:34]:<34} {row['turns']:>5} {row['errors']:>4} {row['retries']:>5} "
+            f"{seconds(row['duration_p50']):>7} {seconds(row['duration_p99']):>7} "
+            f"{seconds(row['ttft_p50']):>7} {seconds(row['ttft_p99']):>7} {tokens_per_sec:>6} "
+            f"{seconds(row['queue_wait_mean']):>7} {row['input_tokens']:>8} {row['output_tokens']:>8}"
+        )
+    return "\n".join(lines)